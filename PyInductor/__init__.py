@@ -1,5 +1,11 @@
 from PyInductor.inductor import Inductor
 from PyInductor.data import MATERIALS
+from PyInductor.batch import analyze_batch
+from PyInductor.cache import AnalysisCache
+from PyInductor.designs import DesignSet
+from PyInductor.catalog import Catalog
+from PyInductor.pareto import pareto_sweep
 
 
-__all__ = ['Inductor', 'MATERIALS']
+__all__ = ['Inductor', 'MATERIALS', 'analyze_batch', 'AnalysisCache', 'DesignSet', 'Catalog',
+           'pareto_sweep']
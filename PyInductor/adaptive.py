@@ -0,0 +1,276 @@
+from __future__ import division
+
+import numpy as np
+
+from collections import namedtuple
+
+from PyInductor.model import output_names
+
+
+ADAPTIVE_OUTPUTS = ('Ls_eff', 'Q_eff')
+
+# one sampled curve: sorted parameter values, dict of output arrays, mask of the points the
+# analysis succeeded on and the number of points analyzed
+AdaptiveCurve = namedtuple('AdaptiveCurve', ['x', 'values', 'ok', 'evaluations'])
+
+# one sampled surface: (n, 2) array of the points, dict of output arrays, 'ok' mask, the
+# final cells as (x0, x1, y0, y1) rows and the number of points analyzed
+AdaptiveSurface = namedtuple('AdaptiveSurface', ['points', 'values', 'ok', 'cells',
+                                                 'evaluations'])
+
+
+def _to_unit(bounds, log):
+    """Function mapping [0, 1] to a parameter range (linearly or in log10)."""
+    lower, upper = np.log10(bounds) if log else np.asarray(bounds, dtype=float)
+
+    def to_param(u):
+        value = lower + (upper - lower) * np.asarray(u)
+        return 10 ** value if log else value
+
+    return to_param
+
+
+def _scaled(values, names):
+    """(n, k) array of the outputs divided by their ranges (over the finite values)."""
+    columns = []
+    for name in names:
+        column = np.asarray(values[name], dtype=float)
+        finite = column[np.isfinite(column)]
+        scale = finite.max() - finite.min() if finite.size else 0.
+        if not scale:
+            scale = abs(finite).max() if finite.size and abs(finite).max() else 1.
+        columns.append(column / scale)
+    return np.column_stack(columns)
+
+
+def _raw_param(inductor, name):
+    # the parameter as set (before the temperature model)
+    try:
+        return inductor.batch_param(name)
+    except TypeError:
+        return getattr(inductor, name)
+
+
+def _evaluator(inductor, params, outputs, tune):
+    """
+    Function analyzing the inductor at arrays of values of 'params' (one array per
+    parameter). Without tuning they are analyzed as one batch; with tune = (name, target,
+    input_range) 'name' is first tuned (see Inductor.tune_parameter()) to give an inductance
+    of 'target' at every point, one point at a time, and returned as an output as well.
+    """
+    if tune is None:
+        def evaluate(*arrays):
+            results = inductor.analyze_batch(outputs=outputs, **dict(zip(params, arrays)))
+            return dict((name, np.broadcast_to(results[name], np.shape(arrays[0])))
+                        for name in outputs)
+        return evaluate
+
+    name, target, input_range = tune
+    kept = [(param, _raw_param(inductor, param)) for param in tuple(params) + (name,)]
+
+    def evaluate(*arrays):
+        values = dict((output, np.full(len(arrays[0]), np.nan))
+                      for output in tuple(outputs) + (name,))
+        try:
+            for i, point in enumerate(zip(*arrays)):
+                inductor.set_params(**dict(zip(params, point)))
+                bounds = input_range(inductor) if callable(input_range) else input_range
+                try:
+                    values[name][i] = inductor.tune_parameter(name, target, bounds)
+                    results = inductor.analyze(outputs)
+                except Exception:
+                    continue
+                for output in outputs:
+                    values[output][i] = results[output]
+        finally:
+            inductor.set_params(**dict(kept))
+        return values
+
+    return evaluate
+
+
+def refine_curve(func, bounds, names, tol=0.01, initial=9, max_points=500, min_width=1e-4,
+                 log=False):
+    """
+    Sample func over a range, refining where a linear interpolation of the samples would be
+    off: every round, each point whose (range normalized) outputs deviate by more than 'tol'
+    from the chord between its neighbours has both of its intervals bisected, as has every
+    interval with a failed point at one end only. The midpoints of a round are evaluated
+    together.
+
+    Parameters:
+    func (callable): Array of parameter values -> dict of equally long output arrays (NaN
+                     where the evaluation failed)
+    bounds (tuple): Parameter range
+    names (list): Outputs driving the refinement
+    tol (float): Accepted deviation, relative to the range of each output
+    initial (int): Points of the starting (uniform) grid
+    max_points (int): Evaluation budget
+    min_width (float): Narrowest interval bisected, relative to the range
+    log (bool): Sample log-uniformly (bisect geometrically)
+
+    Returns an AdaptiveCurve.
+    """
+    to_param = _to_unit(bounds, log)
+    u = np.linspace(0, 1, initial)
+    values = func(to_param(u))
+    values = dict((name, np.asarray(value, dtype=float)) for name, value in values.items())
+
+    while len(u) < max_points:
+        scaled = _scaled(values, names)
+        ok = np.isfinite(scaled).all(axis=1)
+
+        # score of every interval: deviation at its ends, infinite at a failure boundary
+        score = np.zeros(len(u) - 1)
+        both = ok[:-2] & ok[1:-1] & ok[2:]
+        weight = ((u[1:-1] - u[:-2]) / (u[2:] - u[:-2]))[:, None]
+        with np.errstate(invalid='ignore'):
+            chord = scaled[:-2] + weight * (scaled[2:] - scaled[:-2])
+            deviation = np.where(both, np.abs(scaled[1:-1] - chord).max(axis=1), 0)
+        score[:-1] = np.maximum(score[:-1], deviation)
+        score[1:] = np.maximum(score[1:], deviation)
+        score[ok[:-1] != ok[1:]] = np.inf
+        score[np.diff(u) <= min_width] = 0
+
+        split = np.flatnonzero(score > tol)
+        if not len(split):
+            break
+        split = split[np.argsort(-score[split], kind='mergesort')][:max_points - len(u)]
+
+        new_u = (u[split] + u[split + 1]) / 2
+        new_values = func(to_param(new_u))
+        order = np.argsort(np.concatenate([u, new_u]), kind='mergesort')
+        u = np.concatenate([u, new_u])[order]
+        values = dict((name, np.concatenate([value, np.asarray(new_values[name], dtype=float)])
+                       [order]) for name, value in values.items())
+
+    ok = np.isfinite(_scaled(values, names)).all(axis=1)
+    return AdaptiveCurve(to_param(u), values, ok, len(u))
+
+
+def refine_surface(func, bounds, names, tol=0.01, initial=5, max_points=2000,
+                   min_width=1e-3, log=(False, False)):
+    """
+    Two-parameter counterpart of refine_curve(): the range is split into cells, starting
+    from an initial x initial grid of points, and a cell is split into four while its
+    centre deviates by more than 'tol' (relative to the range of each output) from the
+    bilinear interpolation of its corners, or some of its corners and centre failed and
+    others did not. Points shared by cells are evaluated once; the new points of a round
+    are evaluated together.
+
+    Parameters:
+    func (callable): Arrays of x and y values -> dict of output arrays
+    bounds (tuple): (x range, y range)
+    log (tuple): Whether to sample x and y log-uniformly
+
+    See refine_curve() for the others. Returns an AdaptiveSurface.
+    """
+    to_x, to_y = _to_unit(bounds[0], log[0]), _to_unit(bounds[1], log[1])
+    grid = np.linspace(0, 1, initial)
+    cells = [(grid[i], grid[i + 1], grid[j], grid[j + 1])
+             for i in range(initial - 1) for j in range(initial - 1)]
+
+    # point (in unit coordinates) -> row of the evaluated values
+    index = {}
+    points, values = [], {}
+
+    def evaluate(new):
+        new = [point for point in dict.fromkeys(new) if point not in index]
+        if not new:
+            return
+        array = np.array(new)
+        results = func(to_x(array[:, 0]), to_y(array[:, 1]))
+        for point in new:
+            index[point] = len(points)
+            points.append(point)
+        for name, value in results.items():
+            values[name] = np.concatenate([values.get(name, np.zeros(0)),
+                                           np.asarray(value, dtype=float)])
+
+    def corners(cell):
+        x0, x1, y0, y1 = cell
+        return [(x0, y0), (x1, y0), (x0, y1), (x1, y1)]
+
+    def centre(cell):
+        return ((cell[0] + cell[1]) / 2, (cell[2] + cell[3]) / 2)
+
+    done = []
+    while True:
+        evaluate([point for cell in cells for point in corners(cell) + [centre(cell)]])
+        if not cells:
+            break
+
+        scaled = _scaled(values, names)
+        ok = np.isfinite(scaled).all(axis=1)
+        score = np.zeros(len(cells))
+        for i, cell in enumerate(cells):
+            rows = [index[point] for point in corners(cell)]
+            middle = index[centre(cell)]
+            if ok[rows].all() and ok[middle]:
+                score[i] = np.abs(scaled[middle] - scaled[rows].mean(axis=0)).max()
+            elif ok[rows + [middle]].any():
+                score[i] = np.inf
+            if cell[1] - cell[0] <= min_width and cell[3] - cell[2] <= min_width:
+                score[i] = 0
+
+        # every split adds at most 5 points on the edges and 4 centres
+        budget = (max_points - len(points)) // 9
+        split = [i for i in np.argsort(-score, kind='mergesort') if score[i] > tol][:budget]
+        chosen = set(split)
+        done.extend(cell for i, cell in enumerate(cells) if i not in chosen)
+
+        cells = [child for i in split for child in _quarters(cells[i])]
+
+    done = np.array(done).reshape(-1, 4)
+    cells = np.column_stack([to_x(done[:, 0]), to_x(done[:, 1]),
+                             to_y(done[:, 2]), to_y(done[:, 3])])
+    unit = np.array(points)
+    points = np.column_stack([to_x(unit[:, 0]), to_y(unit[:, 1])])
+    ok = np.isfinite(_scaled(values, names)).all(axis=1)
+    return AdaptiveSurface(points, values, ok, cells, len(points))
+
+
+def _quarters(cell):
+    x0, x1, y0, y1 = cell
+    xm, ym = (x0 + x1) / 2, (y0 + y1) / 2
+    return [(x0, xm, y0, ym), (xm, x1, y0, ym), (x0, xm, ym, y1), (xm, x1, ym, y1)]
+
+
+def adaptive_sweep(inductor, param, bounds, outputs=ADAPTIVE_OUTPUTS, tune=None, **kwargs):
+    """
+    Outputs of an inductor over a range of one parameter, sampled densely only where they
+    change abruptly (e.g. at the switches between the branches of the Lundin correction or
+    near the edges of the proximity factor table) instead of on a uniform grid.
+
+    Parameters:
+    inductor (Inductor): The design; it is left as it was
+    param (str): Parameter to vary (one of BATCH_PARAMS, unless tuning)
+    bounds (tuple): Range of the parameter
+    outputs (list): Outputs to sample, all of which drive the refinement
+    tune (tuple): Optional (name, target, input_range): at every point, parameter 'name' is
+                  tuned to give an Ls_eff of 'target' within input_range (a tuple, or a
+                  function of the inductor returning one), and is sampled as an output too
+    **kwargs: tol, initial, max_points, min_width and log (see refine_curve())
+
+    Returns an AdaptiveCurve.
+    """
+    outputs = output_names(outputs)
+    names = outputs + ((tune[0],) if tune else ())
+    return refine_curve(_evaluator(inductor, [param], outputs, tune), bounds, names, **kwargs)
+
+
+def adaptive_surface(inductor, params, bounds, outputs=ADAPTIVE_OUTPUTS, tune=None,
+                     **kwargs):
+    """
+    Two-parameter counterpart of adaptive_sweep(): params and bounds are pairs, and kwargs
+    go to refine_surface(). Returns an AdaptiveSurface, whose scattered points can be
+    plotted with e.g. matplotlib's tricontourf().
+    """
+    outputs = output_names(outputs)
+    names = outputs + ((tune[0],) if tune else ())
+    return refine_surface(_evaluator(inductor, params, outputs, tune), bounds, names,
+                          **kwargs)
+
+
+__all__ = ['adaptive_sweep', 'adaptive_surface', 'refine_curve', 'refine_surface',
+           'AdaptiveCurve', 'AdaptiveSurface', 'ADAPTIVE_OUTPUTS']
@@ -0,0 +1,52 @@
+from __future__ import division
+
+import numpy as np
+
+from PyInductor.model import Analysis, output_names, RESULT_NAMES
+
+
+def prop_factor_batch(N, len_coil, diam_wire, diam_former, f, table=None):
+    """
+    Propagation factor (the 'prop_factor' output of Inductor.analyze()) only, skipping
+    everything that doesn't feed into it.
+
+    Returns the propagation factors (NaN where the dispersion solver failed) and the 'ok'
+    mask. A DispersionTable can be passed to replace the exact dispersion solver.
+    """
+    analysis = Analysis(*[np.asarray(v, dtype=float)
+                          for v in (N, len_coil, diam_wire, diam_former, f)], table=table)
+    beta = analysis.beta
+
+    return np.where(analysis.ok, beta, np.nan), analysis.ok
+
+
+def analyze_batch(N, len_coil, diam_wire, diam_former, f, rho, mu_r, mu_r_core=1,
+                  outputs=None, table=None):
+    """
+    Vectorized counterpart of Inductor.analyze(). All inputs are broadcast against each
+    other and must already include any temperature effects (see Inductor.analyze_batch()
+    for a version that applies the temperature model).
+
+    Parameters:
+    N (array_like): Number of turns
+    len_coil (array_like): Coil length
+    diam_wire (array_like): Wire diameter
+    diam_former (array_like): Coil former diameter
+    f (array_like): Design frequency
+    rho (array_like): Wire resistivity
+    mu_r (array_like): Wire relative permeability
+    mu_r_core (array_like): Core relative permeability
+    outputs (list): Optional names of the outputs to return (default: all); the
+                    self-resonant frequency is only computed if 'res_freq' is among them.
+    table (DispersionTable): Optional surrogate of the dispersion solver
+
+    Returns a dict with one array per selected output of Inductor.analyze() and an 'ok'
+    boolean mask; elements for which the dispersion solver failed are NaN with 'ok' set to False.
+    """
+    inputs = (N, len_coil, diam_wire, diam_former, f, rho, mu_r, mu_r_core)
+    analysis = Analysis(*[np.asarray(v, dtype=float) for v in inputs], table=table)
+
+    return analysis.results(outputs)
+
+
+__all__ = ['analyze_batch', 'prop_factor_batch', 'output_names', 'RESULT_NAMES']
@@ -0,0 +1,79 @@
+from __future__ import division
+
+from collections import namedtuple, OrderedDict
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'size', 'maxsize'])
+
+
+class AnalysisCache(object):
+    """
+    Bounded LRU cache of analyses, keyed by the effective model inputs (i.e. after the
+    temperature model has been applied), for Inductor.analyze():
+
+        ind.cache = AnalysisCache(maxsize=256)
+
+    Since the key is rebuilt from the current parameters on every call, any change of state
+    (set_params(), the property setters, a new temperature) simply leads to a different key.
+    The settings that change how rather than what is analyzed (the dispersion table and warm
+    starts) are part of the key as well, so analyses made with and without a table are kept
+    apart. A cached analysis keeps its intermediate quantities, so asking for further
+    outputs of the same design only computes what is still missing. One cache can be shared
+    by several inductors.
+
+    Parameters:
+    maxsize (int): Maximum number of designs kept (least recently used ones are evicted)
+    digits (int): Optional number of significant digits the inputs are rounded to for the
+                  key, so designs differing by less share an entry (default: exact match)
+    """
+
+    def __init__(self, maxsize=128, digits=None):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self.digits = digits
+        self._entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def key(self, inputs, context=()):
+        if self.digits is None:
+            return tuple(float(value) for value in inputs) + tuple(context)
+        return tuple(float('%.*e' % (self.digits - 1, value)) for value in inputs) + \
+            tuple(context)
+
+    def get(self, inputs, factory, context=()):
+        """
+        The entry for inputs, calling factory() to create it if there isn't one; 'context'
+        holds further (hashable) parts of the key, used as they are.
+        """
+        key = self.key(inputs, context)
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            value = factory()
+            if len(self._entries) >= self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+
+        # (re)insert as the most recently used entry
+        self._entries[key] = value
+        return value
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.evictions, len(self._entries),
+                         self.maxsize)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+__all__ = ['AnalysisCache', 'CacheInfo']
@@ -0,0 +1,251 @@
+from __future__ import division
+
+import json
+import os
+
+import numpy as np
+
+from collections import namedtuple
+from scipy.spatial import cKDTree
+
+from PyInductor.designs import DesignSet
+from PyInductor.executor import Executor
+from PyInductor.inductor import Inductor, BATCH_PARAMS
+from PyInductor.model import output_names
+
+
+# outputs and inputs the nearest neighbour search can target (in log10 space)
+INDEX_COLUMNS = ('Ls_eff', 'Q_eff', 'res_freq', 'f')
+
+# designs analyzed at a time while building
+BATCH_SIZE = 100000
+
+# below this many candidates left by the constraints, distances are computed directly
+BRUTE_FORCE_SIZE = 50000
+
+# one query result: catalog row, distance (log10 units) and the design's inputs and outputs
+CatalogHit = namedtuple('CatalogHit', ['index', 'distance', 'params', 'outputs', 'polished'])
+
+
+def _within(values, limits):
+    """Where values meet (lower, upper) limits (None: open) or equal a value (within a
+    relative 1e-9)."""
+    with np.errstate(invalid='ignore'):
+        if isinstance(limits, (tuple, list)):
+            lower, upper = limits
+            within = np.ones(np.shape(values), dtype=bool)
+            if lower is not None:
+                within &= values >= lower
+            if upper is not None:
+                within &= values <= upper
+            return within
+        return np.abs(values - limits) <= 1e-9 * abs(limits)
+
+
+def _analyze_slice(item):
+    start, designs, outputs = item
+    return start, designs.analyze(outputs)
+
+
+class Catalog(object):
+    """
+    Designs analyzed once and stored in a directory as one .npy file per column (shared
+    parameters go to meta.json), opened memory-mapped, for inverse lookups: query() finds
+    the designs closest to target outputs that meet constraints, e.g.
+
+        catalog.query({'Ls_eff': 200e-9}, {'diam_former': 16e-3, 'diam_wire': 1e-3,
+                                           'f': 100e6, 'Q_eff': (150, None)})
+
+    Parameters:
+    path (str): Directory written by Catalog.build()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+
+        columns = dict(self.meta['shared'])
+        columns.update((name, load(name)) for name in self.meta['columns'])
+        self.designs = DesignSet(**columns)
+        self.outputs = dict((name, load(name)) for name in self.meta['outputs'])
+        self.ok = load('ok')
+        self._trees = {}
+
+    @classmethod
+    def build(cls, path, designs, outputs=None, batch_size=BATCH_SIZE, executor=None):
+        """
+        Analyze a DesignSet (e.g. DesignSet.grid(...)) in batches and store it as a catalog
+        in directory 'path'. An Executor spreads the batches over its workers.
+        """
+        outputs = tuple(sorted(set(output_names(outputs)) |
+                               set(name for name in INDEX_COLUMNS if name != 'f')))
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        def create(name, dtype=float):
+            return np.lib.format.open_memmap(os.path.join(path, name + '.npy'), mode='w+',
+                                             dtype=dtype, shape=(len(designs),))
+
+        meta = dict(size=len(designs), outputs=outputs, columns=[], shared={})
+        for name in BATCH_PARAMS:
+            column = designs.columns[name]
+            if column.ndim:
+                create(name)[:] = column
+                meta['columns'].append(name)
+            else:
+                meta['shared'][name] = float(column)
+
+        stored = dict((name, create(name)) for name in outputs)
+        stored['ok'] = create('ok', bool)
+        items = [(start, designs[start:start + batch_size], outputs)
+                 for start in range(0, len(designs), batch_size)]
+        if executor is None:
+            executor = Executor('serial')
+        for start, results in executor.imap(_analyze_slice, items,
+                                            weights=[len(item[1]) for item in items]):
+            for name, array in stored.items():
+                array[start:start + len(results['ok'])] = results[name]
+        for array in stored.values():
+            array.flush()
+
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        return cls(path)
+
+    def __len__(self):
+        return len(self.designs)
+
+    def column(self, name):
+        """Values of an input or output for every design."""
+        if name in self.outputs:
+            return self.outputs[name]
+        return self.designs.column(name)
+
+    def _points(self, dims, scale, rows=None):
+        # weighted log10 coordinates of the designs (of some rows only)
+        columns = [self.column(name) for name in dims]
+        if rows is not None:
+            columns = [column[rows] for column in columns]
+        with np.errstate(all='ignore'):
+            return np.column_stack([np.log10(np.asarray(column, dtype=float)) * weight
+                                    for column, weight in zip(columns, scale)])
+
+    def _tree(self, dims, scale):
+        """KD-tree of the feasible designs in weighted log10 coordinates, built on first use
+        (per set of target columns and weights)."""
+        key = dims, tuple(scale)
+        if key not in self._trees:
+            points = self._points(dims, scale)
+            rows = np.flatnonzero(self.ok & np.isfinite(points).all(axis=1))
+            self._trees[key] = cKDTree(points[rows]), rows
+        return self._trees[key]
+
+    def mask(self, constraints):
+        """
+        Designs meeting the constraints: column name -> (lower, upper) limits (None: open)
+        or a value the column must equal (within a relative 1e-9).
+        """
+        mask = np.array(self.ok)
+        for name, limits in (constraints or {}).items():
+            mask &= _within(self.column(name), limits)
+        return mask
+
+    def query(self, targets, constraints=None, k=5, weights=None, polish=None):
+        """
+        The k designs nearest to the target values among those meeting the constraints,
+        nearest first, as CatalogHit records.
+
+        Parameters:
+        targets (dict): Name in INDEX_COLUMNS -> target value; the distance is the
+                        (weighted) Euclidean one between log10 values
+        constraints (dict): See mask()
+        k (int): Number of designs to return
+        weights (dict): Optional weights of the target dimensions (default 1)
+        polish (str): Optional input parameter (e.g. 'len_coil') tuned with
+                      Inductor.tune_parameter() to hit the 'Ls_eff' target exactly; the
+                      hits are then analyzed exactly and re-checked against the constraints
+                      (hits that fail either keep their catalog values, with 'polished'
+                      False)
+        """
+        unknown = set(targets) - set(INDEX_COLUMNS)
+        if unknown:
+            raise ValueError('cannot target %s (only %s)' % (', '.join(sorted(unknown)),
+                                                             ', '.join(INDEX_COLUMNS)))
+        dims = tuple(name for name in INDEX_COLUMNS if name in targets)
+        scale = np.array([(weights or {}).get(name, 1.) for name in dims])
+        point = np.log10([targets[name] for name in dims])
+
+        mask = self.mask(constraints) if constraints else None
+        if mask is not None and np.count_nonzero(mask) <= BRUTE_FORCE_SIZE:
+            rows = np.flatnonzero(mask)
+            distance = np.sqrt(((self._points(dims, scale, rows) - point * scale) ** 2)
+                               .sum(axis=1))
+            rows, distance = rows[np.isfinite(distance)], distance[np.isfinite(distance)]
+            order = np.argsort(distance, kind='mergesort')[:k]
+            rows, distance = rows[order], distance[order]
+        else:
+            rows, distance = self._nearest(dims, point * scale, scale, mask, k)
+
+        hits = [CatalogHit(int(row), float(d), self.params(row),
+                           dict((name, float(self.outputs[name][row])) for name in self.outputs),
+                           False)
+                for row, d in zip(rows, distance)]
+        if polish is not None:
+            hits = [self._polish(hit, polish, targets, constraints, weights) for hit in hits]
+            hits.sort(key=lambda hit: hit.distance)
+        return hits
+
+    def _nearest(self, dims, point, scale, mask, k):
+        # query a growing number of neighbours until k of them meet the constraints
+        tree, tree_rows = self._tree(dims, scale)
+        count = min(k, len(tree_rows))
+        while count:
+            distance, found = tree.query(point, count)
+            distance, found = np.atleast_1d(distance), np.atleast_1d(found)
+            rows = tree_rows[found]
+            if mask is not None:
+                rows, distance = rows[mask[rows]], distance[mask[rows]]
+            if len(rows) >= k or count == len(tree_rows):
+                return rows[:k], distance[:k]
+            count = min(4 * count, len(tree_rows))
+        return np.zeros(0, dtype=int), np.zeros(0)
+
+    def params(self, row):
+        """Input parameters of a design (before the temperature model)."""
+        return dict((name, self.designs.get(name, row)) for name in BATCH_PARAMS)
+
+    def inductor(self, row):
+        """A standalone Inductor of a design."""
+        params = self.params(row)
+        ind = Inductor(**params)
+        ind.reference_temperature = params['reference_temperature']
+        return ind
+
+    def _polish(self, hit, name, targets, constraints, weights):
+        ind = self.inductor(hit.index)
+        if 'Ls_eff' in targets:
+            try:
+                ind.tune_parameter(name, targets['Ls_eff'],
+                                   input_range=(0.5 * hit.params[name], 2 * hit.params[name]))
+            except Exception:
+                return hit
+
+        outputs = ind.analyze(sorted(self.outputs))
+        params = dict((param, ind.batch_param(param)) for param in BATCH_PARAMS)
+        for column, limits in (constraints or {}).items():
+            if not _within(params.get(column, outputs.get(column)), limits):
+                return hit
+
+        distance = np.sqrt(sum(
+            ((weights or {}).get(target, 1.) *
+             np.log10(outputs.get(target, params.get(target)) / value)) ** 2
+            for target, value in targets.items()))
+        return CatalogHit(hit.index, float(distance), params, outputs, True)
+
+
+__all__ = ['Catalog', 'CatalogHit', 'INDEX_COLUMNS']
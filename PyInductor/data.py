@@ -1,6 +1,5 @@
 from __future__ import division
 import numpy as np
-from scipy.interpolate import interp2d
 
 
 MATERIALS = {}
@@ -38,6 +37,14 @@ MEDHURST_MATRIX = np.array([
     [5.31, 5.45, 5.65, 5.80, 5.80, 5.55, 4.10, 3.54, 3.31, 3.200, 3.23, 3.410]
 ])
 
-proximity_factor = interp2d(MEDHURST_L_D, MEDHURST_D_S, MEDHURST_MATRIX)
 
-__all__ = ['proximity_factor', 'MATERIALS']
+def proximity_factor(len_diam, diam_spacing):
+    """
+    Medhurst proximity factor; kept here for compatibility, see
+    PyInductor.proximity.proximity_factor (imported on use, as that module imports this one).
+    """
+    from PyInductor.proximity import proximity_factor as lookup
+    return lookup(len_diam, diam_spacing)
+
+
+__all__ = ['MATERIALS', 'MEDHURST_L_D', 'MEDHURST_D_S', 'MEDHURST_MATRIX', 'proximity_factor']
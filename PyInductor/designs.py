@@ -0,0 +1,192 @@
+from __future__ import division
+
+import csv
+
+import numpy as np
+
+from PyInductor.batch import analyze_batch
+from PyInductor.data import MATERIALS
+from PyInductor.inductor import Inductor, BATCH_PARAMS, effective_inputs
+from PyInductor.sinks import open_output
+
+
+# parameters every design needs (the remaining ones default as for Inductor)
+REQUIRED_PARAMS = ('N', 'len_coil', 'diam_wire', 'diam_former', 'f', 'rho', 'mu_r', 'rho_t0',
+                   'temp_coeff_rho', 'temp_coeff_expan')
+
+# parameters that Inductor stores as '_' + name (and exposes after the temperature model)
+_RAW_PARAMS = ('diam_former', 'diam_wire', 'rho')
+
+
+class DesignSet(object):
+    """
+    Set of designs stored as one float64 column per parameter of BATCH_PARAMS (structure of
+    arrays). A column is either a 1-D array with one value per design or a scalar shared by
+    all of them, so constant parameters (e.g. the material) take no room and are computed
+    once by the analysis, which works on the columns as they are.
+
+    Slicing returns a DesignSet of views (zero-copy for slices), indexing with an integer
+    returns a DesignView, i.e. an Inductor reading and writing that row. Pickling only
+    copies the columns, which makes sets cheap to send to worker processes.
+
+    Parameters:
+    material (str): Optional name of a material in MATERIALS supplying its parameters
+    **columns: Parameter name -> scalar or 1-D array; mu_r_core defaults to 1,
+               temperature to Inductor.temperature and reference_temperature to the
+               temperature
+    """
+
+    def __init__(self, material=None, **columns):
+        if material is not None:
+            columns = dict(MATERIALS[material], **columns)
+        columns.setdefault('mu_r_core', Inductor.mu_r_core)
+        columns.setdefault('temperature', Inductor.temperature)
+        columns.setdefault('reference_temperature', columns['temperature'])
+
+        unknown = set(columns) - set(BATCH_PARAMS)
+        if unknown:
+            raise TypeError('unknown design parameter(s): %s' % ', '.join(sorted(unknown)))
+        missing = set(REQUIRED_PARAMS) - set(columns)
+        if missing:
+            raise TypeError('missing design parameter(s): %s' % ', '.join(sorted(missing)))
+
+        self.columns = dict((name, np.asarray(value, dtype=float))
+                            for name, value in columns.items())
+        sizes = set(len(value) for value in self.columns.values() if value.ndim)
+        if any(value.ndim > 1 for value in self.columns.values()) or len(sizes) > 1:
+            raise ValueError('columns must be scalars or 1-D arrays of the same length')
+        self.size = sizes.pop() if sizes else 1
+
+    @classmethod
+    def grid(cls, material=None, **params):
+        """
+        All combinations of the array parameters (the scalar ones are shared), flattened in
+        C order with the axes in the order of BATCH_PARAMS.
+        """
+        axes = [name for name in BATCH_PARAMS if np.ndim(params.get(name)) > 0]
+        mesh = np.meshgrid(*[np.ravel(params[name]) for name in axes], indexing='ij')
+        params.update((name, values.ravel()) for name, values in zip(axes, mesh))
+        return cls(material, **params)
+
+    @classmethod
+    def from_inductors(cls, inductors):
+        """Designs of a list of Inductor instances (their parameters before the
+        temperature model)."""
+        return cls(**dict((name, [inductor.batch_param(name) for inductor in inductors])
+                          for name in BATCH_PARAMS))
+
+    @classmethod
+    def from_csv(cls, path_or_file, material=None, **params):
+        """
+        Read designs from a CSV file with a header of parameter names, in SI units. A
+        'material' column of MATERIALS names may replace the material parameters; params
+        supply parameters the file doesn't have.
+        """
+        if hasattr(path_or_file, 'read'):
+            rows = list(csv.DictReader(path_or_file))
+        else:
+            with open(path_or_file) as f:
+                rows = list(csv.DictReader(f))
+
+        columns = dict((name, [row[name] for row in rows])
+                       for name in (rows[0] if rows else ()))
+        if 'material' in columns:
+            names = columns.pop('material')
+            for name in MATERIALS[names[0]] if names else ():
+                columns[name] = [MATERIALS[material_name][name] for material_name in names]
+        params.update(columns)
+
+        return cls(material, **params)
+
+    def to_csv(self, path_or_file):
+        """Write all the columns (scalars repeated) as CSV with a header."""
+        out, owned = open_output(path_or_file)
+        try:
+            writer = csv.writer(out, lineterminator='\n')
+            writer.writerow(BATCH_PARAMS)
+            columns = [self.column(name) for name in BATCH_PARAMS]
+            for i in range(self.size):
+                writer.writerow([repr(float(column[i])) for column in columns])
+        finally:
+            if owned:
+                out.close()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if not -self.size <= index < self.size:
+                raise IndexError('design index out of range')
+            return DesignView(self, index % self.size)
+
+        designs = DesignSet.__new__(DesignSet)
+        designs.columns = dict((name, value[index] if value.ndim else value)
+                               for name, value in self.columns.items())
+        sizes = [len(value) for value in designs.columns.values() if value.ndim]
+        designs.size = sizes[0] if sizes else len(np.empty(self.size)[index])
+        return designs
+
+    def __iter__(self):
+        return (self[i] for i in range(self.size))
+
+    def column(self, name):
+        """Values of a parameter for every design (a read-only view for shared scalars)."""
+        return np.broadcast_to(self.columns[name], (self.size,))
+
+    def get(self, name, index):
+        value = self.columns[name]
+        return float(value[index] if value.ndim else value)
+
+    def set(self, name, index, value):
+        """
+        Set a parameter of one design. A shared parameter gets its own column first, which
+        is not seen by the set this one was sliced from (if any).
+        """
+        if name not in self.columns:
+            raise TypeError('unknown design parameter %s' % name)
+        if not self.columns[name].ndim:
+            self.columns[name] = np.full(self.size, self.columns[name])
+        self.columns[name][index] = value
+
+    def analyze(self, outputs=None, table=None):
+        """
+        Analyze all designs (with the temperature model applied element-wise) and return a
+        dict of arrays with one value per design, along with the 'ok' mask (see
+        PyInductor.batch.analyze_batch()).
+        """
+        results = analyze_batch(*effective_inputs(self.columns.__getitem__),
+                                outputs=outputs, table=table)
+        # a set whose columns are all shared still has one result per design
+        return dict((name, np.broadcast_to(value, (self.size,)) if np.ndim(value) == 0
+                     else value) for name, value in results.items())
+
+
+class DesignView(Inductor):
+    """
+    Inductor whose parameters are one row of a DesignSet: reading them reads the set and
+    setting them writes it. Everything else (cache, profile, warm start state) belongs to
+    the view.
+    """
+
+    def __init__(self, designs, index, **kwargs):
+        self.designs = designs
+        self.index = index
+        self.set_params(**kwargs)
+
+
+def _column_property(name):
+    def get(self):
+        return self.designs.get(name, self.index)
+
+    def set(self, value):
+        self.designs.set(name, self.index, value)
+
+    return property(get, set, doc='%s of the design (a DesignSet column)' % name)
+
+
+for _name in BATCH_PARAMS:
+    setattr(DesignView, '_' + _name if _name in _RAW_PARAMS else _name, _column_property(_name))
+
+
+__all__ = ['DesignSet', 'DesignView', 'REQUIRED_PARAMS']
@@ -0,0 +1,227 @@
+from __future__ import division
+
+import numpy as np
+
+from collections import namedtuple
+from math import pi
+from scipy.constants import c
+from scipy.optimize import brentq
+from scipy.special import kve, ive
+
+
+# relative step size at which the Newton iteration is considered converged
+DISPERSION_RTOL = 1e-13
+DISPERSION_MAXITER = 50
+
+# relative tolerance of the self-resonant frequency root
+RESONANCE_RTOL = 1e-12
+RESONANCE_MAXITER = 100
+
+DispersionResult = namedtuple('DispersionResult', ['root', 'iterations', 'converged'])
+
+
+def _bessel_products(x):
+    # products of modified Bessel functions of the first and second kind; the exponential
+    # scaling of kve and ive cancels out, so this doesn't overflow for large arguments
+    i0, i1 = ive(0, x), ive(1, x)
+    k0, k1 = kve(0, x), kve(1, x)
+
+    return i0 * k0, i1 * k1, i0 * k1 - i1 * k0
+
+
+def helix_dispersion(h, a, psi, k0):
+    '''
+    Sheath helix dispersion relation, zero at the radial wave number h of a helix with
+    radius a and pitch angle psi at free space wave number k0.
+    '''
+    with np.errstate(all='ignore'):
+        i0k0, i1k1, _ = _bessel_products(h * a)
+        return i1k1 / i0k0 - (h / k0 * np.tan(psi)) ** 2
+
+
+def helix_dispersion_prime(h, a, psi, k0):
+    '''
+    The dispersion relation and its derivative with respect to h.
+    '''
+    x = h * a
+    tan_psi = np.tan(psi)
+
+    with np.errstate(all='ignore'):
+        i0k0, i1k1, cross = _bessel_products(x)
+        ratio = i1k1 / i0k0
+        # d/dx (I1 K1) / (I0 K0), from I0' = I1, K0' = -K1, I1' = I0 - I1 / x and
+        # K1' = -K0 - K1 / x
+        ratio_prime = (cross * (1 + ratio) - 2 * i1k1 / x) / i0k0
+
+        f = ratio - (h / k0 * tan_psi) ** 2
+        f_prime = a * ratio_prime - 2 * h * (tan_psi / k0) ** 2
+
+    return f, f_prime
+
+
+def bessel_i0k0(x):
+    '''
+    I0(x) * K0(x), as needed by the characteristic impedance.
+    '''
+    return ive(0, x) * kve(0, x)
+
+
+def h2beta(h, k0):
+    return np.hypot(k0, h)
+
+
+def root_bound(psi, k0):
+    '''
+    Upper bound of the dispersion root: the Bessel ratio is below 1, so the root satisfies
+    h < k0 / tan(psi).
+    '''
+    return k0 / np.tan(psi)
+
+
+def solve_dispersion(a, psi, k0, h0=None, rtol=DISPERSION_RTOL, maxiter=DISPERSION_MAXITER,
+                     full_output=False):
+    '''
+    Find the radial wave number h of the helix dispersion relation with a safeguarded
+    Newton iteration (analytic derivative, falling back to bisection whenever a step leaves
+    the bracket [0, k0 / tan(psi)] that always contains the root). Works element-wise on
+    arrays.
+
+    h0 is an optional starting point, e.g. the root of a similar design; by default the
+    iteration starts from 0.9 * k0 / tan(psi). Returns the root, or a DispersionResult with
+    the (per element) iteration counts and convergence flags if full_output is set. Raises
+    RuntimeError if a scalar problem doesn't converge; arrays report failures through the
+    'converged' mask (and NaN roots) instead.
+    '''
+    scalar = np.ndim(a) == 0 and np.ndim(psi) == 0 and np.ndim(k0) == 0 and np.ndim(h0) == 0
+    a, psi, k0 = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (a, psi, k0)])
+
+    hi = root_bound(psi, k0)
+    lo = np.zeros_like(hi)
+    if h0 is None:
+        h = 0.9 * hi
+    else:
+        h = np.array(np.broadcast_to(h0, hi.shape), dtype=float)
+        h = np.where((h > 0) & (h < hi), h, 0.9 * hi)
+
+    iterations = np.zeros(hi.shape, dtype=int)
+    converged = np.zeros(hi.shape, dtype=bool)
+    # anything that doesn't give a positive bracket can't be solved
+    active = (hi > 0) & np.isfinite(hi) & (a > 0)
+    h = np.where(active, h, np.nan)
+
+    for _ in range(maxiter):
+        if not active.any():
+            break
+
+        f, f_prime = helix_dispersion_prime(h, a, psi, k0)
+        iterations += active
+
+        # f decreases through the root: keep the bracket up to date
+        lo = np.where(active & (f > 0), h, lo)
+        hi = np.where(active & (f < 0), h, hi)
+
+        with np.errstate(all='ignore'):
+            h_new = h - f / f_prime
+        done = active & ((np.abs(h_new - h) <= rtol * np.abs(h)) | (f == 0))
+
+        bisect = ~((h_new > lo) & (h_new < hi))
+        h_new = np.where(bisect & ~done, (lo + hi) / 2, h_new)
+
+        h = np.where(active & (f != 0), h_new, h)
+        converged |= done
+        active &= ~done & np.isfinite(h)
+
+    h = np.where(converged, h, np.nan)
+
+    if scalar:
+        if not converged:
+            raise RuntimeError('dispersion solver failed to converge after %d iterations'
+                               % iterations)
+        h, iterations, converged = float(h), int(iterations), bool(converged)
+
+    if full_output:
+        return DispersionResult(h, iterations, converged)
+    return h
+
+
+def resonance_residual(w, len_coil, a, psi):
+    '''
+    Dispersion relation of the quarter wave resonance (beta = pi / 2 / len_coil) at angular
+    frequency w; its sign change marks the self-resonant frequency.
+    '''
+    B_res = (pi / 2) / len_coil
+    k0 = w / c
+    with np.errstate(invalid='ignore'):
+        h = np.sqrt(B_res**2 - k0**2)
+
+    return helix_dispersion(h, a, psi, k0)
+
+
+def resonance_bracket(len_wire_eff):
+    '''
+    Angular frequency range searched for the self-resonance, in terms of the wire length.
+    '''
+    return c / len_wire_eff / 40, c / len_wire_eff * pi / 2
+
+
+def solve_res_freq(len_coil, len_wire_eff, a, psi, rtol=RESONANCE_RTOL,
+                   maxiter=RESONANCE_MAXITER):
+    '''
+    Angular self-resonant frequency: the root of resonance_residual() within
+    resonance_bracket(), found with Brent's method for scalars and with a vectorized Illinois
+    (modified regula falsi) iteration for arrays. If the residual doesn't change sign in the
+    bracket, the end point with the smaller residual is returned, which is where the bounded
+    minimization of the squared residual used in the past ended up.
+    '''
+    lo, hi = resonance_bracket(len_wire_eff)
+    f_lo = resonance_residual(lo, len_coil, a, psi)
+    f_hi = resonance_residual(hi, len_coil, a, psi)
+
+    if np.ndim(f_lo) == 0:
+        if f_lo * f_hi < 0:
+            return brentq(resonance_residual, lo, hi, args=(len_coil, a, psi), rtol=rtol,
+                          maxiter=maxiter)
+        return lo if abs(f_lo) < abs(f_hi) else hi
+
+    bracketed = f_lo * f_hi < 0
+    w = np.where(np.abs(f_lo) < np.abs(f_hi), lo, hi)
+
+    idx = np.flatnonzero(bracketed)
+    a, psi, len_coil = [np.broadcast_to(v, bracketed.shape).flat[idx]
+                        for v in (a, psi, len_coil)]
+    lo, hi, f_lo, f_hi = [v.flat[idx] for v in (lo, hi, f_lo, f_hi)]
+    side = np.zeros(idx.shape, dtype=int)
+    w_prev = lo
+
+    for _ in range(maxiter):
+        if not idx.size:
+            break
+
+        w_new = (lo * f_hi - hi * f_lo) / (f_hi - f_lo)
+        f_new = resonance_residual(w_new, len_coil, a, psi)
+
+        # replace the end point with the same sign; halve the retained end point's residual
+        # if it is retained twice in a row (Illinois)
+        right = f_new * f_hi > 0
+        left = ~right & (f_new * f_lo > 0)
+        f_lo = np.where(right & (side == -1), f_lo / 2, f_lo)
+        f_hi = np.where(left & (side == 1), f_hi / 2, f_hi)
+        hi, f_hi = np.where(right, w_new, hi), np.where(right, f_new, f_hi)
+        lo, f_lo = np.where(left, w_new, lo), np.where(left, f_new, f_lo)
+        side = np.where(right, -1, np.where(left, 1, 0))
+
+        done = ~(right | left) | (np.abs(w_new - w_prev) <= rtol * np.abs(w_new))
+        w.flat[idx[done]] = w_new[done]
+
+        keep = ~done
+        idx, lo, hi, f_lo, f_hi, side = (v[keep] for v in (idx, lo, hi, f_lo, f_hi, side))
+        a, psi, len_coil, w_prev = a[keep], psi[keep], len_coil[keep], w_new[keep]
+
+    # anything left didn't converge
+    w.flat[idx] = np.nan
+
+    return w
+
+
+__all__ = ['helix_dispersion', 'helix_dispersion_prime', 'bessel_i0k0', 'h2beta',
+           'solve_dispersion', 'DispersionResult', 'resonance_residual', 'solve_res_freq']
@@ -0,0 +1,189 @@
+from __future__ import division
+
+import argparse
+import math
+import os
+
+import numpy as np
+
+from PyInductor.dispersion import (DispersionResult, helix_dispersion_prime, root_bound,
+                                   solve_dispersion)
+
+
+# log10 of the range of u = k0 * a / tan(psi) covered by the table, and its size
+LOG_U_RANGE = (-8., 8.)
+TABLE_POINTS = 2049
+
+# where DispersionTable.load() looks for (and saves) the table by default
+TABLE_PATH = os.environ.get('PYINDUCTOR_DISPERSION_TABLE', os.path.join(
+    os.path.expanduser('~'), '.cache', 'PyInductor', 'dispersion_table.npy'))
+
+
+def build_table(log_u_range=LOG_U_RANGE, points=TABLE_POINTS):
+    '''
+    Tabulate the dispersion root. With x = h * a the dispersion relation reads
+    I1 K1 / I0 K0 (x) = (x / u)**2, u = k0 * a / tan(psi), so the root only depends on u;
+    the table holds log(u), the ratio g = x / u = h / (k0 / tan(psi)) of the root to its
+    upper bound and the slope dg / dlog(u) (from implicit differentiation), as rows of a
+    (3, points) array.
+    '''
+    log_u = np.linspace(np.log(10) * log_u_range[0], np.log(10) * log_u_range[1], points)
+    u = np.exp(log_u)
+
+    # a = 1 and psi = 45 degrees, so that k0 = u and x = h
+    x = solve_dispersion(1., np.pi / 4, u)
+    _, f_prime = helix_dispersion_prime(x, 1., np.pi / 4, u)
+    dx_du = -(2 * x**2 / u**3) / f_prime
+    ratio = x / u
+
+    return np.array([log_u, ratio, dx_du - ratio])
+
+
+class DispersionTable(object):
+    """
+    Surrogate of solve_dispersion(): cubic Hermite interpolation of the tabulated root ratio
+    (see build_table()), optionally followed by Newton steps on the exact dispersion relation.
+    With the default table the interpolation alone is accurate to better than 1e-9
+    (relative),
+    and a single Newton step brings that to the accuracy of the exact solver (see
+    validate()). Points outside the table are solved exactly.
+
+    Parameters:
+    table (array): Table as returned by build_table() (or a memory-mapped .npy of it)
+    polish (int): Number of Newton steps after the interpolation
+    """
+
+    def __init__(self, table=None, polish=1):
+        self.table = build_table() if table is None else table
+        self.polish = polish
+
+        log_u = self.table[0]
+        self._start = float(log_u[0])
+        self._step = float(log_u[1] - log_u[0])
+        self._size = len(log_u)
+
+    @classmethod
+    def load(cls, path=TABLE_PATH, polish=1):
+        """Memory-map the table at path, building and saving it first if it doesn't exist."""
+        if not os.path.exists(path):
+            save_table(path)
+        return cls(np.load(path, mmap_mode='r'), polish=polish)
+
+    def ratio(self, u):
+        """Interpolated root ratio at u (NaN outside the table)."""
+        t = (np.log(u) - self._start) / self._step
+        i = np.clip(np.floor(np.nan_to_num(t)).astype(int), 0, self._size - 2)
+        t = t - i
+
+        g0, g1 = self.table[1, i], self.table[1, i + 1]
+        d0, d1 = self.table[2, i] * self._step, self.table[2, i + 1] * self._step
+        c2 = -3 * g0 + 3 * g1 - 2 * d0 - d1
+        c3 = 2 * g0 - 2 * g1 + d0 + d1
+        ratio = g0 + t * (d0 + t * (c2 + t * c3))
+
+        return np.where((t >= 0) & (t <= 1), ratio, np.nan)
+
+    def _scalar_ratio(self, u):
+        t = (math.log(u) - self._start) / self._step
+        if not 0 <= t <= self._size - 1:
+            return float('nan')
+        i = min(int(t), self._size - 2)
+        t -= i
+
+        g0, g1 = float(self.table[1, i]), float(self.table[1, i + 1])
+        d0, d1 = float(self.table[2, i]) * self._step, float(self.table[2, i + 1]) * self._step
+        c2 = -3 * g0 + 3 * g1 - 2 * d0 - d1
+        c3 = 2 * g0 - 2 * g1 + d0 + d1
+        return g0 + t * (d0 + t * (c2 + t * c3))
+
+    def solve(self, a, psi, k0, full_output=False):
+        """Drop-in replacement of solve_dispersion() (see it for the arguments)."""
+        scalar = np.ndim(a) == 0 and np.ndim(psi) == 0 and np.ndim(k0) == 0
+        if scalar and not isinstance(a, np.ndarray) and not isinstance(k0, np.ndarray):
+            h = self._solve_scalar(float(a), float(psi), float(k0))
+            if h is not None:
+                return DispersionResult(h, self.polish, True) if full_output else h
+
+        a, psi, k0 = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (a, psi, k0)])
+
+        h_max = root_bound(psi, k0)
+        with np.errstate(all='ignore'):
+            h = self.ratio(h_max * a) * h_max
+            for _ in range(self.polish):
+                f, f_prime = helix_dispersion_prime(h, a, psi, k0)
+                h = h - f / f_prime
+
+        h = np.array(h, dtype=float)
+        iterations = np.full(h.shape, self.polish)
+        converged = np.array(np.isfinite(h) & (h > 0))
+
+        outside = ~converged
+        if outside.any():
+            exact = solve_dispersion(a[outside], psi[outside], k0[outside], full_output=True)
+            h[outside] = exact.root
+            iterations[outside] = exact.iterations
+            converged[outside] = exact.converged
+
+        if scalar:
+            if not converged:
+                raise RuntimeError('dispersion solver failed to converge')
+            h, iterations, converged = float(h), int(iterations), bool(converged)
+
+        if full_output:
+            return DispersionResult(h, iterations, converged)
+        return h
+
+    def _solve_scalar(self, a, psi, k0):
+        # pure Python up to the Newton steps; None if the table doesn't cover the point
+        h_max = k0 / math.tan(psi)
+        h = self._scalar_ratio(h_max * a) * h_max
+        for _ in range(self.polish):
+            f, f_prime = helix_dispersion_prime(h, a, psi, k0)
+            h = h - f / f_prime
+
+        h = float(h)
+        return h if h > 0 and h < float('inf') else None
+
+    def validate(self, samples=100000, seed=0):
+        '''
+        Largest relative errors of the interpolated roots, without and with the Newton
+        polish, against the exact solver at random points within the table.
+        '''
+        log_u = np.random.RandomState(seed).uniform(self.table[0, 0], self.table[0, -1],
+                                                    samples)
+        u = np.exp(log_u)
+        exact = solve_dispersion(1., np.pi / 4, u)
+
+        direct = DispersionTable(self.table, polish=0).solve(1., np.pi / 4, u)
+        polished = self.solve(1., np.pi / 4, u)
+
+        return (float(np.max(np.abs(direct / exact - 1))),
+                float(np.max(np.abs(polished / exact - 1))))
+
+
+def save_table(path=TABLE_PATH, log_u_range=LOG_U_RANGE, points=TABLE_POINTS):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    np.save(path, build_table(log_u_range, points))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regenerate and validate the dispersion '
+                                                 'root table.')
+    parser.add_argument('path', nargs='?', default=TABLE_PATH)
+    parser.add_argument('--points', type=int, default=TABLE_POINTS)
+    parser.add_argument('--samples', type=int, default=100000)
+    args = parser.parse_args()
+
+    save_table(args.path, points=args.points)
+    direct, polished = DispersionTable.load(args.path).validate(args.samples)
+    print('%s: max. relative error %.3g (interpolated), %.3g (one Newton step)'
+          % (args.path, direct, polished))
+
+
+__all__ = ['DispersionTable', 'build_table', 'save_table', 'TABLE_PATH']
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+from __future__ import division
+
+import pickle
+import sys
+import time
+
+from collections import namedtuple
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+
+
+BACKENDS = ('auto', 'serial', 'thread', 'process')
+
+# wall time (seconds) a batch of items sent to a worker should take
+TARGET_BATCH_TIME = 0.2
+
+# 'auto' runs in-process if the remaining work is estimated to take less than this (seconds)
+POOL_STARTUP_TIME = 0.5
+
+# progress of a run: items and evaluations (item weights) done, and the throughput so far
+Progress = namedtuple('Progress', ['items', 'total_items', 'evaluations', 'total_evaluations',
+                                   'elapsed', 'rate', 'eta'])
+
+
+def _run_item(task):
+    """Evaluate one item in a worker: returns its index, the result and the time taken."""
+    func, index, item = task
+    t_start = time.time()
+    result = func(item)
+    return index, result, time.time() - t_start
+
+
+def print_progress(progress, out=None):
+    """Progress callback writing a status line (evaluations/s, ETA) to stderr."""
+    out = sys.stderr if out is None else out
+    out.write('\r%d/%d items, %.4g evaluations/s, ETA %.1f s ' % (
+        progress.items, progress.total_items, progress.rate, progress.eta))
+    if progress.items == progress.total_items:
+        out.write('\n')
+    out.flush()
+
+
+class Executor(object):
+    """
+    Worker pool for the solvers, kept alive across runs (use it as a context manager, or
+    close() it) so that the worker start-up, including their imports, is paid once. Worker
+    processes get the static parameters of a run from the pool initializer, so a run with
+    other ones than the previous run restarts them.
+
+    Every run measures the time its items take; the estimate (per evaluation, i.e. per unit
+    of item weight, and per function) sets the number of items sent to a worker at a time
+    so that each batch takes about TARGET_BATCH_TIME, and lets the 'auto' backend run small
+    jobs in-process, where starting a pool would take longer than the work itself.
+
+    Parameters:
+    backend (str): 'process' (worker processes), 'thread' (worker threads, worthwhile when
+                   the work is in NumPy routines that release the GIL), 'serial' (in-process)
+                   or 'auto' ('serial' for small jobs and one worker, 'process' otherwise)
+    workers (int): Number of workers; if set to zero, it defaults to number of available
+                   CPUs minus one
+    """
+
+    def __init__(self, backend='auto', workers=0):
+        if backend not in BACKENDS:
+            raise ValueError('backend must be one of %s' % ', '.join(BACKENDS))
+
+        self.backend = backend
+        self.workers = workers or max(cpu_count() - 1, 1)
+        self.cost = {}
+        self._pool = None
+        self._init = None
+
+    def pool(self, initializer=None, initargs=()):
+        """
+        The worker pool, started on first use. Worker processes run initializer(*initargs)
+        as they start, so a process pool started with other ones is replaced; worker threads
+        share the state of this process and are left to the caller to initialize.
+        """
+        if self.backend == 'thread':
+            if self._pool is None:
+                self._pool = ThreadPool(self.workers)
+            return self._pool
+
+        init = pickle.dumps((initializer, initargs), pickle.HIGHEST_PROTOCOL)
+        if self._pool is not None and init != self._init:
+            self.close()
+        if self._pool is None:
+            self._pool = Pool(self.workers, initializer, initargs)
+            self._init = init
+        return self._pool
+
+    def imap(self, func, items, initializer=None, initargs=(), weights=None, chunksize=None,
+             progress=None, ordered=False):
+        """
+        Generate func(item) for every item, in completion order unless 'ordered' is set.
+
+        Parameters:
+        func (function): Module level function of one item (picklable for processes)
+        items (list): Items to evaluate
+        initializer (function): Called with initargs before the items are evaluated (e.g. to
+                                set the static parameters): once in every worker process,
+                                or once in this process for the other backends
+        weights (list): Number of evaluations per item, for the cost estimate and progress
+                        (default: 1 each)
+        chunksize (int): Items sent to a worker at a time (default: from the measured cost)
+        progress (function): Called with a Progress record after every item
+        """
+        items = list(items)
+        weights = [1] * len(items) if weights is None else list(weights)
+        tasks = [(func, i, item) for i, item in enumerate(items)]
+
+        start = time.time()
+        done = [0, 0]
+        total = sum(weights)
+
+        def finish(index, seconds):
+            done[0] += 1
+            done[1] += weights[index]
+            if weights[index]:
+                cost = self.cost.get(func)
+                unit = seconds / weights[index]
+                self.cost[func] = unit if cost is None else 0.8 * cost + 0.2 * unit
+
+            if progress is not None:
+                elapsed = time.time() - start
+                rate = done[1] / elapsed if elapsed > 0 else float('inf')
+                eta = (total - done[1]) / rate if rate > 0 else float('inf')
+                progress(Progress(done[0], len(items), done[1], total, elapsed, rate, eta))
+
+        backend = self.backend
+        initialized = False
+        if backend == 'auto':
+            # without an estimate yet, the first item is timed in-process to choose between
+            # the backends
+            if tasks and func not in self.cost:
+                if initializer is not None:
+                    initializer(*initargs)
+                initialized = True
+                index, result, seconds = _run_item(tasks.pop(0))
+                finish(index, seconds)
+                yield result
+
+            remaining = sum(weights[task[1]] for task in tasks) * self.cost.get(func, 0)
+            backend = 'process'
+            if self.workers == 1 or len(tasks) <= 1 or \
+                    (self._pool is None and remaining < POOL_STARTUP_TIME):
+                backend = 'serial'
+
+        if not tasks:
+            return
+        if backend != 'process' and initializer is not None and not initialized:
+            initializer(*initargs)
+
+        if backend == 'serial':
+            for task in tasks:
+                index, result, seconds = _run_item(task)
+                finish(index, seconds)
+                yield result
+            return
+
+        if chunksize is None:
+            mean_weight = sum(weights) / len(weights)
+            per_item = max(self.cost.get(func, 0) * mean_weight, 1e-9)
+            chunksize = max(1, min(int(TARGET_BATCH_TIME / per_item),
+                                   -(-len(tasks) // (4 * self.workers))))
+
+        pool = self.pool(initializer, initargs) if backend == 'process' else self.pool()
+        if ordered:
+            results = pool.imap(_run_item, tasks, chunksize)
+        else:
+            results = pool.imap_unordered(_run_item, tasks, chunksize)
+        for index, result, seconds in results:
+            finish(index, seconds)
+            yield result
+
+    def close(self):
+        """Let the workers finish and stop them."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def terminate(self):
+        """Stop the workers right away (abandoning any items in flight)."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+__all__ = ['Executor', 'Progress', 'print_progress', 'BACKENDS']
@@ -1,20 +1,40 @@
 from __future__ import division
 
 import numpy as np
-from PyInductor.data import MATERIALS, proximity_factor
-from scipy.special import kn, iv
-from scipy.constants import mu_0, c
+from PyInductor.adaptive import adaptive_sweep, adaptive_surface, ADAPTIVE_OUTPUTS
+from PyInductor.data import MATERIALS
+from PyInductor.batch import analyze_batch
+from PyInductor.model import Analysis, output_names
+from PyInductor.optimize import optimize_design
+from PyInductor.jacobian import jacobian
+from PyInductor.montecarlo import monte_carlo
+from PyInductor.profiling import profiled
+from PyInductor.sweep import (temperature_sweep, frequency_sweep, SWEEP_OUTPUTS,
+                              TEMPERATURE_STEP, FREQUENCY_OUTPUTS)
+# formerly defined here
+from PyInductor.dispersion import helix_dispersion  # noqa: F401
 # from pylab import *
-from scipy.optimize import newton, minimize_scalar
+from scipy.optimize import minimize_scalar
 # from scipy.optimize import fminbound
-from scipy.misc import derivative
-from math import pi, sqrt
 
 
 class Inductor(object):
     mu_r_core = 1
     temperature = 25
 
+    # start the dispersion solver from the previous root (scaled to the new design)
+    warm_start = True
+    # DispersionResult of the last analysis (root, iteration count, convergence flag)
+    dispersion_info = None
+    _root_ratio = None
+    # optional AnalysisCache (see PyInductor.cache) used by analyze()
+    cache = None
+    # optional DispersionTable (see PyInductor.dispersion_table) replacing the exact
+    # dispersion solver
+    dispersion_table = None
+    # optional Profile (see PyInductor.profiling) recording the stages of the analyses
+    profile = None
+
     def __init__(self, **kwargs):
         self.set_params(**kwargs)
 
@@ -24,16 +44,18 @@ class Inductor(object):
         for param, value in kwargs.items():
             setattr(self, param, value)
 
+    @profiled('tune_parameter')
     def tune_parameter(self, input_param_name, output_target_val, input_range=(0, np.inf),
                        output_param_name='Ls_eff', percent_tol=1):
-        # TODO: extra parameter to optimize
         '''
         Vary parameter 'input_param_name' so that output 'output_param_name' achieves
-        a value of 'output_target_val'.
+        a value of 'output_target_val' (see optimize() for several parameters).
         '''
         def objective(value):
             setattr(self, input_param_name, value)
-            val = (1e9 * self.analyze()[output_param_name] - 1e9 * output_target_val) ** 2
+            # only the output being tuned is computed
+            output_val = self.analyze(output_param_name)[output_param_name]
+            val = (1e9 * output_val - 1e9 * output_target_val) ** 2
 
             return val
 
@@ -42,35 +64,40 @@ class Inductor(object):
 
         setattr(self, input_param_name, new_param_value)
 
-        error = 100 * (self.analyze()[output_param_name] - output_target_val) / output_target_val
+        output_val = self.analyze(output_param_name)[output_param_name]
+        error = 100 * (output_val - output_target_val) / output_target_val
         if abs(error) > percent_tol:
             raise Exception('achieved error of %0.2f %% does not meet requirement' % error)
 
         return new_param_value
 
+    def optimize(self, variables, apply=True, **kwargs):
+        '''
+        Vary several parameters at once, e.g.
+
+            ind.optimize({'len_coil': (5e-3, 2e-2), 'N': (3, 20)}, targets={'Ls_eff': 100e-9},
+                         maximize=['Q_eff'], constraints={'res_freq': (50e6, None)})
+
+        with whole populations of candidates analyzed per batch (see
+        PyInductor.optimize.optimize_design() for the keyword arguments). The best
+        parameters are set on the inductor if 'apply' is set and they meet the constraints.
+        Returns a DesignResult.
+        '''
+        result = optimize_design(self, variables, **kwargs)
+        if apply and result.feasible:
+            self.set_params(**result.params)
+
+        return result
+
     def temperature_expan_factor(self):
         dT = (self.temperature - self.reference_temperature)
         return (1 + self.temp_coeff_expan * dT)
 
     @property
     def diam_former(self):
-        dT = (self.temperature - self.reference_temperature)
-        diam_coil = self._diam_former + self._diam_wire
-        wire_len_squared = self.len_coil**2 + (np.pi * self.N * diam_coil) ** 2
-        scale_factor = 1 + dT * self.temp_coeff_expan * wire_len_squared / (
-            wire_len_squared - self.len_coil ** 2)
-
-        # new_diam = self._diam_former + (
-        #     self.len_coil / np.pi / self.N) ** 2 * self.temp_coeff_expan * dT / (
-        #     self._diam_former + self._diam_wire)
-        new_diam = diam_coil * scale_factor - self.diam_wire
-        # new_diam2 = self._diam_former * self.temperature_expan_factor()
-
-        # print('old diam {}'.format(self._diam_former))
-        # print('new diam {}'.format(new_diam))
-        # print('new diam2 {}'.format(new_diam2))
-
-        return new_diam
+        return expanded_diam_former(self._diam_former, self._diam_wire, self.diam_wire,
+                                    self.len_coil, self.N, self.temp_coeff_expan,
+                                    self.temperature - self.reference_temperature)
 
     @diam_former.setter
     def diam_former(self, value):
@@ -86,170 +113,188 @@ class Inductor(object):
 
     @property
     def rho(self):
-        temp_factor = (1 + self.temp_coeff_rho * (self.temperature - self.rho_t0))
-        return self._rho * temp_factor
+        return heated_rho(self._rho, self.temp_coeff_rho, self.temperature, self.rho_t0)
 
     @rho.setter
     def rho(self, value):
         self._rho = value
 
     def sensitivity(self, input_name, output_name='Ls_eff', delta=0.01, normalize=True):
-        old_p = getattr(self, input_name)
-        d_in = delta * old_p
+        '''
+        Sensitivity of one output to one input (see jacobian()).
+        '''
+        return float(self.jacobian([input_name], [output_name], delta=delta,
+                                   normalize=normalize).values[0, 0])
 
-        def _func(value):
-            setattr(self, input_name, value)
+    def jacobian(self, inputs=None, outputs=None, delta=0.01, normalize=True, order=3,
+                 analytic=True):
+        '''
+        Sensitivities of every output to every input, from one batch of perturbed designs.
+        Returns a Jacobian with the matrix and its input and output names (see
+        PyInductor.jacobian.jacobian() for the arguments).
+        '''
+        return jacobian(self, inputs=inputs, outputs=outputs, delta=delta,
+                        normalize=normalize, order=order, analytic=analytic)
 
-            return self.analyze()[output_name]
+    def monte_carlo(self, tolerances, specs=None, **kwargs):
+        '''
+        Yield and output statistics under manufacturing tolerances, e.g.
 
-        d_out_d_in = derivative(_func, old_p, dx=d_in, order=3)
-        setattr(self, input_name, old_p)
+            ind.monte_carlo({'diam_wire': Normal(0.01), 'len_coil': Uniform(0.02)},
+                            specs={'Ls_eff': (48e-9, 52e-9), 'Q_eff': (80, None)})
 
-        if normalize:
-            s = (d_out_d_in) * old_p / (self.analyze()[output_name])
-        else:
-            s = d_out_d_in / (self.analyze()[output_name])
+        Returns a MonteCarloResult (see PyInductor.montecarlo.monte_carlo() for the keyword
+        arguments).
+        '''
+        return monte_carlo(self, tolerances, specs=specs, **kwargs)
 
-        return s
+    def temperature_sweep(self, temperatures, outputs=SWEEP_OUTPUTS, step=TEMPERATURE_STEP):
+        '''
+        Outputs and their temperature coefficients (ppm/degree) over an array of
+        temperatures, from one batch (see PyInductor.sweep.temperature_sweep()).
+        '''
+        return temperature_sweep(self, temperatures, outputs=outputs, step=step)
+
+    def frequency_sweep(self, frequencies, outputs=FREQUENCY_OUTPUTS, warm_start=True):
+        '''
+        Outputs and impedance over an array of frequencies, with the geometry computed once
+        (see PyInductor.sweep.frequency_sweep()). The result can be saved as a Touchstone
+        file with its write_touchstone() method.
+        '''
+        return frequency_sweep(self, frequencies, outputs=outputs, warm_start=warm_start)
+
+    def adaptive_sweep(self, param, bounds, outputs=ADAPTIVE_OUTPUTS, tune=None, **kwargs):
+        '''
+        Outputs over a range of one parameter, with the samples concentrated where they
+        change abruptly, e.g.
+
+            ind.adaptive_sweep('N', (5, 10), ['Q_eff', 'res_freq'],
+                               tune=('len_coil', 200e-9, (1e-3, 1)))
+
+        Returns an AdaptiveCurve (see PyInductor.adaptive.adaptive_sweep()).
+        '''
+        return adaptive_sweep(self, param, bounds, outputs=outputs, tune=tune, **kwargs)
+
+    def adaptive_surface(self, params, bounds, outputs=ADAPTIVE_OUTPUTS, tune=None, **kwargs):
+        '''
+        Two-parameter version of adaptive_sweep(), refining cells of the parameter plane
+        (see PyInductor.adaptive.adaptive_surface()).
+        '''
+        return adaptive_surface(self, params, bounds, outputs=outputs, tune=tune, **kwargs)
+
+    def batch_param(self, name):
+        '''
+        Value of a parameter as analyze_batch() sees it, i.e. before the temperature model.
+        '''
+        if name not in BATCH_PARAMS:
+            raise TypeError('cannot vectorize over %s' % name)
+        return getattr(self, '_' + name if name in ('diam_former', 'diam_wire', 'rho') else name)
+
+    @profiled('analyze_batch')
+    def analyze_batch(self, outputs=None, **arrays):
+        '''
+        Vectorized version of analyze(): every keyword argument replaces the corresponding
+        parameter with an array (e.g. N=np.arange(5, 10), len_coil=...), broadcast against
+        the other ones. The temperature model is applied element-wise and the instance is
+        left untouched.
+
+        Returns a dict of arrays (see PyInductor.batch.analyze_batch(), which also explains
+        'outputs').
+        '''
+        def param(name):
+            if name in arrays:
+                return np.asarray(arrays[name], dtype=float)
+            return self.batch_param(name)
+
+        unknown = set(arrays) - set(BATCH_PARAMS)
+        if unknown:
+            raise TypeError('cannot vectorize over %s' % ', '.join(sorted(unknown)))
+
+        return analyze_batch(*effective_inputs(param), outputs=outputs,
+                             table=self.dispersion_table)
 
     @property
     def turn_spacing(self):
         return self.len_coil / self.N - self.diam_wire
 
-    def analyze(self, **new_params):
+    @profiled('analyze')
+    def analyze(self, outputs=None, **new_params):
+        '''
+        Analyze the inductor (after applying any new parameters) and return a dict of
+        outputs, by default all of them. 'outputs' can restrict this to a list of names;
+        the (comparatively expensive) self-resonant frequency is only computed when
+        'res_freq' is among them. With a cache set, repeated analyses of the same design
+        reuse the earlier one.
+        '''
+        outputs = output_names(outputs)
         if new_params:
             self.set_params(**new_params)
 
-        diam_coil = self.diam_former + self.diam_wire
+        # effective inputs, i.e. after the temperature model
+        inputs = (self.N, self.len_coil, self.diam_wire, self.diam_former, self.f, self.rho,
+                  self.mu_r, self.mu_r_core)
 
-        '''if self.N*self.diam_wire > self.len_coil:
-            raise Exception('physically unrealizable values (reduce self.N*self.diam_wire)')
+        def new_analysis():
+            # only the parts of the model that the selected outputs depend on are evaluated
+            return Analysis(*inputs, root_ratio=self._root_ratio if self.warm_start else None,
+                            table=self.dispersion_table)
 
-        if self.diam_wire > diam_coil:
-            raise Exception('physically unrealizable values (reduce self.diam_wire)')'''
+        if self.cache is None:
+            analysis = new_analysis()
+        else:
+            # the table is referenced by the cached analyses, so its id can't be reused while
+            # they exist
+            analysis = self.cache.get(inputs, new_analysis,
+                                      (id(self.dispersion_table), bool(self.warm_start)))
+        results = analysis.results(outputs)
 
-        pitch = self.len_coil / self.N
-        phi = proximity_factor(self.len_coil / diam_coil, self.diam_wire / pitch)
-        omega = 2 * np.pi * self.f
+        if analysis.is_computed('dispersion'):
+            # the root scales with its upper bound, which makes the previous one a good guess
+            self.dispersion_info = analysis.dispersion
+            self._root_ratio = analysis.h / analysis.root_bound
 
-        # effective diameter of coil
-        D_eff = diam_coil - self.diam_wire * (1 - 1 / np.sqrt(phi))
+        return results
 
-        # effective pitch angle
-        psi = np.arctan(pitch / (np.pi * D_eff))
 
-        # field non-uniformity correction factor according to Lundin
-        if D_eff >= self.len_coil:
-            k_L = (1 + 0.383901 * np.power(self.len_coil / D_eff, 2) + 0.017108 * np.power(
-                self.len_coil / D_eff, 4)) / (1 + 0.258952 * np.power(self.len_coil / D_eff, 2))
+# parameters that Inductor.analyze_batch() can vary element-wise
+BATCH_PARAMS = ('N', 'len_coil', 'diam_wire', 'diam_former', 'f', 'rho', 'mu_r', 'mu_r_core',
+                'temperature', 'reference_temperature', 'rho_t0', 'temp_coeff_rho',
+                'temp_coeff_expan')
 
-            k_L = k_L * (np.log(4 * D_eff / self.len_coil) - 0.5)
-            k_L += 0.093842 * np.power(self.len_coil / D_eff, 2) + 0.002029 * np.power(
-                self.len_coil / D_eff, 4) - 0.000801 * np.power(self.len_coil / D_eff, 6)
-            k_L *= (2 / np.pi) * (self.len_coil / D_eff)
-        else:
-            k_L = (1 + 0.383901 * np.power(D_eff / self.len_coil, 2) + 0.017108 * np.power(
-                D_eff / self.len_coil, 4)) / (1 + 0.258952 * np.power(D_eff / self.len_coil, 2))
-            k_L -= (4 / 3 / np.pi) * (D_eff / self.len_coil)
-
-        # round wire self-inductance correction factor according to Rosa
-        k_s = 5 / 4 - np.log(2 * pitch / self.diam_wire)
-
-        # round wire mutual-inductance correction factor according to Grover and Knight
-        k_m = -0.16725 / self.N + 0.0033 / self.N**2
-        k_m *= np.log(self.N)
-        k_m += 0.337883 * (1 - 0.9754 / (self.N - 0.0246))
-
-        # effective length of wire
-        len_wire_eff = np.hypot(self.N * np.pi * D_eff, self.len_coil)
-
-        # skin depth
-        sigma = 1 / self.rho
-        delta_i = 1 / np.sqrt(np.pi * self.f * mu_0 * self.mu_r * sigma)
-
-        # effective series AC resistance
-        Rs_eff = self.rho * len_wire_eff / (np.pi * (self.diam_wire * delta_i - delta_i ** 2)) * phi
-        if self.N > 1:
-            Rs_eff *= (self.N - 1) / self.N
-
-        # frequency-independent series inductance
-        Ls = self.mu_r_core * mu_0 * np.pi * (D_eff * self.N) ** 2 / 4 / self.len_coil * k_L
-        Ls -= self.mu_r_core * mu_0 * D_eff * self.N * (k_s + k_m) / 2
-
-        # numerically find radial wave number
-        k0 = omega / c
-        a = D_eff / 2
-
-        h1 = k0 / np.tan(psi) ** 2  # beta estimate
-        h2 = k0
-
-        def _func(h):
-            return helix_dispersion(h, a, psi, k0)
-        h = newton(_func, (h1 + h2) / 2)
-
-        # characteristic impedance
-        beta = h2beta(h, k0)
-        Z_0 = 60 / k0 * beta * iv(0, h * a) * kn(0, h * a)
-
-        # effective series inductance at design frequency
-        Leffs = Z_0 / omega * np.tan(beta * self.len_coil) * k_L
-        Leffs -= self.mu_r_core * mu_0 * D_eff * self.N * (k_s + k_m) / 2
-
-        # effective unloaded quality factor
-        Xeffs = omega * Leffs
-        Qeff = Xeffs / Rs_eff
-
-        # unloaded quality factor
-        Reffp = (Qeff**2 + 1) * Rs_eff
-        XLs = omega * Ls
-        RLs = (Reffp - np.sqrt(np.power(Reffp, 2) - 4 * np.power(XLs, 2))) / 2
-        QL = XLs / RLs
-
-        # parallel stray capacitance
-        XLp = (np.power(QL, 2) + 1) / np.power(QL, 2) * XLs
-        Xeffp = (np.power(Qeff, 2) + 1) / np.power(Qeff, 2) * Xeffs
-        XCLp = Xeffp * XLp / (XLp - Xeffp)
-        CLp = -1 / omega / XCLp
-
-        # find parallel resonant frequency
-        # FIXME: Doesn't agree w/ Javascript version!
-
-        def _func2(w):
-            B_res = (pi / 2) / self.len_coil
-            k0 = w / c
-            h = sqrt(B_res**2 - k0**2)
-
-            return helix_dispersion(h, a, psi, k0)**2
-
-        # w_res = fminbound(_func2, c / len_wire_eff / 40, 1 * c / len_wire_eff * pi / 2)
-        w_res = minimize_scalar(_func2, bounds=(
-            c / len_wire_eff / 40, 1 * c / len_wire_eff * pi / 2), method='bounded').x
-
-        # save all results
-        results = {}
-        results['char_impedance'] = float(Z_0)
-        results['skin_depth'] = float(delta_i)
-        results['prop_factor'] = float(beta)
-        results['Ls_eff'] = float(Leffs)
-        results['Rs_eff'] = float(Rs_eff)
-        results['Q_eff'] = float(Qeff)
-        results['Ls_equiv'] = float(Ls)
-        results['Rs_equiv'] = float(RLs)
-        results['Cp_equiv'] = float(CLp)
-        results['Q_equiv'] = float(QL)
-        results['res_freq'] = float(w_res / 2 / pi)
 
-        return results
+def expanded_diam_former(diam_former, diam_wire, diam_wire_expanded, len_coil, N,
+                         temp_coeff_expan, dT):
+    '''
+    Former diameter at a temperature offset dT, assuming the wire length grows with its
+    thermal expansion while the coil length stays fixed.
+    '''
+    diam_coil = diam_former + diam_wire
+    wire_len_squared = len_coil**2 + (np.pi * N * diam_coil) ** 2
+    scale_factor = 1 + dT * temp_coeff_expan * wire_len_squared / (
+        wire_len_squared - len_coil ** 2)
+
+    return diam_coil * scale_factor - diam_wire_expanded
 
 
-def helix_dispersion(h, a, psi, k0):
-    fh = kn(1, h * a) * iv(1, h * a) / kn(0, h * a) / iv(0, h * a) - (h / k0 * np.tan(psi)) ** 2
+def heated_rho(rho, temp_coeff_rho, temperature, rho_t0):
+    return rho * (1 + temp_coeff_rho * (temperature - rho_t0))
 
-    return fh
 
+def effective_inputs(param):
+    '''
+    Apply the temperature model: returns the inputs of the analysis (N, len_coil, diam_wire,
+    diam_former, f, rho, mu_r, mu_r_core) given a function returning the value (scalar or
+    array) of every name in BATCH_PARAMS, as set before the temperature model.
+    '''
+    dT = param('temperature') - param('reference_temperature')
+    N, len_coil, temp_coeff_expan = param('N'), param('len_coil'), param('temp_coeff_expan')
+    diam_wire = param('diam_wire') * (1 + temp_coeff_expan * dT)
+    diam_former = expanded_diam_former(param('diam_former'), param('diam_wire'), diam_wire,
+                                       len_coil, N, temp_coeff_expan, dT)
+    rho = heated_rho(param('rho'), param('temp_coeff_rho'), param('temperature'),
+                     param('rho_t0'))
 
-def h2beta(h, k0):
-    return np.hypot(k0, h)
+    return N, len_coil, diam_wire, diam_former, param('f'), rho, param('mu_r'), param('mu_r_core')
 
 
 def main():
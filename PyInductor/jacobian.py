@@ -0,0 +1,125 @@
+from __future__ import division
+
+import numpy as np
+
+from collections import namedtuple
+
+from PyInductor.model import Analysis, output_names
+
+
+# inputs a Jacobian is taken with respect to by default
+JACOBIAN_INPUTS = ('N', 'len_coil', 'diam_wire', 'diam_former', 'f', 'temperature', 'rho')
+
+# central difference stencils: offsets (in steps) and weights
+STENCILS = {3: ((-1, 1), (-1 / 2, 1 / 2)),
+            5: ((-2, -1, 1, 2), (1 / 12, -8 / 12, 8 / 12, -1 / 12))}
+
+# (output, input) pairs with closed form derivatives (see _elasticities())
+ANALYTIC = (('skin_depth', 'rho'), ('skin_depth', 'f'), ('skin_depth', 'mu_r'),
+            ('Rs_eff', 'rho'), ('Rs_eff', 'f'), ('Rs_eff', 'mu_r'),
+            ('Q_eff', 'rho'), ('Q_eff', 'mu_r'))
+
+
+class Jacobian(namedtuple('Jacobian', ['values', 'inputs', 'outputs'])):
+    """
+    Derivatives of the outputs (rows) with respect to the inputs (columns), in 'values'.
+    """
+    __slots__ = ()
+
+    def __call__(self, output_name, input_name):
+        """The entry for an output and input name."""
+        return self.values[self.outputs.index(output_name), self.inputs.index(input_name)]
+
+    def as_dict(self):
+        """Nested dict: output name -> input name -> derivative."""
+        return dict((output, dict(zip(self.inputs, row.tolist())))
+                    for output, row in zip(self.outputs, self.values))
+
+
+def _elasticities(inductor):
+    """
+    Closed form d ln(output) / d ln(input) of the ANALYTIC pairs. The skin depth is
+    sqrt(rho / (pi f mu_0 mu_r)), and Rs_eff is proportional to
+    rho / (diam_wire delta - delta^2) times factors of the geometry alone (the proximity
+    factor, the wire length). Q_eff is Xeffs / Rs_eff, and Xeffs doesn't depend on the
+    wire's resistivity or permeability. The resistivity after the temperature model is
+    proportional to 'rho', so these hold for 'rho' as passed to the constructor too.
+    """
+    skin_depth = float(Analysis(inductor.N, inductor.len_coil, inductor.diam_wire,
+                                inductor.diam_former, inductor.f, inductor.rho,
+                                inductor.mu_r).delta_i)
+    diam_wire = inductor.diam_wire
+    # d ln(Rs_eff) / d ln(1 / skin depth)
+    skin = (diam_wire - 2 * skin_depth) / (diam_wire - skin_depth)
+
+    return {('skin_depth', 'rho'): 0.5, ('skin_depth', 'f'): -0.5,
+            ('skin_depth', 'mu_r'): -0.5, ('Rs_eff', 'rho'): 1 - skin / 2,
+            ('Rs_eff', 'f'): skin / 2, ('Rs_eff', 'mu_r'): skin / 2,
+            ('Q_eff', 'rho'): skin / 2 - 1, ('Q_eff', 'mu_r'): -skin / 2}
+
+
+def jacobian(inductor, inputs=None, outputs=None, delta=0.01, normalize=True, order=3,
+             analytic=True):
+    """
+    Jacobian of the outputs of an inductor with respect to its inputs, by central
+    differences. The perturbed designs of all inputs (plus the nominal one) are analyzed as
+    a single batch, so the whole matrix costs one vectorized analysis. Where the formulas
+    allow (the ANALYTIC pairs: the skin depth, Rs_eff and Q_eff against the resistivity,
+    the frequency and the wire permeability) the derivatives are exact instead. Most outputs
+    go through the proximity factor table lookup and the iterative dispersion root, which
+    rules out complex steps.
+
+    Parameters:
+    inductor (Inductor): The nominal design
+    inputs (list): Names of the input parameters (default: JACOBIAN_INPUTS)
+    outputs (list): Names of the outputs (default: all)
+    delta (float): Step as a fraction of each input value (an absolute step for inputs
+                   that are 0)
+    normalize (bool): Return d(output)/d(input) * input/output (the relative change of the
+                      output per relative change of the input) instead of
+                      d(output)/d(input) / output
+    order (int): Number of points of the central difference stencil (3 or 5)
+    analytic (bool): Use the closed form derivatives where there are some
+
+    Inputs refer to the parameters before the temperature model (i.e. as passed to the
+    constructor).
+    """
+    inputs = tuple(JACOBIAN_INPUTS if inputs is None else inputs)
+    outputs = output_names(outputs)
+    if order not in STENCILS:
+        raise ValueError('order must be one of %s' % ', '.join(map(str, sorted(STENCILS))))
+    if not delta > 0:
+        raise ValueError('delta must be positive')
+    offsets, weights = STENCILS[order]
+
+    nominal = np.array([inductor.batch_param(name) for name in inputs], dtype=float)
+    steps = delta * np.abs(nominal)
+    steps[steps == 0] = delta
+
+    # column 0 is the nominal design, followed by the stencil points of every input
+    values = np.repeat(nominal[:, None], 1 + len(inputs) * len(offsets), axis=1)
+    for i, step in enumerate(steps):
+        columns = 1 + i * len(offsets) + np.arange(len(offsets))
+        values[i, columns] += np.array(offsets) * step
+
+    results = inductor.analyze_batch(outputs=outputs, **dict(zip(inputs, values)))
+
+    jac = np.empty((len(outputs), len(inputs)))
+    for j, name in enumerate(outputs):
+        points = results[name][1:].reshape(len(inputs), len(offsets))
+        derivatives = points.dot(weights) / steps
+        y = results[name][0]
+        jac[j] = derivatives * nominal / y if normalize else derivatives / y
+
+    pairs = [(output, name) for output, name in ANALYTIC if output in outputs and name in inputs]
+    if analytic and pairs:
+        elasticities = _elasticities(inductor)
+        for output, name in pairs:
+            i = inputs.index(name)
+            elasticity = elasticities[output, name]
+            jac[outputs.index(output), i] = elasticity if normalize else elasticity / nominal[i]
+
+    return Jacobian(jac, inputs, outputs)
+
+
+__all__ = ['jacobian', 'Jacobian', 'JACOBIAN_INPUTS', 'ANALYTIC']
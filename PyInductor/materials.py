@@ -0,0 +1,79 @@
+from __future__ import division
+
+import numpy as np
+
+from PyInductor.data import MATERIALS
+from PyInductor.inductor import Inductor, effective_inputs
+from PyInductor.model import Analysis
+
+
+# parameters a material supplies (the keys of every MATERIALS entry)
+MATERIAL_PARAMS = ('rho', 'rho_t0', 'temp_coeff_rho', 'mu_r', 'temp_coeff_expan')
+
+
+def awg_diameter(gauge):
+    """Diameter (m) of an American Wire Gauge size (0 for 1/0, -1 for 2/0, ...)."""
+    return 0.127e-3 * 92 ** ((36 - np.asarray(gauge, dtype=float)) / 39)
+
+
+def material_params(materials):
+    """Dict of arrays of the MATERIAL_PARAMS of materials (names in MATERIALS or dicts)."""
+    materials = [material if isinstance(material, dict) else MATERIALS[material]
+                 for material in materials]
+    return dict((name, np.array([material[name] for material in materials], dtype=float))
+                for name in MATERIAL_PARAMS)
+
+
+def material_analysis(materials, table=None, **params):
+    """
+    Analysis of designs for every one of several materials, along a new last axis: the
+    design parameters (the non-material BATCH_PARAMS, scalars or arrays broadcast against
+    each other) get a trailing axis of length 1 and the material parameters one with an
+    element per material.
+
+    Only the loss related quantities (skin depth, resistance, Q and the equivalent circuit)
+    depend on the resistivity and permeability of the wire, so they alone are computed per
+    material, while the geometry, the Lundin correction, the dispersion root and the
+    characteristic impedance keep the shape of the designs and are computed once. This
+    holds as long as no thermal expansion applies (temperature equals
+    reference_temperature), as the expansion coefficient otherwise changes the geometry per
+    material.
+
+    Parameters:
+    materials (list): Material names in MATERIALS (or dicts of MATERIAL_PARAMS)
+    table (DispersionTable): Optional surrogate of the dispersion solver
+    **params: Design parameters; mu_r_core defaults to 1, temperature to
+              Inductor.temperature and reference_temperature to the temperature
+    """
+    unknown = set(params) & set(MATERIAL_PARAMS)
+    if unknown:
+        raise TypeError('%s come(s) from the materials' % ', '.join(sorted(unknown)))
+
+    params.setdefault('mu_r_core', Inductor.mu_r_core)
+    params.setdefault('temperature', Inductor.temperature)
+    params.setdefault('reference_temperature', params['temperature'])
+    params = dict((name, np.asarray(value, dtype=float)[..., None])
+                  for name, value in params.items())
+    params.update(material_params(materials))
+
+    # without a temperature offset the expansion coefficient doesn't matter, and leaving it
+    # out keeps the geometry from being broadcast against the materials
+    if not np.any(params['temperature'] - params['reference_temperature']):
+        params['temp_coeff_expan'] = np.zeros(1)
+
+    return Analysis(*effective_inputs(params.__getitem__), table=table)
+
+
+def analyze_materials(materials, outputs=None, table=None, **params):
+    """
+    Vectorized analysis of designs in several materials (see material_analysis()): returns
+    a dict of arrays whose last axis runs over the materials, with the 'ok' mask.
+    """
+    analysis = material_analysis(materials, table=table, **params)
+    results = analysis.results(outputs)
+    return dict((name, np.broadcast_to(value, analysis.shape)) for name, value in
+                results.items())
+
+
+__all__ = ['analyze_materials', 'material_analysis', 'material_params', 'awg_diameter',
+           'MATERIAL_PARAMS']
@@ -0,0 +1,339 @@
+from __future__ import division
+
+import numpy as np
+from scipy.constants import mu_0, c
+from math import pi
+
+from PyInductor import profiling
+from PyInductor.proximity import proximity_factor
+from PyInductor.dispersion import h2beta, bessel_i0k0, root_bound, solve_dispersion, solve_res_freq
+
+
+_SCALARS = (float, int, np.number)
+
+# same keys (and order) as the dict returned by Inductor.analyze()
+RESULT_NAMES = ('char_impedance', 'skin_depth', 'prop_factor', 'Ls_eff', 'Rs_eff', 'Q_eff',
+                'Ls_equiv', 'Rs_equiv', 'Cp_equiv', 'Q_equiv', 'res_freq')
+
+
+def output_names(outputs=None):
+    """Validate a selection of output names; None selects all of them."""
+    if outputs is None:
+        return RESULT_NAMES
+    if isinstance(outputs, str):
+        outputs = (outputs,)
+
+    unknown = set(outputs) - set(RESULT_NAMES)
+    if unknown:
+        raise ValueError('unknown output(s): %s' % ', '.join(sorted(unknown)))
+
+    return tuple(outputs)
+
+
+class lazy(object):
+    """
+    Attribute computed by the decorated method on first access and stored on the instance
+    (and timed as a stage of the active Profile, if any; see PyInductor.profiling).
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+
+        profile = profiling.active()
+        if profile is None:
+            value = obj.__dict__[self.__name__] = self.func(obj)
+            return value
+
+        t_start = profile.start()
+        try:
+            value = obj.__dict__[self.__name__] = self.func(obj)
+        finally:
+            profile.stop(self.__name__, t_start, obj.size)
+        return value
+
+
+def _lundin_short(D_eff, len_coil):
+    x = len_coil / D_eff
+    k_L = (1 + 0.383901 * np.power(x, 2) + 0.017108 * np.power(x, 4)) / (
+        1 + 0.258952 * np.power(x, 2))
+    k_L = k_L * (np.log(4 * D_eff / len_coil) - 0.5)
+    k_L += 0.093842 * np.power(x, 2) + 0.002029 * np.power(x, 4) - 0.000801 * np.power(x, 6)
+    return k_L * ((2 / np.pi) * x)
+
+
+def _lundin_long(D_eff, len_coil):
+    y = D_eff / len_coil
+    k_L = (1 + 0.383901 * np.power(y, 2) + 0.017108 * np.power(y, 4)) / (
+        1 + 0.258952 * np.power(y, 2))
+    return k_L - (4 / 3 / np.pi) * y
+
+
+class Analysis(object):
+    """
+    The analysis of one design (scalar inputs) or of many (array inputs, broadcast against
+    each other; the results have the broadcast shape). Every intermediate quantity and
+    output is a lazy attribute: it is computed on first access from the attributes it
+    depends on, and then kept, so asking for a few outputs only evaluates the part of the
+    model they need, and outputs share intermediates.
+
+    Parameters:
+    N (float): Number of turns
+    len_coil (float): Coil length
+    diam_wire (float): Wire diameter
+    diam_former (float): Coil former diameter
+    f (float): Design frequency
+    rho (float): Wire resistivity (only needed by the loss related outputs)
+    mu_r (float): Wire relative permeability (ditto)
+    mu_r_core (float): Core relative permeability
+    root_ratio (float): Optional dispersion root guess, as a fraction of its upper bound
+    table (DispersionTable): Optional surrogate used instead of the exact dispersion solver
+
+    The inputs must already include any temperature effects. A scalar analysis raises
+    RuntimeError if the dispersion solver fails; for arrays those elements are NaN and
+    flagged by 'ok' instead.
+    """
+
+    # output name -> attribute
+    OUTPUTS = {'char_impedance': 'Z_0', 'skin_depth': 'delta_i', 'prop_factor': 'beta',
+               'Ls_eff': 'Leffs', 'Rs_eff': 'Rs_eff', 'Q_eff': 'Qeff', 'Ls_equiv': 'Ls',
+               'Rs_equiv': 'RLs', 'Cp_equiv': 'CLp', 'Q_equiv': 'QL', 'res_freq': 'res_freq'}
+
+    # number of designs
+    size = 1
+
+    def __init__(self, N, len_coil, diam_wire, diam_former, f, rho=None, mu_r=None,
+                 mu_r_core=1, root_ratio=None, table=None):
+        inputs = dict(N=N, len_coil=len_coil, diam_wire=diam_wire, diam_former=diam_former,
+                      f=f, rho=rho, mu_r=mu_r, mu_r_core=mu_r_core)
+        inputs = dict((name, value) for name, value in inputs.items() if value is not None)
+
+        # numpy arrays (even 0-d ones) select the element-wise behaviour
+        self.scalar = all(isinstance(value, _SCALARS) or
+                          not isinstance(value, np.ndarray) and np.ndim(value) == 0
+                          for value in inputs.values())
+        if not self.scalar:
+            # inputs keep their own shapes (broadcasting happens as they are combined), so
+            # quantities depending only on scalar inputs are computed once
+            inputs = dict((name, np.asarray(value, dtype=float))
+                          for name, value in inputs.items())
+            self.shape = np.broadcast(*inputs.values()).shape
+            self.size = int(np.prod(self.shape))
+
+        self.__dict__.update(inputs)
+        self.root_ratio = root_ratio
+        self.table = table
+
+    def is_computed(self, name):
+        return name in self.__dict__
+
+    def computed(self):
+        """Names of the quantities evaluated so far."""
+        return sorted(name for name, value in vars(type(self)).items()
+                      if isinstance(value, lazy) and name in self.__dict__)
+
+    def results(self, outputs=None):
+        """Dict of the selected outputs (see output_names()), plus 'ok' for arrays."""
+        outputs = output_names(outputs)
+
+        if self.scalar:
+            return dict((name, float(getattr(self, self.OUTPUTS[name]))) for name in outputs)
+
+        # failed elements are masked below
+        with np.errstate(all='ignore'):
+            results = dict((name, getattr(self, self.OUTPUTS[name])) for name in outputs)
+        ok = self.ok
+        results = dict((name, np.where(ok, value, np.nan)) for name, value in results.items())
+        results['ok'] = ok
+        return results
+
+    @lazy
+    def diam_coil(self):
+        return self.diam_former + self.diam_wire
+
+    @lazy
+    def pitch(self):
+        return self.len_coil / self.N
+
+    @lazy
+    def phi(self):
+        return proximity_factor(self.len_coil / self.diam_coil, self.diam_wire / self.pitch)
+
+    @lazy
+    def omega(self):
+        return 2 * np.pi * self.f
+
+    @lazy
+    def D_eff(self):
+        """Effective diameter of coil"""
+        return self.diam_coil - self.diam_wire * (1 - 1 / np.sqrt(self.phi))
+
+    @lazy
+    def psi(self):
+        """Effective pitch angle"""
+        return np.arctan(self.pitch / (np.pi * self.D_eff))
+
+    @lazy
+    def k_L(self):
+        """Field non-uniformity correction factor according to Lundin"""
+        D_eff, len_coil = self.D_eff, self.len_coil
+        if self.scalar:
+            if D_eff >= len_coil:
+                return _lundin_short(D_eff, len_coil)
+            return _lundin_long(D_eff, len_coil)
+        return np.where(D_eff >= len_coil, _lundin_short(D_eff, len_coil),
+                        _lundin_long(D_eff, len_coil))
+
+    @lazy
+    def k_s(self):
+        """Round wire self-inductance correction factor according to Rosa"""
+        return 5 / 4 - np.log(2 * self.pitch / self.diam_wire)
+
+    @lazy
+    def k_m(self):
+        """Round wire mutual-inductance correction factor according to Grover and Knight"""
+        N = self.N
+        k_m = -0.16725 / N + 0.0033 / N**2
+        k_m *= np.log(N)
+        return k_m + 0.337883 * (1 - 0.9754 / (N - 0.0246))
+
+    @lazy
+    def L_correction(self):
+        # round wire correction shared by both series inductances
+        return self.mu_r_core * mu_0 * self.D_eff * self.N * (self.k_s + self.k_m) / 2
+
+    @lazy
+    def len_wire_eff(self):
+        """Effective length of wire"""
+        return np.hypot(self.N * np.pi * self.D_eff, self.len_coil)
+
+    @lazy
+    def delta_i(self):
+        """Skin depth"""
+        sigma = 1 / self.rho
+        return 1 / np.sqrt(np.pi * self.f * mu_0 * self.mu_r * sigma)
+
+    @lazy
+    def Rs_eff(self):
+        """Effective series AC resistance"""
+        delta_i = self.delta_i
+        Rs_eff = self.rho * self.len_wire_eff / (
+            np.pi * (self.diam_wire * delta_i - delta_i ** 2)) * self.phi
+        if self.scalar:
+            return Rs_eff * ((self.N - 1) / self.N) if self.N > 1 else Rs_eff
+        return np.where(self.N > 1, Rs_eff * ((self.N - 1) / self.N), Rs_eff)
+
+    @lazy
+    def Ls(self):
+        """Frequency-independent series inductance"""
+        Ls = self.mu_r_core * mu_0 * np.pi * (self.D_eff * self.N) ** 2 / 4 / self.len_coil
+        return Ls * self.k_L - self.L_correction
+
+    @lazy
+    def k0(self):
+        return self.omega / c
+
+    @lazy
+    def a(self):
+        return self.D_eff / 2
+
+    @lazy
+    def root_bound(self):
+        return root_bound(self.psi, self.k0)
+
+    @lazy
+    def dispersion(self):
+        """DispersionResult of the radial wave number"""
+        try:
+            if self.table is not None:
+                result = self.table.solve(self.a, self.psi, self.k0, full_output=True)
+            else:
+                h0 = None if self.root_ratio is None else self.root_ratio * self.root_bound
+                result = solve_dispersion(self.a, self.psi, self.k0, h0=h0, full_output=True)
+        except RuntimeError:
+            profile = profiling.active()
+            if profile is not None:
+                profile.record_failures('dispersion')
+            raise
+
+        profile = profiling.active()
+        if profile is not None:
+            profile.record_dispersion(result)
+        return result
+
+    @lazy
+    def h(self):
+        """Radial wave number"""
+        return self.dispersion.root
+
+    @property
+    def ok(self):
+        """Where the dispersion solver converged (all True if it wasn't needed)"""
+        if self.scalar:
+            return self.dispersion.converged if 'dispersion' in self.__dict__ else True
+        if 'dispersion' in self.__dict__:
+            return np.array(np.broadcast_to(self.dispersion.converged, self.shape))
+        return np.ones(self.shape, dtype=bool)
+
+    @lazy
+    def beta(self):
+        """Propagation factor"""
+        return h2beta(self.h, self.k0)
+
+    @lazy
+    def Z_0(self):
+        """Characteristic impedance"""
+        return 60 / self.k0 * self.beta * bessel_i0k0(self.h * self.a)
+
+    @lazy
+    def Leffs(self):
+        """Effective series inductance at design frequency"""
+        Leffs = self.Z_0 / self.omega * np.tan(self.beta * self.len_coil) * self.k_L
+        return Leffs - self.L_correction
+
+    @lazy
+    def Xeffs(self):
+        return self.omega * self.Leffs
+
+    @lazy
+    def Qeff(self):
+        """Effective unloaded quality factor"""
+        return self.Xeffs / self.Rs_eff
+
+    @lazy
+    def XLs(self):
+        return self.omega * self.Ls
+
+    @lazy
+    def RLs(self):
+        """Series resistance of the equivalent circuit"""
+        Reffp = (self.Qeff**2 + 1) * self.Rs_eff
+        return (Reffp - np.sqrt(np.power(Reffp, 2) - 4 * np.power(self.XLs, 2))) / 2
+
+    @lazy
+    def QL(self):
+        """Unloaded quality factor"""
+        return self.XLs / self.RLs
+
+    @lazy
+    def CLp(self):
+        """Parallel stray capacitance"""
+        QL, Qeff = self.QL, self.Qeff
+        XLp = (np.power(QL, 2) + 1) / np.power(QL, 2) * self.XLs
+        Xeffp = (np.power(Qeff, 2) + 1) / np.power(Qeff, 2) * self.Xeffs
+        XCLp = Xeffp * XLp / (XLp - Xeffp)
+        return -1 / self.omega / XCLp
+
+    @lazy
+    def res_freq(self):
+        """Parallel resonant frequency"""
+        # FIXME: Doesn't agree w/ Javascript version!
+        return solve_res_freq(self.len_coil, self.len_wire_eff, self.a, self.psi) / 2 / pi
+
+
+__all__ = ['Analysis', 'lazy', 'output_names', 'RESULT_NAMES']
@@ -0,0 +1,262 @@
+from __future__ import division
+
+import time
+
+import numpy as np
+
+from collections import namedtuple
+from scipy.stats import norm
+
+from PyInductor.executor import Executor
+from PyInductor.model import output_names
+from PyInductor.optimize import INTEGER_PARAMS
+
+
+BATCH_SIZE = 10000
+RESERVOIR_SIZE = 10000
+PERCENTILES = (1, 5, 50, 95, 99)
+
+MonteCarloResult = namedtuple('MonteCarloResult', [
+    'samples', 'passed', 'failed', 'yield_', 'yield_interval', 'mean', 'std', 'minimum',
+    'maximum', 'percentiles', 'stopped_early', 'wall_time'])
+
+
+class Normal(namedtuple('Normal', ['sigma', 'relative'])):
+    """Normal distribution around the nominal value (sigma relative to it by default)."""
+    __slots__ = ()
+
+    def __new__(cls, sigma, relative=True):
+        return super(Normal, cls).__new__(cls, sigma, relative)
+
+    def sample(self, random_state, nominal, size):
+        sigma = self.sigma * abs(nominal) if self.relative else self.sigma
+        return random_state.normal(nominal, sigma, size)
+
+
+class Uniform(namedtuple('Uniform', ['width', 'relative'])):
+    """Uniform distribution within +/- width of the nominal value (relative by default)."""
+    __slots__ = ()
+
+    def __new__(cls, width, relative=True):
+        return super(Uniform, cls).__new__(cls, width, relative)
+
+    def sample(self, random_state, nominal, size):
+        width = self.width * abs(nominal) if self.relative else self.width
+        return random_state.uniform(nominal - width, nominal + width, size)
+
+
+def wilson_interval(passed, samples, confidence=0.95):
+    """Wilson score interval of a binomial proportion."""
+    if not samples:
+        return 0., 1.
+
+    z = norm.ppf(1 - (1 - confidence) / 2)
+    p = passed / samples
+    denominator = 1 + z**2 / samples
+    center = (p + z**2 / (2 * samples)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / samples + z**2 / (4 * samples**2)) / denominator
+
+    return max(center - half_width, 0.), min(center + half_width, 1.)
+
+
+class RunningStats(object):
+    """Count, mean, variance (Welford/Chan updates) and extremes of a stream, ignoring NaN."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+
+        count = self.count + values.size
+        mean = values.mean()
+        delta = mean - self.mean
+        self.m2 += ((values - mean) ** 2).sum() + delta**2 * self.count * values.size / count
+        self.mean += delta * values.size / count
+        self.count = count
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+
+class Reservoir(object):
+    """Uniform random sample of fixed size from a stream (algorithm R), for percentiles."""
+
+    def __init__(self, size=RESERVOIR_SIZE, seed=None):
+        self.values = np.empty(size)
+        self.seen = 0
+        self._random_state = np.random.RandomState(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        size = len(self.values)
+
+        # fill the reservoir first
+        fill = min(max(size - self.seen, 0), values.size)
+        self.values[self.seen:self.seen + fill] = values[:fill]
+
+        # then item t (0-based) replaces a random slot with probability size / (t + 1)
+        rest = values[fill:]
+        t = self.seen + fill + np.arange(rest.size)
+        slots = (self._random_state.random_sample(rest.size) * (t + 1)).astype(int)
+        keep = slots < size
+        self.values[slots[keep]] = rest[keep]
+
+        self.seen += values.size
+
+    def percentiles(self, q):
+        kept = self.values[:min(self.seen, len(self.values))]
+        if not kept.size:
+            return dict((p, np.nan) for p in q)
+        return dict(zip(q, np.percentile(kept, q).tolist()))
+
+
+# state of the batch evaluation, set once per worker by _init_worker()
+_state = None
+
+
+def _init_worker(state):
+    global _state
+    _state = state
+
+
+def _sample_batch(index):
+    """Outputs of batch 'index' of the sample stream, and its pass mask."""
+    inductor, tolerances, outputs, specs, seed, batch_size = _state
+
+    # every batch has its own seed, so the stream doesn't depend on how it is evaluated
+    random_state = np.random.RandomState([seed, index, 0])
+    arrays = dict((name, tolerances[name].sample(random_state, inductor.batch_param(name),
+                                                 batch_size))
+                  for name in sorted(tolerances))
+    for name in INTEGER_PARAMS:
+        if name in arrays:
+            arrays[name] = np.rint(arrays[name])
+    results = inductor.analyze_batch(outputs=outputs, **arrays)
+
+    passed = results['ok'].copy()
+    with np.errstate(invalid='ignore'):
+        for name, (lower, upper) in specs.items():
+            if lower is not None:
+                passed &= results[name] >= lower
+            if upper is not None:
+                passed &= results[name] <= upper
+
+    return dict((name, results[name]) for name in outputs), passed, results['ok']
+
+
+def monte_carlo(inductor, tolerances, specs=None, outputs=None, max_samples=100000,
+                batch_size=BATCH_SIZE, seed=0, confidence=0.95, ci_width=None,
+                min_samples=None, percentiles=PERCENTILES, reservoir_size=RESERVOIR_SIZE,
+                processes=1, executor=None):
+    """
+    Monte Carlo analysis of manufacturing tolerances: draw designs around an inductor,
+    analyze them in vectorized batches and accumulate the statistics of the outputs (mean,
+    standard deviation, extremes and percentiles from a reservoir sample) along with the
+    yield against specifications, in memory that doesn't grow with the number of samples.
+
+    Parameters:
+    inductor (Inductor): The nominal design
+    tolerances (dict): Parameter name -> distribution around its nominal value (Normal,
+                       Uniform, or anything with a sample(random_state, nominal, size)
+                       method), e.g. {'diam_wire': Normal(0.01), 'temperature':
+                       Uniform(10, relative=False)}
+    specs (dict): Output name -> (lower, upper) limits of a passing coil (None: open)
+    outputs (list): Outputs to collect statistics of (default: those in specs, or all)
+    max_samples (int): Number of samples (rounded up to whole batches)
+    batch_size (int): Samples per batch
+    seed (int): Seed of the sample stream; every batch is drawn with its own RandomState
+                derived from it, so results are reproducible and independent of how the
+                batches are evaluated
+    confidence (float): Confidence level of the yield interval (Wilson score)
+    ci_width (float): Stop early once the yield interval is at most this wide
+    min_samples (int): Samples to draw before stopping early (default: one batch)
+    processes (int): Number of worker processes evaluating batches
+    executor (Executor): Evaluates the batches instead (see PyInductor.executor), so that
+                         its workers can be reused across runs
+
+    Parameters are sampled as given to the inductor, i.e. before the temperature model, and
+    turn counts are rounded to whole turns (e.g. Uniform(1, relative=False) on N gives one
+    turn more or less in a quarter of the samples each).
+    Designs the dispersion solver fails on count as failing the specs and are left out of
+    the statistics.
+    """
+    specs = dict(specs or {})
+    if outputs is None:
+        outputs = sorted(specs) or None
+    outputs = tuple(sorted(set(output_names(outputs)) | set(output_names(sorted(specs)))))
+    min_samples = batch_size if min_samples is None else min_samples
+    n_batches = -(-max_samples // batch_size)
+
+    stats = dict((name, RunningStats()) for name in outputs)
+    reservoirs = dict((name, Reservoir(reservoir_size, seed=[seed, i, 1]))
+                      for i, name in enumerate(outputs))
+    samples = passed = failed = 0
+    stopped_early = False
+
+    owned = executor is None
+    if owned:
+        executor = Executor('process' if processes > 1 and n_batches > 1 else 'serial',
+                            processes)
+
+    state = (inductor, dict(tolerances), outputs, specs, seed, batch_size)
+    # with early stopping, batches are handed out a few per worker at a time, so that a
+    # shared executor isn't left busy with batches past the stop
+    step = n_batches if ci_width is None else 2 * executor.workers
+
+    def batches():
+        for start in range(0, n_batches, step):
+            # ordered, so that early stopping happens at the same batch as in-process
+            for batch in executor.imap(_sample_batch, range(start, min(start + step, n_batches)),
+                                       _init_worker, (state,), ordered=True):
+                yield batch
+
+    t_start = time.time()
+    completed = False
+    try:
+        for results, passes, ok in batches():
+            for name in outputs:
+                stats[name].update(results[name])
+                reservoirs[name].update(results[name])
+            samples += passes.size
+            passed += int(passes.sum())
+            failed += int(passes.size - ok.sum())
+
+            interval = wilson_interval(passed, samples, confidence)
+            if ci_width is not None and samples >= min_samples and \
+                    interval[1] - interval[0] <= ci_width and samples < n_batches * batch_size:
+                stopped_early = True
+                break
+        completed = True
+    finally:
+        if owned:
+            if completed:
+                executor.close()
+            else:
+                executor.terminate()
+
+    return MonteCarloResult(
+        samples, passed, failed, passed / samples if samples else np.nan,
+        wilson_interval(passed, samples, confidence),
+        dict((name, float(stats[name].mean) if stats[name].count else np.nan)
+             for name in outputs),
+        dict((name, float(stats[name].std)) for name in outputs),
+        dict((name, float(stats[name].minimum)) for name in outputs),
+        dict((name, float(stats[name].maximum)) for name in outputs),
+        dict((name, reservoirs[name].percentiles(percentiles)) for name in outputs),
+        stopped_early, time.time() - t_start)
+
+
+__all__ = ['monte_carlo', 'MonteCarloResult', 'Normal', 'Uniform', 'wilson_interval',
+           'RunningStats', 'Reservoir']
@@ -0,0 +1,148 @@
+from __future__ import division
+
+import time
+
+import numpy as np
+
+from collections import namedtuple
+from scipy.optimize import differential_evolution
+
+try:
+    from inspect import signature
+except ImportError:  # python 2
+    signature = None
+
+from PyInductor.model import output_names
+
+
+# added to the objective of designs violating a constraint (or failing to analyze), so
+# that any feasible design is better than any infeasible one
+PENALTY = 1e6
+
+# parameters rounded to whole numbers during the search
+INTEGER_PARAMS = ('N',)
+
+# whether differential_evolution() takes whole populations (SciPy >= 1.9; before, it
+# evaluates one candidate at a time)
+_VECTORIZED = signature is not None and \
+    'vectorized' in signature(differential_evolution).parameters
+
+DesignResult = namedtuple('DesignResult', ['params', 'outputs', 'objective', 'feasible',
+                                           'nfev', 'nbatches', 'wall_time', 'message'])
+
+
+class DesignObjective(object):
+    """
+    Objective of a design optimization, evaluated on whole populations of designs at once
+    through Inductor.analyze_batch().
+
+    Parameters:
+    inductor (Inductor): The design whose other parameters stay fixed
+    variables (dict): Parameter name -> (lower, upper) bounds of the varied parameters
+    targets (dict): Output name -> target value, penalized by the squared relative error
+    maximize (list): Output names to maximize
+    minimize (list): Output names to minimize
+    constraints (dict): Output name -> (lower, upper) limits, either of which can be None
+    weights (dict): Optional output name -> weight of its objective term (default: 1)
+
+    Outputs that are maximized or minimized are scaled by their value at the starting
+    design, so the terms are comparable.
+    """
+
+    def __init__(self, inductor, variables, targets=None, maximize=(), minimize=(),
+                 constraints=None, weights=None):
+        self.inductor = inductor
+        self.names = sorted(variables)
+        self.bounds = [tuple(variables[name]) for name in self.names]
+        self.targets = dict(targets or {})
+        self.maximize = output_names(maximize) if maximize else ()
+        self.minimize = output_names(minimize) if minimize else ()
+        self.constraints = dict(constraints or {})
+        self.weights = dict(weights or {})
+
+        self.outputs = output_names(sorted(set(self.targets) | set(self.maximize) |
+                                           set(self.minimize) | set(self.constraints)))
+        if not self.outputs:
+            raise ValueError('nothing to optimize')
+
+        scaled = set(self.maximize) | set(self.minimize)
+        start = inductor.analyze(outputs=sorted(scaled)) if scaled else {}
+        self.scales = dict((name, abs(value) or 1) for name, value in start.items())
+
+        self.nfev = self.nbatches = 0
+
+    def params(self, x):
+        """Parameter arrays (or values) of the candidate(s) x, one row per variable."""
+        params = {}
+        for name, values in zip(self.names, x):
+            params[name] = np.round(values) if name in INTEGER_PARAMS else values
+        return params
+
+    def evaluate(self, x):
+        """Objective values and analysis outputs of the candidates x (one column each)."""
+        x = np.asarray(x, dtype=float)
+        results = self.inductor.analyze_batch(outputs=self.outputs, **self.params(x))
+        self.nfev += x.shape[-1] if x.ndim > 1 else 1
+        self.nbatches += 1
+
+        objective = np.zeros(np.shape(results['ok']))
+        with np.errstate(invalid='ignore'):
+            for name, target in self.targets.items():
+                objective += self.weights.get(name, 1) * ((results[name] - target) / target) ** 2
+            for name in self.maximize:
+                objective -= self.weights.get(name, 1) * results[name] / self.scales[name]
+            for name in self.minimize:
+                objective += self.weights.get(name, 1) * results[name] / self.scales[name]
+
+            # relative violation of every limit
+            violation = np.zeros_like(objective)
+            for name, (lower, upper) in self.constraints.items():
+                if lower is not None:
+                    violation += np.maximum(lower - results[name], 0) / abs(lower or 1)
+                if upper is not None:
+                    violation += np.maximum(results[name] - upper, 0) / abs(upper or 1)
+
+        failed = ~np.isfinite(objective) | ~np.isfinite(violation)
+        objective = np.where(violation > 0, PENALTY * (1 + violation), objective)
+        objective = np.where(failed, 2 * PENALTY, objective)
+
+        return objective, results
+
+    def __call__(self, x):
+        return self.evaluate(x)[0]
+
+
+def optimize_design(inductor, variables, targets=None, maximize=(), minimize=(),
+                    constraints=None, weights=None, popsize=15, maxiter=200, tol=1e-6,
+                    seed=None, polish=False):
+    """
+    Vary several parameters of an inductor at once to meet output targets, maximize or
+    minimize outputs and respect limits on outputs (see DesignObjective for these
+    arguments), with differential evolution. Whole populations are analyzed in one
+    vectorized call, and N is kept integer.
+
+    Returns a DesignResult with the best parameters, their outputs, the objective value,
+    whether all constraints are met, the number of designs analyzed (and batches used)
+    and the wall time in seconds. The inductor itself isn't changed.
+    """
+    objective = DesignObjective(inductor, variables, targets=targets, maximize=maximize,
+                                minimize=minimize, constraints=constraints, weights=weights)
+    kwargs = dict(popsize=popsize, maxiter=maxiter, tol=tol, seed=seed, polish=polish)
+
+    if _VECTORIZED:
+        kwargs.update(vectorized=True, updating='deferred')
+
+    t_start = time.time()
+    result = differential_evolution(objective, objective.bounds, **kwargs)
+    wall_time = time.time() - t_start
+
+    x = np.asarray(result.x, dtype=float)
+    value, outputs = objective.evaluate(x[:, None])
+    params = dict((name, float(values[0])) for name, values in objective.params(x[:, None]).items())
+    outputs = dict((name, float(outputs[name][0])) for name in objective.outputs)
+
+    return DesignResult(params, outputs, float(value[0]), bool(value[0] < PENALTY),
+                        objective.nfev, objective.nbatches, wall_time, result.message)
+
+
+__all__ = ['optimize_design', 'DesignObjective', 'DesignResult']
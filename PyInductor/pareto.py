@@ -0,0 +1,254 @@
+from __future__ import division
+
+import numpy as np
+
+from PyInductor.executor import Executor
+from PyInductor.inductor import BATCH_PARAMS, effective_inputs
+from PyInductor.model import Analysis, RESULT_NAMES
+from PyInductor.sinks import Sink, flatten_solution
+
+
+# designs analyzed at a time by pareto_sweep()
+BATCH_SIZE = 100000
+
+# candidates compared at a time in non_dominated() (memory grows with its square)
+BLOCK_SIZE = 256
+
+# derived quantities pareto_sweep() can use besides the inputs and outputs: name -> Analysis
+# attribute
+DERIVED = {'len_wire': 'len_wire_eff', 'diam_coil': 'diam_coil', 'pitch': 'pitch'}
+
+
+def non_dominated(values):
+    """
+    Indices (ascending) of the non-dominated rows of an (n, k) array of objectives to
+    minimize. Of identical rows only the first one is kept.
+
+    After a lexicographic sort a row can only be dominated by rows before it, so it is
+    enough to compare each row with the earlier ones: with two objectives that is a running
+    minimum, otherwise rows are compared block-wise against the front found so far and
+    within their block.
+    """
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return np.zeros(0, dtype=int)
+
+    order = np.lexsort(values.T[::-1])
+    ordered = values[order]
+
+    if values.shape[1] == 1:
+        keep = np.zeros(len(values), dtype=bool)
+        keep[0] = True
+    elif values.shape[1] == 2:
+        keep = np.ones(len(values), dtype=bool)
+        keep[1:] = ordered[1:, 1] < np.minimum.accumulate(ordered[:-1, 1])
+    else:
+        keep = np.zeros(len(values), dtype=bool)
+        front = np.zeros((0, values.shape[1]))
+        for start in range(0, len(values), BLOCK_SIZE):
+            block = ordered[start:start + BLOCK_SIZE]
+            # a row is dropped if an earlier one is at least as good in every objective
+            dominated = np.zeros(len(block), dtype=bool)
+            for front_start in range(0, len(front), BLOCK_SIZE):
+                part = front[front_start:front_start + BLOCK_SIZE]
+                dominated |= (part[None, :, :] <= block[:, None, :]).all(axis=2).any(axis=1)
+            earlier = (block[None, :, :] <= block[:, None, :]).all(axis=2)
+            dominated |= (earlier & np.tri(len(block), k=-1, dtype=bool)).any(axis=1)
+
+            keep[start:start + len(block)] = ~dominated
+            front = np.concatenate([front, block[~dominated]])
+
+    return np.sort(order[keep])
+
+
+class ParetoFront(object):
+    """
+    Non-dominated set of a stream of designs, updated batch by batch: every batch is
+    reduced to its own front, which is then merged with the current one, so memory is
+    proportional to the front rather than to the number of designs seen.
+
+    Parameters:
+    objectives (dict): Column name -> 'min' or 'max'
+    constraints (dict): Column name -> (lower, upper) limits (None: open); designs outside
+                        them (or with NaN objectives) are ignored
+    """
+
+    def __init__(self, objectives, constraints=None):
+        if not objectives:
+            raise ValueError('at least one objective is needed')
+        for name, sense in objectives.items():
+            if sense not in ('min', 'max'):
+                raise ValueError("objective %s must be 'min' or 'max'" % name)
+
+        self.objectives = tuple(sorted(objectives.items()))
+        self.constraints = dict(constraints or {})
+        self.columns = None
+        self.items = []
+        self.seen = 0
+
+    def _values(self, columns):
+        # objectives as columns to minimize
+        return np.column_stack([np.asarray(columns[name], dtype=float) * (
+            -1 if sense == 'max' else 1) for name, sense in self.objectives])
+
+    def update(self, columns, items=None):
+        """
+        Add a batch: a dict of equally long 1-D arrays holding (at least) the objective and
+        constraint columns, and optionally a list of objects to keep along with the rows
+        that make it to the front.
+        """
+        columns = dict((name, np.asarray(value)) for name, value in columns.items())
+        size = len(columns[self.objectives[0][0]])
+        self.seen += size
+
+        values = self._values(columns)
+        mask = np.isfinite(values).all(axis=1)
+        with np.errstate(invalid='ignore'):
+            for name, (lower, upper) in self.constraints.items():
+                if lower is not None:
+                    mask &= columns[name] >= lower
+                if upper is not None:
+                    mask &= columns[name] <= upper
+
+        rows = np.flatnonzero(mask)
+        rows = rows[non_dominated(values[rows])]
+        if not len(rows):
+            return
+
+        # items stay aligned with the rows (None for batches without them)
+        new_items = [items[i] for i in rows] if items is not None else [None] * len(rows)
+        if self.columns is None:
+            self.columns = dict((name, value[rows]) for name, value in columns.items())
+            self.items = new_items
+            return
+
+        # the current front goes first, so it wins ties
+        merged = dict((name, np.concatenate([self.columns[name], columns[name][rows]]))
+                      for name in self.columns)
+        keep = non_dominated(self._values(merged))
+        self.columns = dict((name, value[keep]) for name, value in merged.items())
+        merged_items = self.items + new_items
+        self.items = [merged_items[i] for i in keep]
+
+    def __len__(self):
+        return 0 if self.columns is None else len(self.columns[self.objectives[0][0]])
+
+    def front(self):
+        """The front as a dict of arrays, ordered by the first objective by name (best first)."""
+        if self.columns is None:
+            return {}
+        order = np.argsort(self._values(self.columns)[:, 0], kind='mergesort')
+        return dict((name, value[order]) for name, value in self.columns.items())
+
+    def front_items(self):
+        """The objects passed along with the front rows, in the order of front()."""
+        if self.columns is None:
+            return []
+        order = np.argsort(self._values(self.columns)[:, 0], kind='mergesort')
+        return [self.items[i] for i in order]
+
+
+def _sweep_batch(item):
+    """Front of one batch of a sweep (analyzed in a worker)."""
+    start, designs, names, objectives, constraints = item
+    # a set of shared columns only is analyzed as arrays too, to get the 'ok' mask
+    shared = not any(value.ndim for value in designs.columns.values())
+    analysis = Analysis(*effective_inputs(designs.column if shared
+                                          else designs.columns.__getitem__))
+    outputs = [name for name in names if name in RESULT_NAMES]
+    results = analysis.results(outputs)
+
+    columns = {'design': start + np.arange(len(designs))}
+    for name in names:
+        if name in results:
+            value = results[name]
+        elif name in DERIVED:
+            with np.errstate(all='ignore'):
+                value = np.where(results['ok'], getattr(analysis, DERIVED[name]), np.nan)
+        else:
+            value = designs.column(name)
+        columns[name] = np.broadcast_to(value, (len(designs),))
+
+    front = ParetoFront(objectives, constraints)
+    front.update(columns)
+    return front.columns
+
+
+def pareto_sweep(designs, objectives, constraints=None, columns=(), batch_size=BATCH_SIZE,
+                 executor=None):
+    """
+    Pareto front of a DesignSet (e.g. DesignSet.grid(...)), analyzed in batches that are
+    each reduced to their front before being merged, so neither the analysis results nor
+    the front of the whole grid is ever held in memory at once.
+
+    Parameters:
+    designs (DesignSet): The designs to sweep
+    objectives (dict): Name -> 'min' or 'max'; names are outputs (RESULT_NAMES), input
+                       parameters (BATCH_PARAMS, before the temperature model) or DERIVED
+                       quantities such as the wire length
+    constraints (dict): Name -> (lower, upper) limits
+    columns (list): Further names to report for the front designs
+    executor (Executor): Optional workers to analyze the batches with
+
+    Returns the ParetoFront; its 'design' column holds the indices into 'designs'.
+    """
+    constraints = dict(constraints or {})
+    names = set(objectives) | set(constraints) | set(columns)
+    unknown = names - set(RESULT_NAMES) - set(BATCH_PARAMS) - set(DERIVED)
+    if unknown:
+        raise ValueError('unknown column(s): %s' % ', '.join(sorted(unknown)))
+
+    front = ParetoFront(objectives, constraints)
+    items = [(start, designs[start:start + batch_size], sorted(names), objectives, constraints)
+             for start in range(0, len(designs), batch_size)]
+    if executor is None:
+        executor = Executor('serial')
+
+    for batch_front in executor.imap(_sweep_batch, items,
+                                     weights=[len(item[1]) for item in items]):
+        if batch_front is not None:
+            front.update(batch_front)
+    front.seen = len(designs)
+
+    return front
+
+
+class ParetoSink(Sink):
+    """
+    Keep the non-dominated PhasingCoilSolver.run() solutions. Objectives and constraints
+    name numeric solution fields (see PyInductor.sinks) or, with full_results, analysis
+    outputs.
+
+    Parameters:
+    objectives (dict): Name -> 'min' or 'max'
+    constraints (dict): Name -> (lower, upper) limits
+    buffer_size (int): Solutions collected before they are merged into the front
+    """
+
+    def __init__(self, objectives, constraints=None, buffer_size=1000):
+        self.pareto = ParetoFront(objectives, constraints)
+        self.buffer_size = buffer_size
+        self._buffer = []
+
+    def write(self, solution):
+        self._buffer.append(solution)
+        if len(self._buffer) >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            rows = [dict(flatten_solution(solution)) for solution in self._buffer]
+            self.pareto.update(dict((name, np.array([row[name] for row in rows], dtype=float))
+                                    for name in rows[0] if name != 'material'), self._buffer)
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+
+    def results(self):
+        """The non-dominated solutions, best first in the first objective by name."""
+        self._flush()
+        return self.pareto.front_items()
+
+
+__all__ = ['ParetoFront', 'ParetoSink', 'pareto_sweep', 'non_dominated', 'DERIVED']
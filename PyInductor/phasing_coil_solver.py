@@ -1,70 +1,252 @@
 from __future__ import division
 
+import copy
 import warnings
 
-from datetime import datetime
-from multiprocessing import Pool, cpu_count
-from itertools import product
-from PyInductor.inductor import Inductor, MATERIALS
+import numpy as np
+
+from collections import namedtuple
+from multiprocessing import cpu_count
+from PyInductor.inductor import MATERIALS, expanded_diam_former
+from PyInductor.designs import DesignSet
+from PyInductor.batch import prop_factor_batch, RESULT_NAMES
+from PyInductor.executor import Executor
+from PyInductor.materials import analyze_materials
+from PyInductor.profiling import Profile
+from PyInductor.sinks import PrintSink
 
 warnings.filterwarnings("ignore")
 
+# approximate number of grid points evaluated per chunk
+CHUNK_POINTS = 20000
+
+# one accepted coil; 'analysis' holds the Inductor.analyze() outputs when requested, 'wire'
+# the (core, with insulation) diameters in mm and 'material' the material name when the
+# solver was given several of them (None otherwise)
+CoilSolution = namedtuple('CoilSolution', ['N', 'diameter_mm', 'length_mm', 'phi',
+                                           'turn_spacing_mm', 'analysis', 'wire', 'material'])
+
+# static solver parameters, set once per worker process by _init_worker()
+_static_params = None
+
+
+def _init_worker(static_params):
+    global _static_params
+    _static_params = static_params
 
-def _solver(combination):
-    """This is the core of the solver, which takes one combination of coil parameters and
-    analyzes the inductor. If the resulting phi is within the allowed tolerance, the coil
-    parameters are returned."""
 
-    # extract the changing and static params
-    n, diam_mm, len_um, static_params = combination
-    # prepare params for Inductor
-    params = {'N': n,
-              'diam_former': (diam_mm + static_params['diam_wire_with_isol_mm']) * 1e-3,
-              'diam_wire': static_params['diam_wire_core_mm'] * 1e-3,
-              'f': static_params['frequency'],
-              'len_coil': len_um * 1e-6}
-    params.update(static_params['material'])
+def _grid(chunk, static_params):
+    """Build the N x length grid of a chunk along with the winding constraints mask."""
+    n_start, n_stop, diam_mm = chunk
+    len_start_um, len_stop_um, len_step_um = static_params['len_range_um']
+
+    n = np.arange(n_start, n_stop)[:, None]
+    len_um = np.arange(len_start_um, len_stop_um, len_step_um)[None, :]
+    len_mm = len_um * 1e-3
 
     # do not bother with analyzing coil that doesn't meet basic criteria
     # we only want 1 wire layer for the winding, don't we?
-    len_mm = len_um * 1e-3
-    if len_mm < static_params['diam_wire_with_isol_mm'] * n:
-        return None
+    feasible = ~(len_mm < static_params['diam_wire_with_isol_mm'] * n)
 
     # if we have some requirements for max spacing between coil turns, let's use them
     ts_mm = (len_mm - (static_params['diam_wire_with_isol_mm'] * n)) / n
-    if static_params['max_turn_spacing_mm'] and ts_mm > static_params['max_turn_spacing_mm']:
-        return None
+    if static_params['max_turn_spacing_mm']:
+        feasible &= ~(ts_mm > static_params['max_turn_spacing_mm'])
+
+    return n[:, 0], len_um[0], ts_mm, feasible
+
 
-    # calculate the coil
-    try:
-        ind = Inductor(**params)
-        results = ind.analyze()
-    except RuntimeError:
-        return None
+def _phase(n, len_um, diam_mm, static_params):
+    """Phase shift of the coils (NaN where the analysis failed)."""
+    # the reference temperature applies, so only roundoff differs from the raw diameter
+    diam_wire = static_params['diam_wire_core_mm'] * 1e-3
+    diam_former = expanded_diam_former(
+        (diam_mm + static_params['diam_wire_with_isol_mm']) * 1e-3, diam_wire, diam_wire,
+        len_um * 1e-6, n, static_params['material']['temp_coeff_expan'], 0)
+    prop_factor, _ = prop_factor_batch(n, len_um * 1e-6, diam_wire, diam_former,
+                                       static_params['frequency'])
 
-    phi = results['prop_factor'] * len_um * 1e-6
+    return prop_factor * len_um * 1e-6
+
+
+def _analyze(n, len_um, diam_mm, static_params):
+    """Full Inductor.analyze() outputs of the coils, as arrays (with a last axis over the
+    materials if the solver has several)."""
+    params = dict(N=n, len_coil=len_um * 1e-6,
+                  diam_former=(diam_mm + static_params['diam_wire_with_isol_mm']) * 1e-3,
+                  diam_wire=static_params['diam_wire_core_mm'] * 1e-3,
+                  f=static_params['frequency'])
+    if static_params['materials']:
+        # the geometry dependent part is analyzed once for all materials
+        return analyze_materials(static_params['materials'], **params)
+
+    return DesignSet(**dict(params, **static_params['material'])).analyze()
+
+
+def _phase_state(phi, static_params):
+    """Position of phi relative to the tolerance window: -1 below, 0 inside, 1 above and 2
+    if the analysis failed."""
     tol_pct = static_params['phase_shift_tolerance_pct']
-    # if phi is within the allowed tolerance
-    if (static_params['phase_shift_rad'] * (1 - tol_pct / 100)) < phi < (
-            static_params['phase_shift_rad'] * (1 + tol_pct / 100)):
+    state = np.where(phi >= static_params['phase_shift_rad'] * (1 + tol_pct / 100), 1, 0)
+    state[phi <= static_params['phase_shift_rad'] * (1 - tol_pct / 100)] = -1
+    state[np.isnan(phi)] = 2
+
+    return state
+
+
+def _ragged_arange(starts, stops):
+    """Concatenate np.arange(start, stop) for all start/stop pairs; returns the index of the
+    pair each value belongs to, and the values."""
+    counts = np.maximum(stops - starts, 0)
+    owner = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return owner, starts[owner] + offsets
+
+
+def _scan_chunk(chunk, static_params):
+    """Analyze every feasible point of the chunk (all of them are returned)."""
+    n, len_um, ts_mm, feasible = _grid(chunk, static_params)
+
+    rows, cols = np.nonzero(feasible)
+    phi = _phase(n[rows], len_um[cols], chunk[2], static_params)
+
+    return rows, cols, phi
+
+
+def _bracket_chunk(chunk, static_params):
+    """Per (N, diameter) pair, sample the feasible lengths every 'bracket_step' grid points,
+    then bisect (on the grid) every interval whose end points sit on different sides of the
+    tolerance window edges. The accepted points are the ones between neighbouring samples
+    that are both inside the window, which is what the exhaustive scan finds as long as phi
+    crosses each window edge at most once between two coarse samples."""
+    n, len_um, ts_mm, feasible = _grid(chunk, static_params)
+
+    pairs = np.flatnonzero(feasible.any(axis=1))
+    first = feasible[pairs].argmax(axis=1)
+    last = len_um.size - 1 - feasible[pairs, ::-1].argmax(axis=1)
+
+    def evaluate(owner, cols):
+        return _phase(n[pairs[owner]], len_um[cols], chunk[2], static_params)
+
+    # coarse pass (always including the last feasible length)
+    step = static_params['bracket_step']
+    owner, cols = _ragged_arange(np.zeros_like(first), -(-(last - first) // step))
+    owner = np.concatenate([owner, np.arange(len(pairs))])
+    cols = np.concatenate([first[owner[:len(cols)]] + cols * step, last])
+    phi = evaluate(owner, cols)
+
+    # bisect until neighbouring samples with different states are adjacent grid points
+    while True:
+        order = np.lexsort((cols, owner))
+        owner, cols, phi = owner[order], cols[order], phi[order]
+        keep = np.ones(len(cols), dtype=bool)
+        keep[1:] = (owner[1:] != owner[:-1]) | (cols[1:] != cols[:-1])
+        owner, cols, phi = owner[keep], cols[keep], phi[keep]
+        state = _phase_state(phi, static_params)
+
+        split = ((owner[1:] == owner[:-1]) & (state[1:] != state[:-1]) &
+                 (cols[1:] - cols[:-1] > 1))
+        if not split.any():
+            break
+
+        new_owner = owner[:-1][split]
+        new_cols = (cols[:-1][split] + cols[1:][split]) // 2
+        owner = np.concatenate([owner, new_owner])
+        cols = np.concatenate([cols, new_cols])
+        phi = np.concatenate([phi, evaluate(new_owner, new_cols)])
+
+    # fill the gaps between neighbouring samples that are both inside the window
+    inside = state == 0
+    fill = (owner[1:] == owner[:-1]) & inside[1:] & inside[:-1]
+    gap_owner, gap_cols = _ragged_arange(cols[:-1][fill] + 1, cols[1:][fill])
+    gap_owner = owner[:-1][fill][gap_owner]
+    gap_phi = evaluate(gap_owner, gap_cols)
+
+    owner = np.concatenate([owner[inside], gap_owner])
+    cols = np.concatenate([cols[inside], gap_cols])
+    phi = np.concatenate([phi[inside], gap_phi])
+    accepted = _phase_state(phi, static_params) == 0
+
+    return pairs[owner[accepted]], cols[accepted], phi[accepted]
+
+
+def _solutions(chunk, rows, cols, phi, static_params):
+    """Solution tuples (the fields of CoilSolution) of the accepted grid points of a chunk."""
+    n, len_um, ts_mm, _ = _grid(chunk, static_params)
+    len_mm = len_um * 1e-3
+    wire = tuple(static_params['wire']) if static_params['wire'] else None
+    materials = static_params['materials'] or [None]
+
+    if static_params['full_results']:
+        analysis = _analyze(n[rows], len_um[cols], chunk[2], static_params)
+        if not static_params['materials']:
+            analysis = dict((name, value[:, None]) for name, value in analysis.items())
+        analyses = [[dict((name, float(analysis[name][i, j])) for name in RESULT_NAMES)
+                     for j in range(len(materials))] for i in range(len(rows))]
+    else:
+        analyses = [[None] * len(materials)] * len(rows)
 
-        # return coil parameters: N of turns, diameter, length, phi and turn spacing
-        return "N={}, diameter_mm={}, length_mm={}, phi={}, turn_spacing_mm={}".format(
-            n, diam_mm, len_mm, phi, ts_mm)
+    # return coil parameters: N of turns, diameter, length, phi and turn spacing, once per
+    # material
+    return [(int(n[r]), chunk[2], float(len_mm[c]), float(p), float(ts_mm[r, c]), a, wire, m)
+            for r, c, p, point in zip(rows, cols, phi, analyses)
+            for a, m in zip(point, materials)]
+
+
+def _solve_chunk(chunk):
+    """This is the core of the solver. It takes a chunk descriptor (a range of turns and one
+    diameter), builds the N x length grid for it as arrays, drops the points that don't meet
+    the winding constraints and analyzes the remaining ones (all of them or only those
+    needed to bracket the tolerance window, depending on the search mode). Coil parameters
+    whose phi is within the allowed tolerance are returned as a list of tuples
+    (the fields of CoilSolution), after the chunk itself and before the points to store
+    (see ResultStore) if requested: N and length indices and phi of every analyzed point in
+    'scan' mode, and of the accepted ones in 'bracket' mode. A Profile of the chunk follows if
+    profiling is requested."""
+
+    static_params = _static_params
+    if static_params['profile']:
+        profile = Profile()
+        with profile:
+            t_start = profile.start()
+            out = _search_chunk(chunk, static_params)
+            profile.stop('chunk', t_start, (chunk[1] - chunk[0]) *
+                         len(range(*static_params['len_range_um'])))
+        return out + (profile,)
+
+    return _search_chunk(chunk, static_params) + (None,)
+
+
+def _search_chunk(chunk, static_params):
+    if static_params['search'] == 'bracket':
+        rows, cols, phi = _bracket_chunk(chunk, static_params)
+        stored = rows, cols, phi
+    else:
+        rows, cols, phi = _scan_chunk(chunk, static_params)
+        valid = ~np.isnan(phi)
+        stored = rows[valid], cols[valid], phi[valid]
+        accepted = _phase_state(phi, static_params) == 0
+        rows, cols, phi = rows[accepted], cols[accepted], phi[accepted]
+
+    points = stored if static_params['store'] else None
+    return chunk, _solutions(chunk, rows, cols, phi, static_params), points
 
 
 class PhasingCoilSolver:
     def __init__(self, phase_shift_rad, phase_shift_tolerance_pct, frequency, diam_wire_core_mm,
                  diam_wire_with_isol_mm, N_range, diams_mm, len_range_mm, material,
-                 max_turn_spacing_mm=0, ncpus=0):
+                 max_turn_spacing_mm=0, ncpus=0, search='scan', bracket_step=32,
+                 backend='auto'):
         """
         Parameters:
         phase_shift_rad (float): Phase shift we want to achieve
         phase_shift_tolerance_pct (float): Relative allowed phase shift difference (+/- percent)
         frequency (float): center frequency
-        diam_wire_core_mm (float): Diameter of the wire's core
-        diam_wire_with_isol_mm (float): Diameter of the wire including insulation
+        diam_wire_core_mm (float): Diameter of the wire's core, or a list of them to try
+                                   several wires in one run
+        diam_wire_with_isol_mm (float): Diameter of the wire including insulation (or a list,
+                                        one per core diameter)
         N_range (tuple): Range of coil turns for which to perform the calculations,
                          e.g. (10, 100)
         diams_mm (list): List of coil diameters, e.g. [16, 20, 25, 32, 100, 125, 1500]
@@ -74,12 +256,37 @@ class PhasingCoilSolver:
         len_range_mm (tuple): Range of coil lenghts for which to perform the calculations,
                               incl. step, e.g. (20, 300, 1)
         material (str): String defining the material of wire. See PyInductor.data for what's
-                        supported.
+                        supported. A list of them gives every solution once per material,
+                        which only matters to full_results: the phase shift doesn't depend
+                        on the material, and the analysis shares everything but the losses
+                        between materials.
         max_turn_spacing_mm (float): Optional spacing limit between wires (their insulations,
                                      to be more precise).
         ncpus (int): Optional number of CPUs we want to utilize; if set to zero, it defaults to
                      number of available CPUs minus one which is reasonable for most cases.
+        search (str): 'scan' analyzes every point of the length grid, 'bracket' samples it
+                      coarsely per (N, diameter) pair and bisects the tolerance window edges,
+                      which is much faster for fine length steps. Both give the same results
+                      unless phi crosses a window edge several times within one coarse step.
+        bracket_step (int): Number of length grid steps between coarse samples in 'bracket'
+                            search mode.
+        backend (str): Execution backend of solve() when it isn't given an Executor:
+                       'auto', 'process', 'thread' or 'serial' (see Executor).
         """
+        if search not in ('scan', 'bracket'):
+            raise ValueError("search must be 'scan' or 'bracket'")
+
+        # several wires are solved one after the other (see wire_solvers())
+        self.wires = None
+        self.wire = None
+        if np.ndim(diam_wire_core_mm) or np.ndim(diam_wire_with_isol_mm):
+            self.wires = [(float(core), float(with_isol)) for core, with_isol in
+                          zip(*np.broadcast_arrays(diam_wire_core_mm, diam_wire_with_isol_mm))]
+            diam_wire_core_mm, diam_wire_with_isol_mm = self.wires[0]
+        self.materials = None
+        if isinstance(material, (list, tuple)):
+            self.materials = list(material)
+            material = self.materials[0]
 
         self.phase_shift_rad = phase_shift_rad
         self.phase_shift_tolerance_pct = phase_shift_tolerance_pct
@@ -91,34 +298,177 @@ class PhasingCoilSolver:
         self.len_range_mm = len_range_mm
         self.material = MATERIALS[material]
         self.max_turn_spacing_mm = max_turn_spacing_mm
+        self.search = search
+        self.bracket_step = bracket_step
+        self.backend = backend
         if ncpus:
             self.ncpus = ncpus
         else:
             self.ncpus = (cpu_count() - 1) if cpu_count() >= 2 else 1
 
-    def solve(self):
+    @property
+    def len_range_um(self):
+        """Length range as integer micrometres: start, stop (exclusive) and step."""
+        len_range_um = [int(l_mm * 1e3) for l_mm in self.len_range_mm]
+        return (len_range_um[0],  # start value
+                len_range_um[1] + len_range_um[2],  # incl. end value
+                len_range_um[2])  # step
 
-        pool = Pool(processes=self.ncpus)
+    def static_params(self, full_results=False, store=False, profile=False):
+        params = dict(self.__dict__)
+        params['len_range_um'] = self.len_range_um
+        params['full_results'] = full_results
+        params['store'] = store
+        params['profile'] = profile
+        return params
 
-        len_range_um = [int(l_mm * 1e3) for l_mm in self.len_range_mm]
-        # generate all possible combinations
-        combinations = product(range(self.N_range[0],  # start value
-                                     self.N_range[1] + 1),  # end value
-                               self.diams_mm,
-                               range(len_range_um[0],  # start value
-                                     len_range_um[1] + len_range_um[2],  # incl. end value
-                                     len_range_um[2]))  # step
-        # attach coil static parameters to the combinations
-        combinations_with_static_params = [c + (self.__dict__,) for c in combinations]
-
-        print("{begin_end} Processing started with {ncpus} procs {begin_end}".format(
-            begin_end=10 * "-", ncpus=self.ncpus))
-        dt_start = datetime.now()
-
-        # feed the process pool with the data (generated combinations + static coil params)
-        for out in pool.imap_unordered(_solver, combinations_with_static_params):
-            if out:
-                print(out)
-
-        print("{begin_end} Processing stopped. Time consumed: {timedelta} {begin_end}".format(
-            begin_end=10 * "-", timedelta=datetime.now() - dt_start))
+    def phase_window(self):
+        """Phase shifts bounding the tolerance window (exclusive)."""
+        tol_pct = self.phase_shift_tolerance_pct
+        return (self.phase_shift_rad * (1 - tol_pct / 100),
+                self.phase_shift_rad * (1 + tol_pct / 100))
+
+    def wire_solvers(self):
+        """Solvers of one wire each, tagging their solutions with it (or just this one if it
+        has a single wire)."""
+        if self.wires is None:
+            return [self]
+
+        solvers = []
+        for wire in self.wires:
+            solver = copy.copy(self)
+            solver.wires = None
+            solver.wire = wire
+            solver.diam_wire_core_mm, solver.diam_wire_with_isol_mm = wire
+            solvers.append(solver)
+        return solvers
+
+    def chunks(self, points=CHUNK_POINTS, balance=True):
+        """
+        Split the grid into chunk descriptors: (first N, last N + 1, diameter), of about
+        'points' grid points each. With 'balance' set chunks are made smaller if needed to
+        give every CPU something to do; without it the split only depends on the grid.
+        """
+        n_lengths = max(1, len(range(*self.len_range_um)))
+        n_per_chunk = max(1, points // n_lengths)
+        n_start, n_stop = self.N_range[0], self.N_range[1] + 1
+
+        # make sure every process gets something to do
+        n_diams = max(1, len(self.diams_mm))
+        if balance:
+            n_per_chunk = min(n_per_chunk,
+                              max(1, -(-(n_stop - n_start) * n_diams // self.ncpus) // n_diams))
+
+        return [(n, min(n + n_per_chunk, n_stop), diam_mm)
+                for diam_mm in self.diams_mm
+                for n in range(n_start, n_stop, n_per_chunk)]
+
+    def solve(self, sinks=None, full_results=False, store=None, executor=None,
+              progress=None, profile=None):
+        """
+        Print the coils whose phase shift is within the tolerance, as the solver always
+        did; with sinks, feed them to those instead (see run()). Returns the number of
+        solutions found. iter_solutions() generates them as records.
+        """
+        return self.run(sinks, full_results, store, executor, progress, profile)
+
+    def iter_solutions(self, full_results=False, store=None, executor=None, progress=None,
+                       profile=None):
+        """
+        Generate the coils whose phase shift is within the tolerance, as CoilSolution
+        records (in no particular order when several workers are used).
+
+        Parameters:
+        full_results (bool): Also attach the full Inductor.analyze() outputs to every
+                             record (as a dict in its 'analysis' field).
+        store (ResultStore): Checkpoint every solved chunk to this store, and take the
+                             chunks it already covers from it instead of solving them
+                             again. An interrupted run thus resumes where it stopped, and
+                             after a 'scan' run any other phase shift or tolerance is
+                             answered from the store without computing anything.
+        executor (Executor): Workers to solve the chunks with, e.g. to keep one pool for
+                             several runs (default: a new Executor of 'backend' and
+                             'ncpus', closed at the end).
+        progress (function): Called with a Progress record (grid points/s, ETA) after
+                             every chunk, e.g. PyInductor.executor.print_progress.
+        profile (Profile): Add the stage timings and solver statistics of every solved
+                           chunk (from whichever worker solved it) to this profile.
+
+        With several wires, they are solved one after the other on the same executor.
+        """
+        owned = executor is None
+        if owned:
+            executor = Executor(self.backend, self.ncpus)
+
+        completed = False
+        try:
+            for solver in self.wire_solvers():
+                for solution in solver._solve(full_results, store, executor, progress,
+                                              profile):
+                    yield solution
+            completed = True
+        finally:
+            if owned:
+                if completed:
+                    executor.close()
+                else:
+                    executor.terminate()
+
+    def _solve(self, full_results, store, executor, progress, profile):
+        # iter_solutions() for a single wire
+        chunks = self.chunks()
+        static_params = self.static_params(full_results, store is not None,
+                                           profile is not None)
+
+        if store is not None:
+            key = store.run_key(self)
+            phi_lo, phi_hi = self.phase_window()
+            stored = [chunk for chunk in chunks if store.covers(key, chunk, phi_lo, phi_hi)]
+            chunks = [chunk for chunk in chunks if chunk not in stored]
+            # bracket results only cover the window they were searched for
+            window = (phi_lo, phi_hi) if self.search == 'bracket' else (None, None)
+
+            _init_worker(static_params)
+            for chunk in stored:
+                rows, cols, phi = store.points(key, chunk, phi_lo, phi_hi)
+                for solution in _solutions(chunk, rows, cols, phi, static_params):
+                    yield CoilSolution(*solution)
+
+        n_lengths = len(range(*self.len_range_um))
+        outputs = executor.imap(_solve_chunk, chunks, _init_worker, (static_params,),
+                                weights=[(n_stop - n_start) * n_lengths
+                                         for n_start, n_stop, _ in chunks],
+                                progress=progress)
+        for chunk, solutions, points, chunk_profile in outputs:
+            if profile is not None:
+                profile.merge(chunk_profile)
+            if store is not None:
+                store.save_chunk(key, chunk, *(points + window))
+            for solution in solutions:
+                yield CoilSolution(*solution)
+
+    def run(self, sinks=None, full_results=False, store=None, executor=None, progress=None,
+            profile=None):
+        """
+        Solve and feed every solution to the given sinks (see PyInductor.sinks), which
+        default to printing them. Returns the number of solutions found; the other
+        parameters are those of iter_solutions().
+        """
+        if sinks is None:
+            sinks = [PrintSink()]
+
+        for sink in sinks:
+            sink.start(self)
+
+        count = 0
+        try:
+            for solution in self.iter_solutions(full_results, store, executor, progress,
+                                                profile):
+                for sink in sinks:
+                    sink.write(solution)
+                count += 1
+        finally:
+            for sink in sinks:
+                sink.close()
+
+        return count
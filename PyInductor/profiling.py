@@ -0,0 +1,185 @@
+from __future__ import division
+
+import functools
+import threading
+import time
+
+import numpy as np
+
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+# the Profile recording in each thread, if any (see Profile.__enter__())
+_local = threading.local()
+
+
+def active():
+    """The Profile currently recording in this thread, or None."""
+    return getattr(_local, 'profile', None)
+
+
+class _Stacks(threading.local):
+    # per thread state of a Profile: the times of the nested stages of the running ones and
+    # the profiles that were active before each 'with profile:'
+    def __init__(self):
+        self.children = []
+        self.previous = []
+
+
+class Profile(object):
+    """
+    Opt-in instrumentation of the analysis: wall time per stage, dispersion solver iteration
+    counts and convergence failures. Stages are the quantities of PyInductor.model.Analysis
+    (e.g. 'phi' is the proximity lookup, 'dispersion' the root finding, 'res_freq' the
+    self-resonance search) and the entry points that call them ('analyze', 'tune_parameter',
+    the solver's 'chunk', ...). Times are exclusive, i.e. without the nested stages, so the
+    time of an entry point is its own overhead.
+
+    Recording happens while the profile is active, i.e. within 'with profile:', or during
+    the calls of an Inductor whose 'profile' attribute is set (or of a PhasingCoilSolver run
+    given profile=...). Which profile is active is kept per thread, so threads sharing a
+    profile or each recording into their own don't mix up their stages. When no profile is
+    active the cost is one thread-local lookup per quantity. Profiles pickle and merge()
+    into each other, which is how worker processes report back.
+    """
+
+    def __init__(self):
+        # stage -> [calls, exclusive seconds, inclusive seconds, elements]
+        self.stages = {}
+        # stage -> number of elements that failed
+        self.failures = {}
+        self.dispersion_solves = 0
+        self.dispersion_iterations = 0
+        self.dispersion_max_iterations = 0
+        self._stacks = _Stacks()
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        self._stacks.previous.append(active())
+        _local.profile = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.profile = self._stacks.previous.pop()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_stacks'], state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._stacks = _Stacks()
+        self._lock = threading.RLock()
+
+    def start(self):
+        """Start timing a stage; pass the returned token to stop()."""
+        self._stacks.children.append(0.)
+        return _timer()
+
+    def stop(self, name, t_start, elements=1):
+        elapsed = _timer() - t_start
+        children = self._stacks.children
+        exclusive = elapsed - children.pop()
+        if children:
+            children[-1] += elapsed
+
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = [0, 0., 0., 0]
+            stats[0] += 1
+            stats[1] += exclusive
+            stats[2] += elapsed
+            stats[3] += elements
+
+    def record_dispersion(self, result):
+        """Count the iterations and failures of a DispersionResult."""
+        converged = np.asarray(result.converged)
+        iterations = np.asarray(result.iterations)
+        with self._lock:
+            self.dispersion_solves += converged.size
+            self.dispersion_iterations += int(iterations.sum())
+            self.dispersion_max_iterations = max(
+                self.dispersion_max_iterations, int(iterations.max()) if iterations.size else 0)
+            self.record_failures('dispersion',
+                                 converged.size - int(np.count_nonzero(converged)))
+
+    def record_failures(self, name, count=1):
+        if count:
+            with self._lock:
+                self.failures[name] = self.failures.get(name, 0) + count
+
+    def merge(self, other):
+        """Add the records of another profile (e.g. from a worker process) to this one."""
+        with self._lock:
+            for name, stats in other.stages.items():
+                mine = self.stages.setdefault(name, [0, 0., 0., 0])
+                for i, value in enumerate(stats):
+                    mine[i] += value
+            for name, count in other.failures.items():
+                self.record_failures(name, count)
+            self.dispersion_solves += other.dispersion_solves
+            self.dispersion_iterations += other.dispersion_iterations
+            self.dispersion_max_iterations = max(self.dispersion_max_iterations,
+                                                 other.dispersion_max_iterations)
+        return self
+
+    @property
+    def total_time(self):
+        return sum(stats[1] for stats in self.stages.values())
+
+    def as_dict(self):
+        """Plain dict of the records (e.g. for JSON)."""
+        return dict(
+            stages=dict((name, dict(zip(('calls', 'seconds', 'inclusive_seconds', 'elements'),
+                                        stats)))
+                        for name, stats in self.stages.items()),
+            failures=dict(self.failures), dispersion_solves=self.dispersion_solves,
+            dispersion_iterations=self.dispersion_iterations,
+            dispersion_max_iterations=self.dispersion_max_iterations)
+
+    def report(self):
+        """Summary table of the stages (slowest first) and solver statistics."""
+        total = self.total_time or 1.
+        lines = ['%-16s %9s %11s %10s %6s %12s' % (
+            'stage', 'calls', 'elements', 'time (s)', '%', 'us/element')]
+        for name, (calls, seconds, _, elements) in sorted(self.stages.items(),
+                                                          key=lambda item: -item[1][1]):
+            lines.append('%-16s %9d %11d %10.4g %6.1f %12.4g' % (
+                name, calls, elements, seconds, 100 * seconds / total,
+                1e6 * seconds / elements if elements else np.nan))
+
+        if self.dispersion_solves:
+            lines.append('dispersion: %d roots, %.2f iterations on average (at most %d)' % (
+                self.dispersion_solves, self.dispersion_iterations / self.dispersion_solves,
+                self.dispersion_max_iterations))
+        for name, count in sorted(self.failures.items()):
+            lines.append('%s: %d failure(s)' % (name, count))
+
+        return '\n'.join(lines)
+
+
+def profiled(name):
+    """
+    Record the decorated method as a stage when its instance has a 'profile' set or a
+    profile is active.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profile = self.profile or active()
+            if profile is None:
+                return method(self, *args, **kwargs)
+
+            with profile:
+                t_start = profile.start()
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    profile.stop(name, t_start)
+        return wrapper
+    return decorate
+
+
+__all__ = ['Profile', 'profiled', 'active']
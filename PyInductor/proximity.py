@@ -0,0 +1,208 @@
+from __future__ import division
+
+import numpy as np
+
+from bisect import bisect_right
+from PyInductor.data import MEDHURST_L_D, MEDHURST_D_S, MEDHURST_MATRIX
+
+
+EXTRAPOLATION = ('clamp', 'extend', 'nan', 'raise')
+
+# types that take the scalar fast path without asking numpy
+_SCALARS = (float, int, np.float64)
+
+
+def _slopes(values, grid, axis):
+    """Finite difference derivative estimates along one axis of a non-uniform grid
+    (one-sided at the edges, weighted central differences inside)."""
+    values = np.moveaxis(values, axis, -1)
+    h = np.diff(grid)
+    delta = np.diff(values, axis=-1) / h
+
+    slopes = np.empty_like(values)
+    slopes[..., 0] = delta[..., 0]
+    slopes[..., -1] = delta[..., -1]
+    slopes[..., 1:-1] = (h[1:] * delta[..., :-1] + h[:-1] * delta[..., 1:]) / (h[:-1] + h[1:])
+
+    return np.moveaxis(slopes, -1, axis)
+
+
+def _hermite_matrix():
+    # maps [f(0), f(1), f'(0), f'(1)] to the coefficients of 1, t, t^2, t^3
+    return np.array([[1, 0, 0, 0],
+                     [0, 0, 1, 0],
+                     [-3, 3, -2, -1],
+                     [2, -2, 1, 1]], dtype=float)
+
+
+class MedhurstProximity(object):
+    """
+    Medhurst proximity factor as a function of coil length / diameter and wire diameter /
+    pitch, interpolated from the table in PyInductor.data.
+
+    The polynomial coefficients of every table cell are computed once, so a lookup only
+    locates the cell and evaluates a polynomial. Scalar inputs take a pure Python path and
+    return a float; array inputs are broadcast against each other and evaluated element-wise
+    (unlike interp2d, which evaluated on the outer grid of its arguments).
+
+    Parameters:
+    kind (str): 'linear' (bilinear, which is what interp2d did) or 'cubic' (bicubic Hermite
+                patches with finite difference derivatives, C1 continuous)
+    extrapolation (str): What to do outside the table: 'clamp' to its edges (the interp2d
+                         behaviour), 'extend' the edge cell polynomials, return 'nan' or
+                         'raise' a ValueError.
+    """
+
+    def __init__(self, kind='linear', extrapolation='clamp', len_diam=MEDHURST_L_D,
+                 diam_spacing=MEDHURST_D_S, values=MEDHURST_MATRIX):
+        if kind not in ('linear', 'cubic'):
+            raise ValueError("kind must be 'linear' or 'cubic'")
+        if extrapolation not in EXTRAPOLATION:
+            raise ValueError('extrapolation must be one of %s' % ', '.join(EXTRAPOLATION))
+
+        self.kind = kind
+        self.extrapolation = extrapolation
+        self.x = np.asarray(len_diam, dtype=float)
+        self.y = np.asarray(diam_spacing, dtype=float)
+        values = np.asarray(values, dtype=float)  # rows follow y, columns follow x
+
+        if kind == 'linear':
+            # f = c[0] + c[1] * t + c[2] * u + c[3] * t * u, t and u in [0, 1] within a cell
+            f00, f10 = values[:-1, :-1], values[:-1, 1:]
+            f01, f11 = values[1:, :-1], values[1:, 1:]
+            coeffs = np.stack([f00, f10 - f00, f01 - f00, f11 - f10 - f01 + f00], axis=-1)
+        else:
+            hx = np.diff(self.x)[None, :]
+            hy = np.diff(self.y)[:, None]
+            fx = _slopes(values, self.x, axis=1)
+            fy = _slopes(values, self.y, axis=0)
+            fxy = _slopes(fx, self.y, axis=0)
+
+            def corners(a):
+                return np.stack([np.stack([a[:-1, :-1], a[1:, :-1]], axis=-1),
+                                 np.stack([a[:-1, 1:], a[1:, 1:]], axis=-1)], axis=-2)
+
+            # K[i, j] = d^(i//2 + j//2) f / dt^(i//2) du^(j//2) at corner (i % 2, j % 2),
+            # with t and u normalized to the cell size
+            K = np.zeros(values[:-1, :-1].shape + (4, 4))
+            K[..., :2, :2] = corners(values)
+            K[..., 2:, :2] = corners(fx) * hx[..., None, None]
+            K[..., :2, 2:] = corners(fy) * hy[..., None, None]
+            K[..., 2:, 2:] = corners(fxy) * (hx * hy)[..., None, None]
+
+            A = _hermite_matrix()
+            # f = sum(c[m, n] * t**m * u**n)
+            coeffs = np.einsum('mi,...ij,nj->...mn', A, K, A).reshape(K.shape[:-2] + (16,))
+
+        self.coeffs = coeffs
+        self._scalar = self._scalar_lookup()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_scalar']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._scalar = self._scalar_lookup()
+
+    def __call__(self, len_diam, diam_spacing):
+        if type(len_diam) is float and type(diam_spacing) is float:
+            return self._scalar(len_diam, diam_spacing)
+        if type(len_diam) in _SCALARS and type(diam_spacing) in _SCALARS or (
+                np.ndim(len_diam) == 0 and np.ndim(diam_spacing) == 0):
+            return self._scalar(float(len_diam), float(diam_spacing))
+        return self._array(np.asarray(len_diam, dtype=float),
+                           np.asarray(diam_spacing, dtype=float))
+
+    def _scalar_lookup(self):
+        """
+        Pure Python lookup of one point, for the kind and extrapolation of the table: all it
+        needs is bound to local names of the closure, and the cell is found by a bisection
+        restricted to the inner grid points, which needs no clamping.
+        """
+        # plain Python copies of the grid and the coefficients
+        xs, ys = self.x.tolist(), self.y.tolist()
+        coeffs = self.coeffs.tolist()
+        x_first, x_last, y_first, y_last = xs[0], xs[-1], ys[0], ys[-1]
+        x_cells, y_cells = len(xs) - 1, len(ys) - 1
+        extrapolation = self.extrapolation
+
+        def outside(x, y):
+            # (x, y) for the cell lookup, or a float result
+            if extrapolation == 'raise':
+                raise ValueError('(%g, %g) is outside the Medhurst table' % (x, y))
+            if extrapolation == 'nan' or x != x or y != y:
+                return float('nan')
+            if extrapolation == 'clamp':
+                return min(max(x, x_first), x_last), min(max(y, y_first), y_last)
+            return x, y
+
+        if self.kind == 'linear':
+            def lookup(x, y):
+                if not (x_first <= x <= x_last and y_first <= y <= y_last):
+                    point = outside(x, y)
+                    if type(point) is float:
+                        return point
+                    x, y = point
+                i = bisect_right(xs, x, 1, x_cells) - 1
+                j = bisect_right(ys, y, 1, y_cells) - 1
+                x0, y0 = xs[i], ys[j]
+                t = (x - x0) / (xs[i + 1] - x0)
+                u = (y - y0) / (ys[j + 1] - y0)
+                c = coeffs[j][i]
+                return c[0] + c[1] * t + c[2] * u + c[3] * t * u
+        else:
+            def lookup(x, y):
+                if not (x_first <= x <= x_last and y_first <= y <= y_last):
+                    point = outside(x, y)
+                    if type(point) is float:
+                        return point
+                    x, y = point
+                i = bisect_right(xs, x, 1, x_cells) - 1
+                j = bisect_right(ys, y, 1, y_cells) - 1
+                x0, y0 = xs[i], ys[j]
+                t = (x - x0) / (xs[i + 1] - x0)
+                u = (y - y0) / (ys[j + 1] - y0)
+                c = coeffs[j][i]
+                # Horner in t of polynomials in u
+                return ((((c[15] * u + c[14]) * u + c[13]) * u + c[12]) * t +
+                        (((c[11] * u + c[10]) * u + c[9]) * u + c[8])) * t * t + (
+                    (((c[7] * u + c[6]) * u + c[5]) * u + c[4]) * t +
+                    (((c[3] * u + c[2]) * u + c[1]) * u + c[0]))
+
+        return lookup
+
+    def _array(self, x, y):
+        x, y = np.broadcast_arrays(x, y)
+        outside = ~((self.x[0] <= x) & (x <= self.x[-1]) & (self.y[0] <= y) & (y <= self.y[-1]))
+
+        if self.extrapolation == 'raise' and outside.any():
+            raise ValueError('%d point(s) outside the Medhurst table' % outside.sum())
+        if self.extrapolation == 'clamp':
+            x = np.clip(x, self.x[0], self.x[-1])
+            y = np.clip(y, self.y[0], self.y[-1])
+
+        i = np.clip(np.searchsorted(self.x, x, side='right') - 1, 0, len(self.x) - 2)
+        j = np.clip(np.searchsorted(self.y, y, side='right') - 1, 0, len(self.y) - 2)
+        t = (x - self.x[i]) / (self.x[i + 1] - self.x[i])
+        u = (y - self.y[j]) / (self.y[j + 1] - self.y[j])
+        c = self.coeffs[j, i]
+
+        if self.kind == 'linear':
+            result = c[..., 0] + c[..., 1] * t + c[..., 2] * u + c[..., 3] * t * u
+        else:
+            c = c.reshape(c.shape[:-1] + (4, 4))
+            result = 0
+            for m in range(3, -1, -1):
+                result = result * t + (((c[..., m, 3] * u + c[..., m, 2]) * u +
+                                        c[..., m, 1]) * u + c[..., m, 0])
+
+        if self.extrapolation == 'nan':
+            result = np.where(outside, np.nan, result)
+        return np.where(np.isnan(x) | np.isnan(y), np.nan, result)
+
+
+proximity_factor = MedhurstProximity()
+
+__all__ = ['MedhurstProximity', 'proximity_factor']
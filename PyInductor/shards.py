@@ -0,0 +1,509 @@
+'''
+Sharded execution of PhasingCoilSolver runs over several processes or hosts.
+
+The grid is split into shards, i.e. self-describing JSON documents holding one chunk and
+every solver parameter needed to solve it, named by a hash of their content. A driver
+submits them to a work queue, workers anywhere claim and solve them and write their
+solutions back, and merge() collects them into what PhasingCoilSolver.iter_solutions()
+would have generated on one machine:
+
+    % python -m PyInductor.shards serve /shared/queue --port 5000  # optional
+    % python -m PyInductor.shards work /shared/queue  # or --connect host:5000, on any host
+
+    queue = FileQueue('/shared/queue')
+    submit(solver, queue)
+    ...
+    solutions = list(merge(solver, queue))
+
+Since shard names only depend on their content, submitting or solving a shard twice (e.g.
+after a worker died and its lease expired) is harmless.
+'''
+from __future__ import division, print_function
+
+import argparse
+import errno
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:  # python 2
+    import SocketServer as socketserver
+
+from PyInductor.phasing_coil_solver import CHUNK_POINTS, CoilSolution, _search_chunk
+
+
+# seconds a claimed shard stays with its worker before others may claim it again
+LEASE_TIME = 600
+
+# solver attributes that don't change the solutions (left out of the shards)
+_LOCAL_PARAMS = ('ncpus', 'backend')
+
+
+def _shard_id(shard):
+    content = json.dumps(shard, sort_keys=True)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def make_shards(solver, full_results=False, points=CHUNK_POINTS):
+    """
+    Shards of a solver run, in the order of the grid (wire by wire): dicts with the chunk,
+    the solver parameters and an 'id' derived from both. The split only depends on the grid
+    (not on the number of CPUs), so every host computes the same shards.
+    """
+    shards = []
+    for wire_solver in solver.wire_solvers():
+        params = wire_solver.static_params(full_results)
+        for name in _LOCAL_PARAMS:
+            params.pop(name)
+
+        for chunk in wire_solver.chunks(points, balance=False):
+            # what a JSON round trip would give, so that ids match wherever computed
+            shard = json.loads(json.dumps(dict(chunk=chunk, params=params)))
+            shard['id'] = _shard_id(shard)
+            shards.append(shard)
+    return shards
+
+
+def solve_shard(shard):
+    """Solutions of a shard, as lists of the CoilSolution fields."""
+    _, solutions, _ = _search_chunk(tuple(shard['chunk']), shard['params'])
+    return [list(solution) for solution in solutions]
+
+
+def _worker_name():
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+class WorkQueue(object):
+    """
+    Base class of the shard queues. Shards are submitted once (resubmitting is ignored),
+    claimed by one worker at a time for LEASE_TIME seconds and completed with their
+    solutions, which stay available to result().
+    """
+
+    def submit(self, shards):
+        raise NotImplementedError
+
+    def claim(self, worker=None):
+        """A shard that is neither done nor claimed by another worker, or None."""
+        raise NotImplementedError
+
+    def renew(self, shard_id, worker=None):
+        """Extend the lease of a shard, if 'worker' still holds it."""
+        raise NotImplementedError
+
+    def complete(self, shard_id, solutions, worker=None):
+        raise NotImplementedError
+
+    def result(self, shard_id):
+        """Solutions of a completed shard, or None."""
+        raise NotImplementedError
+
+    def status(self):
+        """Number of shards submitted, done and claimed (and not done)."""
+        raise NotImplementedError
+
+
+class MemoryQueue(WorkQueue):
+    """Queue within one process (e.g. behind a QueueServer)."""
+
+    def __init__(self, lease_time=LEASE_TIME):
+        self.lease_time = lease_time
+        self.shards = {}
+        self.order = []
+        self.claims = {}
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def submit(self, shards):
+        with self.lock:
+            for shard in shards:
+                if shard['id'] not in self.shards:
+                    self.shards[shard['id']] = shard
+                    self.order.append(shard['id'])
+
+    def claim(self, worker=None):
+        now = time.time()
+        with self.lock:
+            for shard_id in self.order:
+                if shard_id in self.results:
+                    continue
+                claim = self.claims.get(shard_id)
+                if claim is None or claim[1] + self.lease_time < now:
+                    self.claims[shard_id] = (worker, now)
+                    return self.shards[shard_id]
+        return None
+
+    def renew(self, shard_id, worker=None):
+        with self.lock:
+            if self.claims.get(shard_id, (None,))[0] == worker:
+                self.claims[shard_id] = (worker, time.time())
+
+    def complete(self, shard_id, solutions, worker=None):
+        with self.lock:
+            self.results[shard_id] = solutions
+            self.claims.pop(shard_id, None)
+
+    def result(self, shard_id):
+        with self.lock:
+            return self.results.get(shard_id)
+
+    def status(self):
+        with self.lock:
+            return dict(shards=len(self.shards), done=len(self.results),
+                        claimed=len(set(self.claims) - set(self.results)))
+
+
+def _write_atomic(path, data):
+    # readers either see the whole file or none, and rewriting it is harmless
+    temp = '%s.%s.%d.tmp' % (path, _worker_name().replace(':', '.'),
+                             threading.current_thread().ident)
+    with open(temp, 'w') as f:
+        json.dump(data, f)
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(temp)
+        return
+    os.rename(temp, path)
+
+
+class FileQueue(WorkQueue):
+    """
+    Queue in a directory (e.g. on a shared file system): one file per shard in 'shards',
+    claims in 'claims' and the solutions in 'results', all written atomically. A claim
+    holds the name of its worker and its modification time is the lease; it is numbered,
+    and an expired claim is taken over by creating the next number exclusively, so only one
+    worker can take it over.
+
+    Parameters:
+    path (str): Directory of the queue, created if needed
+    lease_time (float): Seconds after which a claim expires
+    """
+
+    def __init__(self, path, lease_time=LEASE_TIME):
+        self.path = path
+        self.lease_time = lease_time
+        for name in ('shards', 'claims', 'results'):
+            if not os.path.isdir(os.path.join(path, name)):
+                try:
+                    os.makedirs(os.path.join(path, name))
+                except OSError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
+
+    def _file(self, kind, shard_id):
+        return os.path.join(self.path, kind, shard_id + '.json')
+
+    def submit(self, shards):
+        # shards are claimed in the order of their file names
+        names = self._names('shards')
+        known = set(name.split('-', 1)[1] for name in names)
+        for i, shard in enumerate(shards):
+            if shard['id'] not in known:
+                _write_atomic(self._file('shards', '%08d-%s' % (len(names) + i, shard['id'])),
+                              shard)
+
+    def _names(self, kind):
+        return sorted(name[:-5] for name in os.listdir(os.path.join(self.path, kind))
+                      if name.endswith('.json'))
+
+    def _claims(self):
+        # shard id -> (number, name) of its latest claim
+        claims = {}
+        for name in self._names('claims'):
+            shard_id, number = name.rsplit('.', 1)
+            if int(number) >= claims.get(shard_id, (-1,))[0]:
+                claims[shard_id] = (int(number), name)
+        return claims
+
+    def claim(self, worker=None):
+        # claims first, so that a shard completed in between shows up as done
+        claims = self._claims()
+        done = set(self._names('results'))
+        for name in self._names('shards'):
+            shard_id = name.split('-', 1)[1]
+            if shard_id in done or not self._claim(shard_id, claims.get(shard_id),
+                                                   worker or _worker_name()):
+                continue
+            with open(self._file('shards', name)) as f:
+                return json.load(f)
+        return None
+
+    def _claim(self, shard_id, latest, worker):
+        number = 0
+        if latest is not None:
+            try:
+                if time.time() - os.path.getmtime(self._file('claims', latest[1])) <= \
+                        self.lease_time:
+                    return False
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    # completed, or taken over by a newer claim
+                    return False
+                raise
+            number = latest[0] + 1
+
+        # of the workers taking over the same expired claim only one creates the next one
+        try:
+            fd = os.open(self._file('claims', '%s.%d' % (shard_id, number)),
+                         os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                return False
+            raise
+        os.write(fd, worker.encode('utf-8'))
+        os.close(fd)
+
+        if latest is not None:
+            self._remove('claims', latest[1])
+        return True
+
+    def _remove(self, kind, name):
+        try:
+            os.remove(self._file(kind, name))
+        except OSError:
+            pass
+
+    def renew(self, shard_id, worker=None):
+        latest = self._claims().get(shard_id)
+        if latest is None:
+            return
+        path = self._file('claims', latest[1])
+        try:
+            with open(path) as f:
+                if f.read() != (worker or _worker_name()):
+                    return
+            os.utime(path, None)
+        except (IOError, OSError):
+            pass
+
+    def complete(self, shard_id, solutions, worker=None):
+        _write_atomic(self._file('results', shard_id), solutions)
+        for name in self._names('claims'):
+            if name.rsplit('.', 1)[0] == shard_id:
+                self._remove('claims', name)
+
+    def result(self, shard_id):
+        try:
+            with open(self._file('results', shard_id)) as f:
+                return json.load(f)
+        except (IOError, OSError):
+            return None
+
+    def status(self):
+        shards = set(name.split('-', 1)[1] for name in self._names('shards'))
+        done = set(self._names('results')) & shards
+        return dict(shards=len(shards), done=len(done),
+                    claimed=len(set(self._claims()) & shards - done))
+
+
+# methods of a queue that a QueueServer serves
+_METHODS = ('submit', 'claim', 'renew', 'complete', 'result', 'status')
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # one JSON request per line: {"method": ..., "args": [...]} -> {"result": ...}
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode('utf-8'))
+                if request['method'] not in _METHODS:
+                    raise ValueError('unknown method %s' % request['method'])
+                response = dict(result=getattr(self.server.queue, request['method'])(
+                    *request.get('args', ())))
+            except Exception as e:
+                response = dict(error='%s: %s' % (type(e).__name__, e))
+            self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class QueueServer(socketserver.ThreadingTCPServer):
+    """
+    Serve a queue (e.g. a MemoryQueue or a FileQueue on a disk that isn't shared) over TCP
+    to TCPQueue clients; port 0 picks a free one (see 'address').
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, queue, host='127.0.0.1', port=0):
+        socketserver.ThreadingTCPServer.__init__(self, (host, port), _Handler)
+        self.queue = queue
+
+    @property
+    def address(self):
+        return self.server_address[:2]
+
+    def start(self):
+        """Serve from a background thread."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TCPQueue(WorkQueue):
+    """
+    Client of a QueueServer.
+
+    Parameters:
+    address (tuple): (host, port) of the server
+    timeout (float): Seconds to wait for the server
+    """
+
+    def __init__(self, address, timeout=60):
+        self.address = tuple(address)
+        self.timeout = timeout
+
+    def _call(self, method, *args):
+        connection = socket.create_connection(self.address, self.timeout)
+        try:
+            connection.sendall((json.dumps(dict(method=method, args=args)) + '\n')
+                               .encode('utf-8'))
+            response = json.loads(connection.makefile('rb').readline().decode('utf-8'))
+        finally:
+            connection.close()
+        if 'error' in response:
+            raise RuntimeError('queue server: %s' % response['error'])
+        return response['result']
+
+    def submit(self, shards):
+        return self._call('submit', shards)
+
+    def claim(self, worker=None):
+        return self._call('claim', worker or _worker_name())
+
+    def renew(self, shard_id, worker=None):
+        return self._call('renew', shard_id, worker or _worker_name())
+
+    def complete(self, shard_id, solutions, worker=None):
+        return self._call('complete', shard_id, solutions, worker or _worker_name())
+
+    def result(self, shard_id):
+        return self._call('result', shard_id)
+
+    def status(self):
+        return self._call('status')
+
+
+def submit(solver, queue, full_results=False, points=CHUNK_POINTS):
+    """Submit the shards of a solver run; returns them."""
+    shards = make_shards(solver, full_results, points)
+    queue.submit(shards)
+    return shards
+
+
+def _heartbeat(queue, shard_id, worker, interval, stop):
+    # renew the lease of a shard every 'interval' seconds until 'stop' is set
+    while not stop.wait(interval):
+        try:
+            queue.renew(shard_id, worker)
+        except Exception:
+            # a missed renewal at worst gets the shard solved twice
+            pass
+
+
+def work(queue, worker=None, max_shards=None, wait=0, poll=1., heartbeat=None):
+    """
+    Claim and solve shards until the queue has none left (or max_shards are done); with
+    'wait' seconds, keep polling the queue for new shards that long. While a shard is
+    solved its lease is renewed every 'heartbeat' seconds (by default a quarter of the
+    queue's lease_time), so shards taking longer than the lease aren't taken over. Returns
+    the number of shards solved.
+    """
+    worker = worker or _worker_name()
+    if heartbeat is None:
+        heartbeat = getattr(queue, 'lease_time', LEASE_TIME) / 4
+    count = 0
+    idle_since = time.time()
+    while max_shards is None or count < max_shards:
+        shard = queue.claim(worker)
+        if shard is None:
+            if time.time() - idle_since >= wait:
+                break
+            time.sleep(poll)
+            continue
+
+        stop = threading.Event()
+        renewer = threading.Thread(target=_heartbeat,
+                                   args=(queue, shard['id'], worker, heartbeat, stop))
+        renewer.daemon = True
+        renewer.start()
+        try:
+            solutions = solve_shard(shard)
+        finally:
+            stop.set()
+            renewer.join()
+        queue.complete(shard['id'], solutions, worker)
+        count += 1
+        idle_since = time.time()
+
+    return count
+
+
+def merge(solver, queue, full_results=False, points=CHUNK_POINTS):
+    """
+    Generate the CoilSolution records of a sharded run, shard by shard in the order of the
+    grid; the same ones PhasingCoilSolver.iter_solutions() would generate (raises a
+    RuntimeError if some shards are not done yet).
+    """
+    shards = make_shards(solver, full_results, points)
+    results = [queue.result(shard['id']) for shard in shards]
+    missing = sum(result is None for result in results)
+    if missing:
+        raise RuntimeError('%d of %d shards are not done' % (missing, len(shards)))
+
+    for solutions in results:
+        for solution in solutions:
+            solution = CoilSolution(*solution)
+            # JSON turned the wire tuple into a list
+            yield solution._replace(wire=tuple(solution.wire) if solution.wire else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve or serve PhasingCoilSolver shards.')
+    parser.add_argument('command', choices=['work', 'serve'])
+    parser.add_argument('path', nargs='?', help='FileQueue directory')
+    parser.add_argument('--connect', help='host:port of a queue server to work for')
+    parser.add_argument('--host', default='127.0.0.1', help='address to serve on')
+    parser.add_argument('--port', type=int, default=0, help='port to serve on')
+    parser.add_argument('--wait', type=float, default=0,
+                        help='seconds to wait for new shards before stopping')
+    args = parser.parse_args(argv)
+
+    if args.connect:
+        host, port = args.connect.rsplit(':', 1)
+        queue = TCPQueue((host, int(port)))
+    elif args.path:
+        queue = FileQueue(args.path)
+    else:
+        queue = MemoryQueue()
+
+    if args.command == 'work':
+        print('%d shard(s) solved' % work(queue, wait=args.wait))
+        return 0
+
+    server = QueueServer(queue, args.host, args.port)
+    print('serving on %s:%d' % server.address)
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.close()
+    return 0
+
+
+__all__ = ['make_shards', 'solve_shard', 'submit', 'work', 'merge', 'WorkQueue',
+           'MemoryQueue', 'FileQueue', 'TCPQueue', 'QueueServer', 'LEASE_TIME']
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+from __future__ import division
+
+import csv
+import heapq
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from datetime import datetime
+
+
+SOLUTION_FIELDS = ('N', 'diameter_mm', 'length_mm', 'phi', 'turn_spacing_mm')
+
+# columns of the 'wire' tag
+WIRE_FIELDS = ('diam_wire_core_mm', 'diam_wire_with_isol_mm')
+
+# type of the 'material' column of a NumpySink
+MATERIAL_DTYPE = 'U32'
+
+
+def _fields(solution):
+    """Solution fields, plus the wire and material of solvers given several, as (name,
+    value) pairs."""
+    items = [(name, getattr(solution, name)) for name in SOLUTION_FIELDS]
+    if solution.wire is not None:
+        items.extend(zip(WIRE_FIELDS, solution.wire))
+    if solution.material is not None:
+        items.append(('material', solution.material))
+    return items
+
+
+def flatten_solution(solution):
+    """Fields of a CoilSolution (plus its wire and material tags, if set) followed by its
+    analysis outputs (if any), as (name, value) pairs."""
+    items = _fields(solution)
+    if solution.analysis:
+        items.extend(sorted(solution.analysis.items()))
+    return items
+
+
+def open_output(path_or_file):
+    """File to write to and whether it was opened here (and is to be closed by the caller),
+    given a path or an open file."""
+    if hasattr(path_or_file, 'write'):
+        return path_or_file, False
+    return open(path_or_file, 'w'), True
+
+
+class Sink(object):
+    """Base class of the PhasingCoilSolver.run() result sinks."""
+
+    def start(self, solver):
+        pass
+
+    def write(self, solution):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PrintSink(Sink):
+    """Print the solutions (and the start/stop banners) the way the solver always has."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def _print(self, line):
+        (self.stream or sys.stdout).write(line + '\n')
+
+    def start(self, solver):
+        self._print("{begin_end} Processing started with {ncpus} procs {begin_end}".format(
+            begin_end=10 * "-", ncpus=solver.ncpus))
+        self.dt_start = datetime.now()
+
+    def write(self, solution):
+        self._print(', '.join('%s=%s' % item for item in _fields(solution)))
+
+    def close(self):
+        self._print("{begin_end} Processing stopped. Time consumed: {timedelta} {begin_end}".format(
+            begin_end=10 * "-", timedelta=datetime.now() - self.dt_start))
+
+
+class CSVSink(Sink):
+    """Write one CSV row per solution; the analysis outputs (if any) become extra columns."""
+
+    def __init__(self, path_or_file):
+        self.file, self._owned = open_output(path_or_file)
+        self._writer = None
+
+    def write(self, solution):
+        items = flatten_solution(solution)
+        if self._writer is None:
+            self._writer = csv.writer(self.file, lineterminator='\n')
+            self._writer.writerow([name for name, _ in items])
+        self._writer.writerow([value if name == 'material' else repr(value)
+                               for name, value in items])
+
+    def close(self):
+        if self._owned:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class JSONLinesSink(Sink):
+    """Write one JSON object per solution and line."""
+
+    def __init__(self, path_or_file):
+        self.file, self._owned = open_output(path_or_file)
+
+    def write(self, solution):
+        record = dict(_fields(solution))
+        if solution.analysis:
+            record['analysis'] = solution.analysis
+        self.file.write(json.dumps(record, sort_keys=True) + '\n')
+
+    def close(self):
+        if self._owned:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class NumpySink(Sink):
+    """
+    Write the solutions to a .npy file holding a 1-D structured array (one field per column,
+    load it with np.load(path, mmap_mode='r') for large runs). Rows are buffered and spilled
+    to a temporary file, so memory use doesn't grow with the number of solutions.
+    """
+
+    def __init__(self, path, buffer_size=65536):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.count = 0
+        self._dtype = None
+        self._buffer = []
+        self._tmp = None
+
+    def write(self, solution):
+        items = flatten_solution(solution)
+        if self._dtype is None:
+            self._dtype = np.dtype([(str(name), {'N': np.int64, 'material': MATERIAL_DTYPE}
+                                     .get(name, np.float64)) for name, _ in items])
+            self._tmp = open(self.path + '.part', 'wb')
+
+        self._buffer.append(tuple(value for _, value in items))
+        if len(self._buffer) >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._tmp.write(np.array(self._buffer, dtype=self._dtype).tobytes())
+            self.count += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        if self._dtype is None:
+            self._dtype = np.dtype([(str(name), np.int64 if name == 'N' else np.float64)
+                                    for name in SOLUTION_FIELDS])
+        else:
+            self._flush()
+            self._tmp.close()
+
+        with open(self.path, 'wb') as out:
+            np.lib.format.write_array_header_1_0(out, {
+                'descr': np.lib.format.dtype_to_descr(self._dtype),
+                'fortran_order': False,
+                'shape': (self.count,)})
+            if self._tmp is not None:
+                with open(self._tmp.name, 'rb') as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(self._tmp.name)
+
+
+class TopKSink(Sink):
+    """Keep the k solutions with the smallest phase error (|phi - phase_shift_rad|)."""
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+        self._counter = 0
+
+    def start(self, solver):
+        self.phase_shift_rad = solver.phase_shift_rad
+
+    def write(self, solution):
+        # the counter keeps the comparison away from the records on ties
+        entry = (-abs(solution.phi - self.phase_shift_rad), self._counter, solution)
+        self._counter += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def results(self):
+        """The kept solutions, best first."""
+        return [solution for _, _, solution in sorted(self._heap, reverse=True)]
+
+
+__all__ = ['Sink', 'PrintSink', 'CSVSink', 'JSONLinesSink', 'NumpySink', 'TopKSink',
+           'flatten_solution', 'open_output']
@@ -0,0 +1,134 @@
+from __future__ import division
+
+import hashlib
+import json
+import sqlite3
+
+import numpy as np
+
+
+# solver attributes that determine the phase shift of a grid point (and the grid itself)
+PHYSICS_PARAMS = ('frequency', 'diam_wire_core_mm', 'diam_wire_with_isol_mm', 'material',
+                  'max_turn_spacing_mm', 'len_range_um')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    key TEXT PRIMARY KEY,
+    params TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS coils (
+    key TEXT NOT NULL,
+    diam_mm REAL NOT NULL,
+    n INTEGER NOT NULL,
+    phi_lo REAL,
+    phi_hi REAL,
+    len_start INTEGER NOT NULL,
+    phi BLOB NOT NULL,
+    PRIMARY KEY (key, diam_mm, n)
+);
+'''
+
+# byte order and type of the stored phase shifts (float64, so that stored and recomputed
+# solutions are identical)
+PHI_DTYPE = '<f8'
+
+
+class ResultStore(object):
+    """
+    SQLite file holding the phase shifts computed by PhasingCoilSolver runs, checkpointed per
+    chunk (see PhasingCoilSolver.iter_solutions()).
+
+    Results are filed under a key derived from the parameters that determine the phase
+    shifts (frequency, wire, material, length grid and spacing limit), so runs that only
+    differ in their target phase shift, tolerance or CPU count share them. Every (N,
+    diameter) pair is one row holding the phase shifts along the length axis as a binary
+    array (from the first to the last stored length, NaN in between where nothing is
+    stored), along with the phase shift range it covers: 'scan' runs store the phase shift
+    of every feasible point and cover any window, 'bracket' runs store the accepted points
+    only and cover their own window. The window is applied when reading them back.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def run_key(self, solver):
+        """Key of the results of a solver (registering its parameters)."""
+        params = dict((name, getattr(solver, name)) for name in PHYSICS_PARAMS)
+        params = json.dumps(params, sort_keys=True)
+        key = hashlib.sha1(params.encode('utf-8')).hexdigest()
+
+        with self.connection:
+            self.connection.execute('INSERT OR IGNORE INTO runs VALUES (?, ?)', (key, params))
+        return key
+
+    def covers(self, key, chunk, phi_lo, phi_hi):
+        """Whether the stored results of a chunk cover the phase shift window."""
+        n_start, n_stop, diam_mm = chunk
+        count, = self.connection.execute(
+            'SELECT COUNT(*) FROM coils WHERE key = ? AND diam_mm = ? AND n >= ? AND n < ? '
+            'AND (phi_lo IS NULL OR phi_lo <= ?) AND (phi_hi IS NULL OR phi_hi >= ?)',
+            (key, diam_mm, n_start, n_stop, phi_lo, phi_hi)).fetchone()
+        return count == n_stop - n_start
+
+    def save_chunk(self, key, chunk, rows, cols, phi, phi_lo=None, phi_hi=None):
+        """
+        Replace the stored points of a chunk (in one transaction, so an interrupted run
+        never leaves a partial chunk behind), given as arrays of their N (relative to the
+        start of the chunk) and length indices and phase shifts; phi_lo and phi_hi give the
+        window they cover (None: unbounded).
+        """
+        n_start, n_stop, diam_mm = chunk
+        rows, cols, phi = np.asarray(rows), np.asarray(cols), np.asarray(phi)
+        order = np.lexsort((cols, rows))
+        rows, cols, phi = rows[order], cols[order], phi[order]
+        bounds = np.searchsorted(rows, np.arange(n_stop - n_start + 1))
+
+        records = []
+        for i in range(n_stop - n_start):
+            n_cols = cols[bounds[i]:bounds[i + 1]]
+            line = np.full(n_cols[-1] - n_cols[0] + 1 if len(n_cols) else 0, np.nan,
+                           dtype=PHI_DTYPE)
+            len_start = int(n_cols[0]) if len(n_cols) else 0
+            line[n_cols - len_start] = phi[bounds[i]:bounds[i + 1]]
+            records.append((key, diam_mm, n_start + i, phi_lo, phi_hi, len_start,
+                            sqlite3.Binary(line.tobytes())))
+
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO coils VALUES (?, ?, ?, ?, ?, ?, ?)', records)
+
+    def points(self, key, chunk, phi_lo, phi_hi):
+        """Stored points of a chunk strictly inside the window, as arrays of their N
+        (relative to the start of the chunk) and length indices and phase shifts, ordered by
+        N and length."""
+        n_start, n_stop, diam_mm = chunk
+        records = self.connection.execute(
+            'SELECT n, len_start, phi FROM coils WHERE key = ? AND diam_mm = ? AND n >= ? AND '
+            'n < ? ORDER BY n', (key, diam_mm, n_start, n_stop))
+
+        rows, cols, phis = [], [], []
+        for n, len_start, blob in records:
+            line = np.frombuffer(blob, dtype=PHI_DTYPE)
+            with np.errstate(invalid='ignore'):
+                inside = np.flatnonzero((line > phi_lo) & (line < phi_hi))
+            rows.append(np.full(len(inside), n - n_start, dtype=int))
+            cols.append(len_start + inside)
+            phis.append(line[inside].astype(float))
+
+        if not rows:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0)
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(phis)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+__all__ = ['ResultStore']
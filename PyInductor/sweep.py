@@ -0,0 +1,120 @@
+from __future__ import division
+
+import numpy as np
+
+from collections import namedtuple
+
+from PyInductor.model import Analysis, output_names
+from PyInductor.dispersion import solve_dispersion
+from PyInductor.sinks import open_output
+
+
+SWEEP_OUTPUTS = ('Ls_eff', 'Q_eff', 'res_freq')
+
+# temperature step (degrees) of the temperature coefficient central differences
+TEMPERATURE_STEP = 0.1
+
+FREQUENCY_OUTPUTS = ('Ls_eff', 'Rs_eff', 'Q_eff')
+
+# every this many sweep points one is solved first, to warm start the remaining ones
+WARM_START_STRIDE = 16
+
+TemperatureSweep = namedtuple('TemperatureSweep', ['temperatures', 'values', 'temp_coeff',
+                                                   'ok'])
+
+
+def temperature_sweep(inductor, temperatures, outputs=SWEEP_OUTPUTS, step=TEMPERATURE_STEP):
+    """
+    Outputs of an inductor over an array of temperatures, along with their temperature
+    coefficients in ppm/degree (central differences of +/- step degrees). The sweep points
+    and the neighbours of the differences are analyzed as one batch, which applies the
+    temperature model to all of them at once; everything that doesn't depend on temperature
+    stays a scalar that is broadcast.
+
+    Returns a TemperatureSweep of the temperatures, dicts of value and coefficient arrays
+    per output, and the 'ok' mask of the sweep points.
+    """
+    temperatures = np.asarray(temperatures, dtype=float)
+    outputs = output_names(outputs)
+
+    # the last axis holds the point itself and its two neighbours
+    grid = temperatures[..., None] + np.array([0, -step, step])
+    results = inductor.analyze_batch(outputs=outputs, temperature=grid)
+
+    values, temp_coeff = {}, {}
+    for name in outputs:
+        value, below, above = np.moveaxis(results[name], -1, 0)
+        values[name] = value
+        with np.errstate(all='ignore'):
+            temp_coeff[name] = (above - below) / (2 * step) / value * 1e6
+
+    return TemperatureSweep(temperatures, values, temp_coeff, results['ok'][..., 0])
+
+
+class FrequencySweep(namedtuple('FrequencySweep', ['frequencies', 'values', 'impedance',
+                                                   'ok'])):
+    """
+    Outputs (dict of arrays) and the effective series impedance Rs_eff + j * omega * Ls_eff
+    of an inductor over frequency.
+    """
+    __slots__ = ()
+
+    def s11(self, z0=50):
+        """Reflection coefficient of the inductor as a one-port with reference impedance z0."""
+        return (self.impedance - z0) / (self.impedance + z0)
+
+    def write_touchstone(self, path_or_file, z0=50):
+        """Write the one-port S-parameters as a Touchstone (.s1p) file, in real/imaginary
+        format."""
+        out, owned = open_output(path_or_file)
+        try:
+            out.write('! effective series impedance of a single-layer coil\n')
+            out.write('# HZ S RI R %s\n' % repr(float(z0)))
+            for f, s11 in zip(self.frequencies, self.s11(z0)):
+                out.write('%r %r %r\n' % (float(f), float(s11.real), float(s11.imag)))
+        finally:
+            if owned:
+                out.close()
+
+
+def frequency_sweep(inductor, frequencies, outputs=FREQUENCY_OUTPUTS, warm_start=True):
+    """
+    Outputs and impedance of an inductor over a 1-D array of frequencies. The geometry
+    (effective diameter, pitch angle, Lundin/Rosa/Grover corrections, Ls_equiv, proximity
+    factor) is computed once, and only the frequency dependent terms are evaluated per
+    point. With warm_start set, the dispersion roots of every WARM_START_STRIDE-th point
+    (in order of frequency) are found first and interpolated to start the Newton iteration
+    of the others, which roughly halves the iterations.
+
+    Returns a FrequencySweep (which can export a Touchstone file).
+    """
+    frequencies = np.asarray(frequencies, dtype=float)
+    outputs = output_names(outputs)
+    needed = outputs + tuple(name for name in ('Ls_eff', 'Rs_eff') if name not in outputs)
+
+    params = [np.asarray(getattr(inductor, name), dtype=float)
+              for name in ('N', 'len_coil', 'diam_wire', 'diam_former')]
+    material = [np.asarray(getattr(inductor, name), dtype=float)
+                for name in ('rho', 'mu_r', 'mu_r_core')]
+    analysis = Analysis(*(params + [frequencies] + material))
+
+    if warm_start and frequencies.size > 2 * WARM_START_STRIDE:
+        order = np.argsort(frequencies)
+        coarse = order[::WARM_START_STRIDE]
+        h, _, _ = solve_dispersion(analysis.a, analysis.psi, analysis.k0[coarse],
+                                   full_output=True)
+        ratio = h / analysis.root_bound[coarse]
+        known = np.isfinite(ratio)
+        if known.any():
+            log_f = np.log(frequencies)
+            analysis.root_ratio = np.interp(log_f, log_f[coarse][known], ratio[known])
+
+    results = analysis.results(needed)
+    impedance = results['Rs_eff'] + 2j * np.pi * frequencies * results['Ls_eff']
+
+    return FrequencySweep(frequencies, dict((name, results[name]) for name in outputs),
+                          impedance, results['ok'])
+
+
+__all__ = ['temperature_sweep', 'TemperatureSweep', 'frequency_sweep', 'FrequencySweep',
+           'SWEEP_OUTPUTS', 'FREQUENCY_OUTPUTS']
@@ -0,0 +1,177 @@
+from __future__ import division
+
+import numpy as np
+
+from math import pi
+from PyInductor import Inductor, MATERIALS
+from PyInductor.dispersion import solve_dispersion
+from PyInductor.dispersion_table import DispersionTable
+from PyInductor.executor import Executor
+from PyInductor.materials import analyze_materials
+from PyInductor.phasing_coil_solver import PhasingCoilSolver
+from PyInductor.proximity import proximity_factor
+
+
+# registered benchmarks: (name, setup function, number of items per call)
+CASES = []
+
+
+def case(name, items=1):
+    """
+    Register a benchmark. The decorated function does the setup and returns the function
+    to time (of no arguments); 'items' is the number of designs, points or lookups one call
+    handles, from which the runner derives the throughput.
+    """
+    def register(setup):
+        CASES.append((name, setup, items))
+        return setup
+    return register
+
+
+def _inductor(**params):
+    base = dict(N=6, diam_former=3e-3, diam_wire=1e-3, f=10e6, len_coil=8e-3)
+    base.update(MATERIALS['Cu, annealed'])
+    base.update(params)
+    return Inductor(**base)
+
+
+# coil regimes of the single design benchmarks
+REGIMES = {
+    'short-lowf': dict(N=3, diam_former=20e-3, len_coil=4e-3, f=1e6),
+    'short-highf': dict(N=3, diam_former=20e-3, len_coil=4e-3, f=300e6),
+    'long-lowf': dict(N=60, diam_former=3e-3, diam_wire=0.3e-3, len_coil=40e-3, f=1e6),
+    'long-highf': dict(N=60, diam_former=3e-3, diam_wire=0.3e-3, len_coil=40e-3, f=30e6),
+}
+
+
+def _analyze_case(regime):
+    @case('analyze[%s]' % regime)
+    def setup():
+        return _inductor(**REGIMES[regime]).analyze
+    return setup
+
+
+for _regime in sorted(REGIMES):
+    _analyze_case(_regime)
+
+
+@case('analyze[Ls_eff]')
+def analyze_one_output():
+    ind = _inductor()
+    return lambda: ind.analyze('Ls_eff')
+
+
+@case('tune_parameter')
+def tune_parameter():
+    # the README example, starting from the same length every time
+    ind = _inductor(N=4, diam_former=5e-3, diam_wire=1.2e-3, f=100e6, len_coil=51e-3)
+
+    def tune():
+        ind.len_coil = 51e-3
+        ind.tune_parameter('len_coil', 50e-9, input_range=(1e-3, 1))
+    return tune
+
+
+@case('sensitivity')
+def sensitivity():
+    ind = _inductor()
+    return lambda: ind.sensitivity('diam_wire', 'Ls_eff')
+
+
+@case('proximity[scalar]')
+def proximity_scalar():
+    return lambda: proximity_factor(2.5, 0.7)
+
+
+@case('proximity[array]', items=100000)
+def proximity_array():
+    random_state = np.random.RandomState(0)
+    len_diam = random_state.uniform(0, 12, 100000)
+    diam_spacing = random_state.uniform(0.1, 1, 100000)
+    return lambda: proximity_factor(len_diam, diam_spacing)
+
+
+def _dispersion_inputs(size):
+    random_state = np.random.RandomState(0)
+    a = random_state.uniform(1e-3, 20e-3, size)
+    psi = random_state.uniform(0.005, 0.3, size)
+    k0 = 2 * pi * np.exp(random_state.uniform(np.log(1e6), np.log(1e9), size)) / 299792458.
+    return a, psi, k0
+
+
+@case('dispersion[scalar]')
+def dispersion_scalar():
+    a, psi, k0 = [float(v[0]) for v in _dispersion_inputs(1)]
+    return lambda: solve_dispersion(a, psi, k0)
+
+
+@case('dispersion[array]', items=100000)
+def dispersion_array():
+    a, psi, k0 = _dispersion_inputs(100000)
+    return lambda: solve_dispersion(a, psi, k0)
+
+
+@case('dispersion_table[array]', items=100000)
+def dispersion_table_array():
+    a, psi, k0 = _dispersion_inputs(100000)
+    table = DispersionTable()
+    return lambda: table.solve(a, psi, k0)
+
+
+@case('analyze_batch', items=100000)
+def analyze_batch():
+    ind = _inductor()
+    len_coil = np.linspace(6e-3, 50e-3, 1000)[:, None]
+    n = np.arange(2, 102)
+    return lambda: ind.analyze_batch(N=n, len_coil=len_coil)
+
+
+@case('analyze_materials', items=100000)
+def analyze_materials_case():
+    # 20000 designs in the five materials, with the geometry shared between them
+    len_coil = np.linspace(6e-3, 50e-3, 200)[:, None]
+    n = np.arange(2, 102)
+    return lambda: analyze_materials(sorted(MATERIALS), N=n, len_coil=len_coil,
+                                     diam_wire=1e-3, diam_former=3e-3, f=10e6)
+
+
+# phasing coil solver grids: name -> (N range, diameters, length range)
+GRIDS = {
+    'small': ((95, 99), [32], (260, 310, 1)),
+    'medium': ((60, 110), [25, 32], (150, 350, 0.1)),
+    'large': ((10, 300), [16, 25, 32, 50], (20, 400, 0.5)),
+}
+
+
+def _solver(grid, search='scan', ncpus=1):
+    n_range, diams_mm, len_range_mm = GRIDS[grid]
+    return PhasingCoilSolver(pi, 0.5, 27e6, 0.4, 2.7, n_range, diams_mm, len_range_mm,
+                             'Cu, annealed', ncpus=ncpus, search=search)
+
+
+def _grid_points(grid):
+    solver = _solver(grid)
+    return ((solver.N_range[1] - solver.N_range[0] + 1) * len(solver.diams_mm) *
+            len(range(*solver.len_range_um)))
+
+
+def _solver_case(grid, search, ncpus):
+    @case('solve[%s,%s,ncpus=%d]' % (grid, search, ncpus), items=_grid_points(grid))
+    def setup():
+        solver = _solver(grid, search, ncpus)
+        # the pool is started once: what is timed is the solving
+        executor = Executor('serial' if ncpus == 1 else 'process', ncpus)
+
+        def run():
+            for _ in solver.iter_solutions(executor=executor):
+                pass
+        run.close = executor.close
+        return run
+    return setup
+
+
+for _grid in ('small', 'medium', 'large'):
+    for _ncpus in (1, 2, 4):
+        _solver_case(_grid, 'scan', _ncpus)
+_solver_case('large', 'bracket', 1)
+_solver_case('large', 'bracket', 4)
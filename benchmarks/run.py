@@ -0,0 +1,153 @@
+'''
+Run the benchmarks of cases.py and record the timings as JSON; with --compare, report
+the benchmarks that got slower than in an earlier result file (and exit with status 1).
+
+    % python benchmarks/run.py -o results.json
+    % python benchmarks/run.py -o new.json --compare results.json -k solve
+'''
+from __future__ import division, print_function
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+
+import numpy as np
+import scipy
+
+# run from a checkout without installing the package
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cases import CASES  # noqa: E402
+
+
+def measure(func, min_time=0.2, repeats=5):
+    """
+    Time func like timeit: find a number of calls taking at least min_time, then time that
+    many calls 'repeats' times. Returns the number of calls and the per call times.
+    """
+    func()  # warm up (lazy tables, worker pools)
+
+    number = 1
+    while True:
+        t_start = time.time()
+        for _ in range(number):
+            func()
+        elapsed = time.time() - t_start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    times = [elapsed / number]
+    for _ in range(repeats - 1):
+        t_start = time.time()
+        for _ in range(number):
+            func()
+        times.append((time.time() - t_start) / number)
+
+    return number, times
+
+
+def run(pattern=None, min_time=0.2, repeats=5, out=sys.stdout):
+    """Run the benchmarks whose name matches the regular expression, returning records."""
+    records = []
+    for name, setup, items in CASES:
+        if pattern is not None and not re.search(pattern, name):
+            continue
+
+        func = setup()
+        try:
+            number, times = measure(func, min_time, repeats)
+        finally:
+            if hasattr(func, 'close'):
+                func.close()
+
+        best = min(times)
+        records.append(dict(name=name, items=items, number=number, repeats=repeats,
+                            min=best, median=float(np.median(times)),
+                            mean=float(np.mean(times)), rate=items / best))
+        out.write('%-32s %12.4g s %12.4g items/s\n' % (name, best, items / best))
+        out.flush()
+
+    return records
+
+
+def environment():
+    """Where the benchmarks ran: versions, machine and commit."""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return dict(python=platform.python_version(), numpy=np.__version__,
+                scipy=scipy.__version__, machine=platform.machine(),
+                platform=platform.platform(), cpu_count=multiprocessing.cpu_count(),
+                commit=commit, time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+
+def compare(records, baseline, threshold=0.2, out=sys.stdout):
+    """
+    Compare the best times against a baseline result file; returns the names of the
+    benchmarks that are more than 'threshold' (relative) slower.
+    """
+    previous = dict((record['name'], record) for record in baseline['results'])
+
+    slower = []
+    for record in records:
+        if record['name'] not in previous:
+            continue
+        ratio = record['min'] / previous[record['name']]['min']
+        flag = ''
+        if ratio > 1 + threshold:
+            slower.append(record['name'])
+            flag = '  SLOWER'
+        elif ratio < 1 / (1 + threshold):
+            flag = '  faster'
+        out.write('%-32s %8.3fx%s\n' % (record['name'], ratio, flag))
+
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the PyInductor benchmarks.')
+    parser.add_argument('-k', dest='pattern', help='only run benchmarks matching this regex')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown counted as a regression (default 0.2)')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum time of one repeat, in seconds (default 0.2)')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, _, _ in CASES:
+            print(name)
+        return 0
+
+    records = run(args.pattern, args.min_time, args.repeats)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(environment=environment(), results=records), f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(records, json.load(f), args.threshold)
+        if slower:
+            print('%d benchmark(s) slower than the baseline' % len(slower))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
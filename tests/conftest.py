@@ -0,0 +1,37 @@
+from math import pi
+
+import pytest
+
+from PyInductor import Inductor, MATERIALS
+
+
+# the reference PhasingCoilSolver run (python 2 output checked in test_phasing_coil_solver)
+SOLVER_PARAMS = dict(phase_shift_rad=pi,
+                     phase_shift_tolerance_pct=0.5,
+                     frequency=27e6,
+                     diam_wire_core_mm=0.4,
+                     diam_wire_with_isol_mm=2.7,
+                     N_range=(95, 99),
+                     diams_mm=[32],
+                     len_range_mm=(260, 310, 1),
+                     material='Cu, annealed')
+
+# the reference design: 6 turns of 1 mm annealed copper wire at 10 MHz
+INDUCTOR_PARAMS = dict(N=6, diam_former=3e-3, diam_wire=1e-3, f=10e6, len_coil=8e-3)
+
+
+@pytest.fixture
+def solver_params():
+    """Copy of the reference PhasingCoilSolver parameters, to update per test."""
+    return dict(SOLVER_PARAMS)
+
+
+@pytest.fixture
+def make_inductor():
+    """Factory of the reference Inductor, with any parameter overridden."""
+    def make(**params):
+        base = dict(INDUCTOR_PARAMS)
+        base.update(MATERIALS['Cu, annealed'])
+        base.update(params)
+        return Inductor(**base)
+    return make
@@ -0,0 +1,81 @@
+import sys
+import pytest
+import numpy as np
+
+from PyInductor.adaptive import refine_curve, refine_surface
+
+
+def _step(x):
+    return dict(y=np.tanh((np.asarray(x) - 0.3) / 0.01))
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_refine_curve(self):
+        curve = refine_curve(_step, (0, 1), ['y'], tol=0.01)
+        x = np.linspace(0, 1, 100001)
+        error = abs(np.interp(x, curve.x, curve.values['y']) - _step(x)['y']).max()
+
+        assert curve.ok.all() and (np.diff(curve.x) > 0).all()
+        assert curve.evaluations == len(curve.x) < 200
+        assert error < 0.1
+        # a uniform grid of as many points is much worse near the step
+        uniform = np.linspace(0, 1, curve.evaluations)
+        assert abs(np.interp(x, uniform, _step(uniform)['y']) - _step(x)['y']).max() > 3 * error
+        assert np.count_nonzero(abs(curve.x - 0.3) < 0.05) > len(curve.x) / 2
+
+    def test_failure_boundary(self):
+        def func(x):
+            return dict(y=np.where(x < 0.7, x ** 2, np.nan))
+
+        curve = refine_curve(func, (0, 1), ['y'], min_width=1e-3)
+        last = curve.x[curve.ok].max()
+        assert 0.7 - 1e-3 < last < 0.7 and curve.x[~curve.ok].min() < 0.7 + 1e-3
+
+    def test_adaptive_sweep(self, make_inductor):
+        ind = make_inductor()
+        curve = ind.adaptive_sweep('len_coil', (1e-3, 0.2), ['Ls_eff', 'res_freq'], log=True)
+
+        assert curve.ok.all() and sorted(curve.values) == ['Ls_eff', 'res_freq']
+        for i in (0, len(curve.x) // 2, -1):
+            expected = make_inductor(len_coil=curve.x[i]).analyze(['Ls_eff', 'res_freq'])
+            assert curve.values['res_freq'][i] == pytest.approx(expected['res_freq'], rel=1e-9)
+        assert ind.len_coil == 8e-3
+
+        x = np.geomspace(1e-3, 0.2, 5000)
+        dense = ind.analyze_batch(['Ls_eff'], len_coil=x)['Ls_eff']
+        interpolated = np.interp(np.log(x), np.log(curve.x), curve.values['Ls_eff'])
+        assert abs(interpolated - dense).max() < 0.02 * np.ptp(dense)
+
+    def test_tuned(self, make_inductor):
+        ind = make_inductor(f=100e6, diam_wire=1.2e-3, len_coil=5e-3)
+        curve = ind.adaptive_sweep('N', (5, 10), ['Ls_eff', 'Q_eff'], tol=0.02,
+                                   tune=('len_coil', 200e-9, lambda i: (i.N * i.diam_wire, 1)))
+
+        assert curve.ok.all() and curve.evaluations < 50
+        assert curve.values['Ls_eff'] == pytest.approx(200e-9, rel=0.01)
+        assert (curve.values['len_coil'] > curve.x * 1.2e-3).all()
+        assert (ind.N, ind.len_coil) == (6, 5e-3)
+
+    def test_refine_surface(self, make_inductor):
+        def ridge(x, y):
+            return dict(z=np.tanh((np.hypot(x, y) - 0.5) / 0.02))
+
+        surface = refine_surface(ridge, ((-1, 1), (-1, 1)), ['z'], tol=0.02, initial=9)
+        radius = np.hypot(*surface.points.T)
+
+        assert surface.ok.all() and surface.evaluations == len(surface.points) < 3000
+        assert len(set(map(tuple, surface.points))) == len(surface.points)
+        assert surface.values['z'] == pytest.approx(ridge(*surface.points.T)['z'])
+        # the cells tile the square, finest along the ridge
+        assert np.prod(surface.cells[:, 1::2] - surface.cells[:, ::2], axis=1).sum() == \
+            pytest.approx(4)
+        assert np.count_nonzero(abs(radius - 0.5) < 0.1) > len(radius) / 2
+
+        ind = make_inductor()
+        surface = ind.adaptive_surface(['len_coil', 'N'], ((2e-3, 0.1), (2, 60)),
+                                       log=(True, False), max_points=500)
+        assert surface.evaluations <= 500
+        expected = ind.analyze_batch(['Q_eff'], len_coil=surface.points[:, 0],
+                                     N=surface.points[:, 1])['Q_eff']
+        assert surface.values['Q_eff'] == pytest.approx(expected, rel=1e-12)
@@ -0,0 +1,32 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import run  # noqa: E402
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_cases_run(self):
+        # every benchmark works (timing is the benchmark runner's business)
+        for name, setup, items in run.CASES:
+            if 'large' in name or 'medium' in name:
+                continue
+            func = setup()
+            try:
+                func()
+            finally:
+                if hasattr(func, 'close'):
+                    func.close()
+
+    def test_compare(self, capsys):
+        records = run.run('proximity\\[scalar\\]', min_time=0.001, repeats=2)
+        assert [record['name'] for record in records] == ['proximity[scalar]']
+        assert records[0]['rate'] == pytest.approx(1 / records[0]['min'])
+
+        slow = dict(records[0], min=records[0]['min'] * 2)
+        fast = dict(records[0], min=records[0]['min'] / 2)
+        assert run.compare([slow], dict(results=records)) == ['proximity[scalar]']
+        assert run.compare([fast], dict(results=records)) == []
@@ -0,0 +1,78 @@
+import sys
+import pytest
+
+from PyInductor import AnalysisCache
+from PyInductor.dispersion_table import DispersionTable
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_hits_and_misses(self, make_inductor):
+        ind = make_inductor(cache=AnalysisCache())
+        uncached = make_inductor().analyze()
+
+        assert ind.analyze() == uncached
+        assert ind.analyze('Ls_eff') == {'Ls_eff': uncached['Ls_eff']}
+        assert ind.cache.info() == (1, 1, 0, 1, 128)
+
+        # any change of the effective inputs is a different design
+        ind.set_params(N=7)
+        ind.analyze()
+        ind.diam_wire = 0.9e-3
+        ind.analyze()
+        ind.temperature = 80
+        hot = ind.analyze()
+        assert ind.cache.info().misses == 4
+        assert hot == make_inductor(N=7, diam_wire=0.9e-3, temperature=25).analyze(temperature=80)
+
+        ind.temperature = 25
+        ind.analyze()
+        assert ind.cache.info().hits == 2
+
+    def test_eviction(self, make_inductor):
+        ind = make_inductor(cache=AnalysisCache(maxsize=2))
+        for N in (5, 6, 7, 5):
+            ind.analyze('Ls_equiv', N=N)
+
+        assert ind.cache.info() == (0, 4, 2, 2, 2)
+        ind.analyze('Ls_equiv', N=7)
+        assert ind.cache.hits == 1
+
+        ind.cache.clear()
+        assert ind.cache.info() == (0, 0, 0, 0, 2)
+
+    def test_quantization(self, make_inductor):
+        cache = AnalysisCache(digits=6)
+        ind = make_inductor(cache=cache)
+        first = ind.analyze()
+
+        assert ind.analyze(len_coil=8e-3 * (1 + 1e-9)) == first
+        assert ind.analyze(len_coil=8e-3 * (1 + 1e-4)) != first
+        assert cache.info()[:2] == (1, 2)
+
+    def test_tune_parameter_reuses_point(self, make_inductor):
+        params = dict(N=4, diam_former=5e-3, diam_wire=1.2e-3, f=100e6, len_coil=51e-3)
+        ind = make_inductor(cache=AnalysisCache(), **params)
+        len_coil = ind.tune_parameter('len_coil', 50e-9, input_range=(1e-3, 1))
+
+        assert len_coil == make_inductor(**params).tune_parameter('len_coil', 50e-9,
+                                                                  input_range=(1e-3, 1))
+        # the final check of the tuned design
+        assert ind.cache.hits >= 1
+
+    def test_dispersion_table_in_key(self, make_inductor):
+        ind = make_inductor(cache=AnalysisCache())
+        exact = ind.analyze()
+        iterations = ind.dispersion_info.iterations
+
+        # a table set after a cached analysis gets an analysis of its own
+        ind.dispersion_table = DispersionTable(polish=0)
+        assert ind.analyze() == pytest.approx(exact, rel=1e-8)
+        assert ind.dispersion_info.iterations == 0 != iterations
+        assert ind.cache.info()[:2] == (0, 2)
+
+        # and dropping it again finds the exact analysis
+        ind.dispersion_table = None
+        assert ind.analyze() == exact
+        assert ind.dispersion_info.iterations == iterations
+        assert ind.cache.info()[:2] == (1, 2)
@@ -0,0 +1,68 @@
+import sys
+import pytest
+import numpy as np
+
+from PyInductor import DesignSet
+from PyInductor import catalog as catalog_module
+from PyInductor.catalog import Catalog
+from PyInductor.executor import Executor
+
+
+def _designs():
+    return DesignSet.grid('Cu, annealed', N=np.arange(2, 31),
+                          len_coil=np.geomspace(3e-3, 60e-3, 40),
+                          diam_former=np.array([6, 10, 16]) * 1e-3, diam_wire=1e-3,
+                          f=np.array([30e6, 100e6]))
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_build(self, tmp_path):
+        designs = _designs()
+        with Executor('process', workers=2) as executor:
+            catalog = Catalog.build(str(tmp_path / 'a'), designs, ['Ls_eff'], batch_size=1000,
+                                    executor=executor)
+        catalog = Catalog(str(tmp_path / 'a'))
+
+        assert len(catalog) == len(designs) == 29 * 40 * 3 * 2
+        assert sorted(catalog.outputs) == ['Ls_eff', 'Q_eff', 'res_freq']
+        assert catalog.meta['shared']['diam_wire'] == 1e-3
+        results = designs.analyze(['Ls_eff', 'Q_eff', 'res_freq'])
+        for name in catalog.outputs:
+            assert np.array_equal(catalog.outputs[name], results[name], equal_nan=True)
+        assert isinstance(catalog.outputs['Ls_eff'], np.memmap)
+
+        ind = catalog.inductor(123)
+        assert ind.analyze('Q_eff')['Q_eff'] == pytest.approx(results['Q_eff'][123], rel=1e-12)
+
+    def test_query(self, tmp_path, monkeypatch):
+        catalog = Catalog.build(str(tmp_path), _designs())
+        targets = {'Ls_eff': 200e-9}
+        constraints = {'diam_former': 16e-3, 'f': 100e6, 'Q_eff': (150, None)}
+
+        # the reference: distances to every design meeting the constraints
+        mask = catalog.ok & (catalog.column('Q_eff') >= 150) & \
+            (catalog.column('diam_former') == 16e-3) & (catalog.column('f') == 100e6)
+        with np.errstate(invalid='ignore'):
+            distance = np.abs(np.log10(catalog.column('Ls_eff') / 200e-9))
+        distance[~mask] = np.inf
+        expected = list(np.argsort(distance, kind='mergesort')[:5])
+
+        hits = catalog.query(targets, constraints)
+        assert [hit.index for hit in hits] == expected
+        assert hits[0].distance == pytest.approx(distance[expected[0]], rel=1e-9)
+        assert hits[0].params['diam_former'] == 16e-3 and hits[0].outputs['Q_eff'] >= 150
+
+        # the same through the KD-tree
+        monkeypatch.setattr(catalog_module, 'BRUTE_FORCE_SIZE', 0)
+        assert [hit.index for hit in catalog.query(targets, constraints)] == expected
+        with_f = catalog.query({'Ls_eff': 200e-9, 'f': 100e6}, {'Q_eff': (150, None)}, k=3)
+        assert all(hit.params['f'] == 100e6 for hit in with_f)
+
+        polished = catalog.query(targets, constraints, polish='len_coil')
+        assert all(hit.polished for hit in polished)
+        assert polished[0].outputs['Ls_eff'] == pytest.approx(200e-9, rel=1e-2)
+        assert polished[0].distance <= hits[0].distance
+
+        with pytest.raises(ValueError):
+            catalog.query({'Rs_eff': 1})
@@ -0,0 +1,79 @@
+import io
+import sys
+import pickle
+import pytest
+import numpy as np
+
+from PyInductor import MATERIALS, DesignSet
+from PyInductor.batch import RESULT_NAMES
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_grid(self, make_inductor):
+        n, len_coil = np.arange(3, 9), np.linspace(6e-3, 20e-3, 5)
+        designs = DesignSet.grid('Cu, annealed', N=n, len_coil=len_coil, diam_former=3e-3,
+                                 diam_wire=1e-3, f=10e6, temperature=60)
+        assert len(designs) == 30
+        assert designs.columns['rho'].ndim == 0
+
+        results = designs.analyze()
+        expected = make_inductor(temperature=60).analyze_batch(N=n[:, None], len_coil=len_coil)
+        for name in RESULT_NAMES:
+            assert results[name] == pytest.approx(expected[name].ravel(), rel=1e-12)
+        assert results['ok'].all()
+
+        single = make_inductor(N=4, len_coil=len_coil[2], temperature=60).analyze()
+        assert designs[7].analyze() == pytest.approx(single, rel=1e-12)
+        assert designs[7].diam_wire == make_inductor(temperature=60).diam_wire
+
+    def test_slicing_and_views(self, make_inductor):
+        designs = DesignSet('Cu, annealed', N=np.arange(3, 13), len_coil=8e-3,
+                            diam_former=3e-3, diam_wire=1e-3, f=10e6)
+        part = designs[2:6]
+        assert len(part) == 4
+        assert np.shares_memory(part.columns['N'], designs.columns['N'])
+        assert list(designs[designs.column('N') > 10].column('N')) == [11, 12]
+        assert len(pickle.dumps(part)) < 2000
+        assert len(designs[3:5][np.array([True, False])]) == 1
+
+        part[1].N = 7
+        assert designs.get('N', 3) == 7
+        view = designs[3]
+        view.set_params(len_coil=9e-3)
+        assert list(designs.column('len_coil')[2:5]) == [8e-3, 9e-3, 8e-3]
+        assert view.analyze() == pytest.approx(
+            make_inductor(N=7, len_coil=9e-3).analyze(), rel=1e-12)
+        assert designs.analyze('Ls_eff')['Ls_eff'][3] == pytest.approx(
+            view.analyze('Ls_eff')['Ls_eff'], rel=1e-12)
+
+        with pytest.raises(IndexError):
+            designs[10]
+
+    def test_io(self, make_inductor):
+        inductors = [make_inductor(N=n) for n in (3, 4, 5)]
+        inductors.append(make_inductor(rho=20e-9, temperature=80))
+        designs = DesignSet.from_inductors(inductors)
+        f = io.StringIO()
+        designs.to_csv(f)
+        f.seek(0)
+        copy = DesignSet.from_csv(f)
+        for name, value in designs.columns.items():
+            assert list(copy.column(name)) == list(value)
+
+        f = io.StringIO('N,len_coil,material\n6,8e-3,Cu, annealed\n6,8e-3,Ag\n'.replace(
+            'Cu, annealed', '"Cu, annealed"'))
+        designs = DesignSet.from_csv(f, diam_former=3e-3, diam_wire=1e-3, f=10e6)
+        assert list(designs.column('rho')) == [MATERIALS['Cu, annealed']['rho'],
+                                               MATERIALS['Ag']['rho']]
+        assert designs.analyze()['Ls_eff'][0] == pytest.approx(
+            make_inductor().analyze()['Ls_eff'], rel=1e-12)
+
+        with pytest.raises(TypeError):
+            DesignSet(N=6)
+        with pytest.raises(TypeError):
+            DesignSet('Ag', N=6, len_coil=8e-3, diam_former=3e-3, diam_wire=1e-3, f=10e6,
+                      colour=1)
+        with pytest.raises(ValueError):
+            DesignSet('Ag', N=[6, 7], len_coil=[8e-3] * 3, diam_former=3e-3, diam_wire=1e-3,
+                      f=10e6)
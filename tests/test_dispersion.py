@@ -0,0 +1,128 @@
+import sys
+import pytest
+import numpy as np
+
+from scipy.optimize import brentq
+from PyInductor.dispersion import (helix_dispersion, helix_dispersion_prime, solve_dispersion,
+                                   resonance_bracket, resonance_residual, solve_res_freq)
+from PyInductor.dispersion_table import DispersionTable, build_table, save_table
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_matches_bracketing_solver(self):
+        rs = np.random.RandomState(0)
+        a = 10 ** rs.uniform(-4, 0, 50)
+        psi = 10 ** rs.uniform(-3, 0, 50)
+        k0 = 10 ** rs.uniform(-2, 2, 50)
+
+        roots = solve_dispersion(a, psi, k0)
+        for i in range(50):
+            h_max = k0[i] / np.tan(psi[i])
+            expected = brentq(helix_dispersion, 1e-9 * h_max, h_max,
+                              args=(a[i], psi[i], k0[i]), rtol=1e-15)
+            assert roots[i] == pytest.approx(expected, rel=1e-12)
+
+    def test_derivative(self):
+        h, a, psi, k0 = np.array([0.3, 2.5, 40.0]), 1e-2, 0.05, np.array([0.2, 0.2, 3.0])
+        f, f_prime = helix_dispersion_prime(h, a, psi, k0)
+        dh = 1e-6 * h
+        numeric = (helix_dispersion(h + dh, a, psi, k0) -
+                   helix_dispersion(h - dh, a, psi, k0)) / (2 * dh)
+
+        assert np.allclose(f, helix_dispersion(h, a, psi, k0))
+        assert np.allclose(f_prime, numeric, rtol=1e-6)
+
+    def test_large_arguments(self):
+        # h * a of the order of 1e4, where iv overflows and kn underflows
+        result = solve_dispersion(1.0, 1e-4, 1.0, full_output=True)
+
+        assert result.converged
+        assert result.root * 1.0 > 700
+        assert helix_dispersion(result.root, 1.0, 1e-4, 1.0) == pytest.approx(0, abs=1e-12)
+
+    def test_warm_start_and_failures(self):
+        cold = solve_dispersion(2e-3, 0.03, 0.2, full_output=True)
+        warm = solve_dispersion(2e-3, 0.03, 0.2, h0=cold.root * 1.001, full_output=True)
+
+        assert warm.root == pytest.approx(cold.root, rel=1e-13)
+        assert warm.iterations < cold.iterations
+
+        result = solve_dispersion(2e-3, 0.03, np.array([0.2, -1]), full_output=True)
+        assert result.converged.tolist() == [True, False]
+        assert np.isnan(result.root[1])
+        with pytest.raises(RuntimeError):
+            solve_dispersion(2e-3, 0.03, -1)
+
+    def test_inductor_warm_start(self, make_inductor):
+        ind = make_inductor()
+        first = ind.analyze()
+        cold_iterations = ind.dispersion_info.iterations
+        second = ind.analyze(len_coil=8.01e-3)
+
+        assert ind.dispersion_info.iterations < cold_iterations
+        assert second['Ls_eff'] == pytest.approx(
+            make_inductor(warm_start=False, len_coil=8.01e-3).analyze()['Ls_eff'],
+            rel=1e-12)
+        assert second['Ls_eff'] != first['Ls_eff']
+
+    def test_res_freq(self):
+        rs = np.random.RandomState(1)
+        len_coil = 10 ** rs.uniform(-3, 0, 200)
+        len_wire_eff = len_coil * 10 ** rs.uniform(0.01, 3, 200)
+        a = 10 ** rs.uniform(-4, -1, 200)
+        psi = 10 ** rs.uniform(-3, 0, 200)
+
+        w = solve_res_freq(len_coil, len_wire_eff, a, psi)
+        lo, hi = resonance_bracket(len_wire_eff)
+        f_lo = resonance_residual(lo, len_coil, a, psi)
+        f_hi = resonance_residual(hi, len_coil, a, psi)
+        bracketed = f_lo * f_hi < 0
+        assert 10 < bracketed.sum() < 190
+
+        for i in range(200):
+            expected = solve_res_freq(len_coil[i], len_wire_eff[i], a[i], psi[i])
+            assert w[i] == pytest.approx(expected, rel=1e-11)
+            if bracketed[i]:
+                assert lo[i] < w[i] < hi[i]
+                assert resonance_residual(w[i], len_coil[i], a[i], psi[i]) == pytest.approx(
+                    0, abs=1e-8)
+            else:
+                assert w[i] == (lo[i] if abs(f_lo[i]) < abs(f_hi[i]) else hi[i])
+
+    def test_table(self, tmp_path):
+        path = str(tmp_path / 'table.npy')
+        save_table(path, points=1025)
+        table = DispersionTable.load(path)
+
+        assert isinstance(table.table, np.memmap)
+        assert np.array_equal(table.table, build_table(points=1025))
+        direct, polished = table.validate(samples=20000)
+        assert direct < 1e-7
+        assert polished < 1e-13
+
+        rs = np.random.RandomState(0)
+        a = 10 ** rs.uniform(-4, 0, 50)
+        psi = 10 ** rs.uniform(-3, 0, 50)
+        k0 = 10 ** rs.uniform(-2, 2, 50)
+        result = table.solve(a, psi, k0, full_output=True)
+        assert result.converged.all()
+        assert (result.iterations == 1).all()
+        assert result.root == pytest.approx(solve_dispersion(a, psi, k0), rel=1e-13)
+        assert table.solve(a[0], psi[0], k0[0]) == pytest.approx(result.root[0], rel=1e-15)
+
+        # outside of the table the exact solver takes over
+        assert table.solve(1., np.pi / 4, 1e-9) == pytest.approx(
+            solve_dispersion(1., np.pi / 4, 1e-9), rel=1e-13)
+
+    def test_inductor_table(self, make_inductor):
+        ind = make_inductor()
+        exact = ind.analyze()
+        batch = ind.analyze_batch(N=np.arange(3, 30))
+
+        ind.dispersion_table = DispersionTable(polish=0)
+        assert ind.analyze() == pytest.approx(exact, rel=1e-8)
+        assert ind.dispersion_info.iterations == 0
+        surrogate = ind.analyze_batch(N=np.arange(3, 30))
+        for name in ('prop_factor', 'Ls_eff', 'Q_eff'):
+            assert surrogate[name] == pytest.approx(batch[name], rel=1e-8)
@@ -0,0 +1,70 @@
+import sys
+import pytest
+
+from PyInductor.executor import Executor
+from PyInductor.phasing_coil_solver import PhasingCoilSolver
+
+_offset = None
+
+
+def _set_offset(offset):
+    global _offset
+    _offset = offset
+
+
+def _add_offset(item):
+    return item + _offset
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_backends(self):
+        progress = []
+        for backend in ('serial', 'thread', 'process', 'auto'):
+            with Executor(backend, workers=2) as executor:
+                for offset in (1, 2):
+                    results = executor.imap(_add_offset, range(20), _set_offset, (offset,),
+                                            weights=[2] * 20, progress=progress.append)
+                    assert sorted(results) == list(range(offset, 20 + offset))
+                assert list(executor.imap(_add_offset, range(20), _set_offset, (3,),
+                                          chunksize=3, ordered=True)) == list(range(3, 23))
+
+        last = progress[-1]
+        assert (last.items, last.total_items) == (20, 20)
+        assert last.evaluations == last.total_evaluations == 40
+        assert last.eta == 0
+
+        with pytest.raises(ValueError):
+            Executor('cluster')
+
+    def test_process_initializer(self):
+        _set_offset(None)
+        with Executor('process', workers=2) as executor:
+            assert sorted(executor.imap(_add_offset, range(20), _set_offset, (1,))) == \
+                list(range(1, 21))
+            pool = executor.pool(_set_offset, (1,))
+            assert sorted(executor.imap(_add_offset, range(20), _set_offset, (1,))) == \
+                list(range(1, 21))
+            assert executor.pool(_set_offset, (1,)) is pool
+
+            # other static parameters need new workers
+            assert sorted(executor.imap(_add_offset, range(20), _set_offset, (2,))) == \
+                list(range(2, 22))
+            assert executor.pool(_set_offset, (2,)) is not pool
+
+        # neither the initializer nor a timing probe ran in-process
+        assert _offset is None
+
+    def test_solver_executor(self, solver_params):
+        solver_params.update(N_range=(60, 110), diams_mm=[25, 32], len_range_mm=(150, 350, 0.1))
+        expected = set(PhasingCoilSolver(backend='serial', **solver_params).iter_solutions())
+
+        progress = []
+        with Executor('process', workers=2) as executor:
+            for search in ('scan', 'bracket'):
+                s = PhasingCoilSolver(search=search, **solver_params)
+                solutions = s.iter_solutions(executor=executor, progress=progress.append)
+                assert set(solutions) == expected
+            assert executor.cost
+
+        assert progress[-1].evaluations == 2 * 51 * 2001
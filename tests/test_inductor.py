@@ -1,7 +1,9 @@
 import sys
 import pytest
+import numpy as np
 
 from PyInductor import Inductor, MATERIALS
+from PyInductor.model import Analysis
 
 
 @pytest.mark.skipif(sys.version_info >= (3, 0), reason="requires python2.7")
@@ -42,13 +44,95 @@ class TestPy3:
         results = ind.analyze()
 
         assert round(results['Q_equiv'], 6) == round(101.01042124023245, 6)
-        assert results['prop_factor'] == 0.5173362883660613
+        assert results['prop_factor'] == pytest.approx(0.5173362883660613, rel=1e-12)
         assert round(results['Ls_equiv'], 16) == round(4.18213766576639e-08, 16)
         assert round(results['Q_eff'], 7) == round(82.14705604747247, 7)
         assert round(results['Rs_eff'], 10) == round(0.03933132499704669, 10)
         assert round(results['Rs_equiv'], 10) == round(0.0260142920022588, 10)
         assert round(results['Ls_eff'], 16) == round(5.142220706528976e-08, 16)
         assert round(results['skin_depth'], 13) == round(2.1102261245635593e-05, 13)
-        assert results['char_impedance'] == 1062.8882724816337
-        assert results['res_freq'] == 1088325440.0625987
+        assert results['char_impedance'] == pytest.approx(1062.8882724816337, rel=1e-12)
+        assert results['res_freq'] == pytest.approx(1088325440.0625987, rel=1e-7)
         assert round(results['Cp_equiv'], 16) == round(1.1309733366263994e-09, 16)
+
+    def test_analyze_batch_matches_analyze(self, make_inductor):
+        ind = make_inductor()
+        n_values = np.array([3, 6, 11])
+        len_values = np.array([[4e-3], [8e-3], [40e-3]])
+        batch = ind.analyze_batch(N=n_values, len_coil=len_values, temperature=60)
+
+        assert batch['ok'].shape == (3, 3)
+        assert batch['ok'].all()
+        for i, j in np.ndindex(batch['ok'].shape):
+            results = make_inductor().analyze(N=n_values[j], len_coil=len_values[i, 0],
+                                              temperature=60)
+            for name, value in results.items():
+                assert batch[name][i, j] == pytest.approx(value, rel=1e-7)
+
+    def test_analyze_batch_failure_mask(self, make_inductor):
+        batch = make_inductor().analyze_batch(f=[10e6, -1])
+
+        assert batch['ok'].tolist() == [True, False]
+        assert np.isnan(batch['Ls_eff'][1])
+
+    def test_output_selection(self, make_inductor):
+        ind = make_inductor()
+        full = ind.analyze()
+        results = ind.analyze(outputs=['Ls_eff', 'prop_factor'])
+        batch = ind.analyze_batch(outputs='Q_eff', N=[5, 6])
+
+        assert results == pytest.approx(dict((k, full[k]) for k in ('Ls_eff', 'prop_factor')))
+        assert sorted(batch) == ['Q_eff', 'ok']
+        assert batch['Q_eff'][1] == pytest.approx(full['Q_eff'], rel=1e-12)
+        with pytest.raises(ValueError):
+            ind.analyze(outputs=['L'])
+
+    def test_lazy_analysis(self, make_inductor):
+        ind = make_inductor()
+        full = ind.analyze()
+
+        analysis = Analysis(ind.N, ind.len_coil, ind.diam_wire, ind.diam_former, ind.f,
+                            ind.rho, ind.mu_r)
+        assert analysis.results('Ls_equiv') == {'Ls_equiv': full['Ls_equiv']}
+        # no dispersion root (nor any loss related quantity) for the low frequency inductance
+        assert 'dispersion' not in analysis.computed()
+        assert 'delta_i' not in analysis.computed()
+
+        assert analysis.results('Ls_eff') == {'Ls_eff': full['Ls_eff']}
+        assert 'dispersion' in analysis.computed()
+        assert 'Rs_eff' not in analysis.computed()
+
+        # resistivity isn't needed for the propagation factor
+        analysis = Analysis(ind.N, ind.len_coil, ind.diam_wire, ind.diam_former, ind.f)
+        assert float(analysis.beta) == full['prop_factor']
+
+    def test_jacobian(self, make_inductor):
+        ind = make_inductor()
+
+        jac = ind.jacobian()
+        assert jac.values.shape == (11, 7)
+        assert jac('Ls_eff', 'N') == ind.sensitivity('N')
+        assert jac.as_dict()['Q_eff']['len_coil'] == jac('Q_eff', 'len_coil')
+
+        # skin depth ~ sqrt(rho / f), and the low frequency inductance doesn't depend on f
+        assert jac('skin_depth', 'rho') == pytest.approx(0.5, rel=1e-4)
+        assert jac('skin_depth', 'f') == pytest.approx(-0.5, rel=1e-4)
+        assert jac('Ls_equiv', 'f') == 0
+
+        # (the proximity factor table is only piecewise linear)
+        fine = ind.jacobian(outputs=['Ls_eff', 'Q_eff'], delta=1e-3, order=5)
+        assert fine.values == pytest.approx(jac.values[[3, 5]], rel=1e-2, abs=1e-6)
+        assert ind.jacobian(normalize=False)('Ls_eff', 'N') == pytest.approx(
+            jac('Ls_eff', 'N') / ind.N)
+
+        # closed form derivatives of the losses agree with fine differences
+        inputs, outputs = ['rho', 'f', 'mu_r'], ['skin_depth', 'Rs_eff', 'Q_eff']
+        exact = ind.jacobian(inputs, outputs, normalize=False)
+        numeric = ind.jacobian(inputs, outputs, delta=1e-4, order=5, normalize=False,
+                               analytic=False)
+        assert exact('skin_depth', 'rho') == 0.5 / ind.batch_param('rho')
+        assert exact.values == pytest.approx(numeric.values, rel=1e-4)
+
+        for delta, order in ((0, 3), (-0.01, 3), (0.01, 4)):
+            with pytest.raises(ValueError):
+                ind.jacobian(delta=delta, order=order)
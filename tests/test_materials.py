@@ -0,0 +1,81 @@
+import sys
+import pytest
+import numpy as np
+
+from PyInductor import DesignSet
+from PyInductor.materials import analyze_materials, awg_diameter, material_analysis
+from PyInductor.phasing_coil_solver import PhasingCoilSolver
+from PyInductor.shards import MemoryQueue, merge, submit, work
+from PyInductor.sinks import CSVSink, NumpySink
+from PyInductor.store import ResultStore
+
+MATERIAL_NAMES = ['Cu, annealed', 'Ag', 'Al']
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_awg_diameter(self):
+        assert awg_diameter(36) == pytest.approx(0.127e-3)
+        assert awg_diameter([0, 10, 20]) == pytest.approx([8.251e-3, 2.588e-3, 0.812e-3],
+                                                          rel=1e-3)
+
+    def test_material_analysis(self):
+        params = dict(N=np.arange(2, 40), len_coil=20e-3, diam_wire=1e-3, diam_former=10e-3,
+                      f=30e6)
+        analysis = material_analysis(MATERIAL_NAMES, **params)
+        results = analysis.results()
+
+        # only the losses are computed per material
+        assert analysis.shape == (38, 3)
+        assert analysis.h.shape == analysis.Z_0.shape == analysis.Leffs.shape == (38, 1)
+        assert analysis.Rs_eff.shape == analysis.Qeff.shape == (38, 3)
+        for i, name in enumerate(MATERIAL_NAMES):
+            expected = DesignSet(name, **params).analyze()
+            for output, value in expected.items():
+                assert np.array_equal(results[output][:, i], value, equal_nan=True)
+
+        # thermal expansion makes the geometry depend on the material
+        hot = analyze_materials(MATERIAL_NAMES, ['Ls_eff', 'Q_eff'], temperature=85,
+                                reference_temperature=25, **params)
+        expected = DesignSet('Al', temperature=85, reference_temperature=25,
+                             **params).analyze(['Ls_eff', 'Q_eff'])
+        assert hot['Ls_eff'].shape == (38, 3)
+        assert hot['Ls_eff'][:, 2] == pytest.approx(expected['Ls_eff'], rel=1e-12)
+        assert hot['Ls_eff'][0, 0] != hot['Ls_eff'][0, 2]
+
+        with pytest.raises(TypeError):
+            analyze_materials(MATERIAL_NAMES, rho=1e-8, **params)
+
+    def test_solver_catalog(self, tmp_path, solver_params):
+        wires = dict(diam_wire_core_mm=[0.4, 0.5], diam_wire_with_isol_mm=[2.7, 2.5])
+        params = dict(solver_params, N_range=(90, 99), material=MATERIAL_NAMES, **wires)
+        solver = PhasingCoilSolver(**params)
+        solutions = list(solver.iter_solutions(full_results=True))
+
+        expected = []
+        for core, with_isol in zip(wires['diam_wire_core_mm'], wires['diam_wire_with_isol_mm']):
+            for name in MATERIAL_NAMES:
+                single = PhasingCoilSolver(**dict(params, material=name, diam_wire_core_mm=core,
+                                                  diam_wire_with_isol_mm=with_isol))
+                expected.extend(s._replace(wire=(core, with_isol), material=name)
+                                for s in single.iter_solutions(full_results=True))
+
+        assert len(set((s.wire, s.material) for s in solutions)) == 6
+        assert sorted(map(repr, solutions)) == sorted(map(repr, expected))
+
+        # the store and the shards handle every wire on its own
+        with ResultStore(str(tmp_path / 'store.db')) as store:
+            assert set(solver.iter_solutions(store=store)) == set(solver.iter_solutions())
+            assert set(solver.iter_solutions(store=store)) == set(solver.iter_solutions())
+        queue = MemoryQueue()
+        submit(solver, queue)
+        work(queue)
+        assert set(merge(solver, queue)) == set(solver.iter_solutions())
+
+        csv_path, npy_path = tmp_path / 'out.csv', tmp_path / 'out.npy'
+        solver.run([CSVSink(str(csv_path)), NumpySink(str(npy_path))])
+        header = csv_path.read_text().splitlines()[0].split(',')
+        assert header[5:] == ['diam_wire_core_mm', 'diam_wire_with_isol_mm', 'material']
+        array = np.load(str(npy_path))
+        assert sorted(set(array['material'])) == sorted(MATERIAL_NAMES)
+        assert set(array['diam_wire_core_mm']) == {0.4, 0.5}
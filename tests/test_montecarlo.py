@@ -0,0 +1,86 @@
+import sys
+import pytest
+import numpy as np
+
+from PyInductor.executor import Executor
+from PyInductor.montecarlo import Normal, Uniform, RunningStats, Reservoir, wilson_interval
+
+
+TOLERANCES = {'diam_wire': Normal(0.01), 'len_coil': Uniform(0.02),
+              'temperature': Uniform(20, relative=False)}
+SPECS = {'Ls_eff': (50e-9, 53e-9), 'Q_eff': (80, None)}
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_yield(self, make_inductor):
+        ind = make_inductor()
+        result = ind.monte_carlo(TOLERANCES, SPECS, max_samples=20000, batch_size=5000)
+
+        assert result.samples == 20000
+        assert result.failed == 0
+        assert result.yield_ == result.passed / result.samples
+        assert result.yield_interval[0] < result.yield_ < result.yield_interval[1]
+        assert sorted(result.mean) == ['Ls_eff', 'Q_eff']
+        nominal = ind.analyze()
+        assert result.percentiles['Ls_eff'][50] == pytest.approx(nominal['Ls_eff'], rel=1e-2)
+        assert result.minimum['Q_eff'] < result.mean['Q_eff'] < result.maximum['Q_eff']
+
+        # reproducible, also when evaluated by worker processes
+        again = ind.monte_carlo(TOLERANCES, SPECS, max_samples=20000, batch_size=5000,
+                                processes=2)
+        assert again[:-1] == result[:-1]
+        with Executor('process', workers=2) as executor:
+            for _ in range(2):
+                again = ind.monte_carlo(TOLERANCES, SPECS, max_samples=20000, batch_size=5000,
+                                        executor=executor)
+                assert again[:-1] == result[:-1]
+        other = ind.monte_carlo(TOLERANCES, SPECS, max_samples=20000, batch_size=5000, seed=1)
+        assert other.passed != result.passed
+
+    def test_early_stopping(self, make_inductor):
+        result = make_inductor().monte_carlo(TOLERANCES, SPECS, max_samples=10**6,
+                                             batch_size=2000, ci_width=0.05)
+
+        assert result.stopped_early
+        assert result.samples < 10**6
+        assert result.yield_interval[1] - result.yield_interval[0] <= 0.05
+        with Executor('process', workers=2) as executor:
+            again = make_inductor().monte_carlo(TOLERANCES, SPECS, max_samples=10**6,
+                                                batch_size=2000, ci_width=0.05,
+                                                executor=executor)
+        assert again[:-1] == result[:-1]
+
+    def test_whole_turns(self, make_inductor):
+        ind = make_inductor()
+        result = ind.monte_carlo({'N': Uniform(1, relative=False)}, outputs=['Ls_equiv'],
+                                 max_samples=2000, batch_size=500)
+
+        expected = [ind.analyze('Ls_equiv', N=N)['Ls_equiv'] for N in (5, 7)]
+        assert [result.minimum['Ls_equiv'], result.maximum['Ls_equiv']] == pytest.approx(
+            expected, rel=1e-12)
+        assert result.percentiles['Ls_equiv'][50] == pytest.approx(
+            ind.analyze('Ls_equiv', N=6)['Ls_equiv'], rel=1e-12)
+
+    def test_streaming_statistics(self):
+        values = np.random.RandomState(0).normal(3, 2, 10000)
+        values[::7] = np.nan
+        stats = RunningStats()
+        reservoir = Reservoir(500, seed=0)
+        for chunk in np.array_split(values, 13):
+            stats.update(chunk)
+            reservoir.update(chunk)
+
+        finite = values[~np.isnan(values)]
+        assert stats.count == finite.size
+        assert stats.mean == pytest.approx(finite.mean())
+        assert stats.std == pytest.approx(finite.std(ddof=1))
+        assert reservoir.seen == finite.size
+        assert np.isin(reservoir.values, finite).all()
+        assert reservoir.percentiles([50])[50] == pytest.approx(3, abs=0.3)
+
+    def test_wilson_interval(self):
+        assert wilson_interval(0, 0) == (0, 1)
+        lower, upper = wilson_interval(81, 263)
+        assert lower == pytest.approx(0.2553, abs=1e-4)
+        assert upper == pytest.approx(0.3662, abs=1e-4)
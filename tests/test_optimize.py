@@ -0,0 +1,35 @@
+import sys
+import pytest
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_target_and_constraint(self, make_inductor):
+        ind = make_inductor()
+        result = ind.optimize({'len_coil': (5e-3, 3e-2), 'N': (3, 20), 'diam_wire': (3e-4, 1.5e-3)},
+                              targets={'Ls_eff': 100e-9}, maximize=['Q_eff'],
+                              constraints={'res_freq': (50e6, None)}, weights={'Q_eff': 1e-3},
+                              seed=1)
+
+        assert result.feasible
+        assert result.params['N'] == int(result.params['N'])
+        assert result.outputs['Ls_eff'] == pytest.approx(100e-9, rel=1e-2)
+        assert result.outputs['res_freq'] >= 50e6
+        assert result.nfev > result.nbatches > 0
+        assert result.wall_time > 0
+
+        # the best design was applied
+        assert ind.N == result.params['N']
+        assert ind.analyze('Ls_eff')['Ls_eff'] == pytest.approx(result.outputs['Ls_eff'])
+
+    def test_infeasible(self, make_inductor):
+        ind = make_inductor()
+        result = ind.optimize({'N': (3, 10)}, minimize=['Rs_eff'],
+                              constraints={'Ls_equiv': (1e-3, None)}, seed=1, maxiter=20)
+
+        assert not result.feasible
+        assert ind.N == 6
+
+    def test_nothing_to_optimize(self, make_inductor):
+        with pytest.raises(ValueError):
+            make_inductor().optimize({'N': (3, 10)})
@@ -0,0 +1,113 @@
+import sys
+import pytest
+import numpy as np
+
+from PyInductor import DesignSet
+from PyInductor import pareto as pareto_module
+from PyInductor.executor import Executor
+from PyInductor.inductor import effective_inputs
+from PyInductor.model import Analysis
+from PyInductor.pareto import ParetoFront, ParetoSink, non_dominated, pareto_sweep
+from PyInductor.phasing_coil_solver import PhasingCoilSolver
+
+
+def _brute_force(values):
+    # rows no other row dominates, first of identical rows
+    keep = []
+    for i, row in enumerate(values):
+        if not any((other <= row).all() and ((other < row).any() or j < i)
+                   for j, other in enumerate(values) if j != i):
+            keep.append(i)
+    return keep
+
+
+def _designs():
+    return DesignSet.grid('Cu, annealed', N=np.arange(2, 31),
+                          len_coil=np.geomspace(3e-3, 60e-3, 30),
+                          diam_former=np.array([6, 10, 16]) * 1e-3, diam_wire=1e-3, f=30e6)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    @pytest.mark.parametrize('k', [1, 2, 3, 4])
+    def test_non_dominated(self, k, monkeypatch):
+        monkeypatch.setattr(pareto_module, 'BLOCK_SIZE', 16)
+        rng = np.random.default_rng(k)
+        values = rng.integers(0, 8, size=(300, k)).astype(float)
+        assert list(non_dominated(values)) == _brute_force(values)
+
+    def test_streaming(self):
+        rng = np.random.default_rng(0)
+        columns = dict(a=rng.normal(size=2000), b=rng.normal(size=2000),
+                       c=rng.normal(size=2000))
+        columns['a'][::50] = np.nan
+        objectives = dict(a='max', b='min')
+        constraints = dict(c=(-1, None))
+
+        whole = ParetoFront(objectives, constraints)
+        whole.update(columns)
+        streamed = ParetoFront(objectives, constraints)
+        for start in range(0, 2000, 77):
+            streamed.update(dict((name, value[start:start + 77])
+                                 for name, value in columns.items()))
+
+        assert streamed.seen == whole.seen == 2000
+        for name in columns:
+            assert np.array_equal(streamed.front()[name], whole.front()[name])
+
+        front = whole.front()
+        assert (front['c'] >= -1).all() and np.isfinite(front['a']).all()
+        assert (np.diff(front['a']) <= 0).all() and (np.diff(front['b']) <= 0).all()
+        mask = (columns['c'] >= -1) & np.isfinite(columns['a'])
+        values = np.column_stack([-columns['a'][mask], columns['b'][mask]])
+        assert len(front['a']) == len(_brute_force(values))
+
+    def test_items_alignment(self):
+        front = ParetoFront(dict(a='min', b='min'))
+        front.update({'a': [1, 2], 'b': [2, 1]})
+        assert front.front_items() == [None, None]
+        front.update({'a': [.5], 'b': [3.]}, items=['x'])
+        front.update({'a': [3.], 'b': [.5]})
+        assert list(front.front()['a']) == [.5, 1, 2, 3]
+        assert front.front_items() == ['x', None, None, None]
+        front.update({'a': [.4, 9], 'b': [2.5, 9]}, items=['y', 'z'])
+        assert list(front.front()['a']) == [.4, 1, 2, 3]
+        assert front.front_items() == ['y', None, None, None]
+
+    def test_sweep(self):
+        designs = _designs()
+        objectives = dict(Q_eff='max', len_coil='min', diam_former='min')
+        constraints = dict(Ls_eff=(100e-9, 300e-9))
+        with Executor('process', workers=2) as executor:
+            front = pareto_sweep(designs, objectives, constraints, columns=['N', 'len_wire'],
+                                 batch_size=500, executor=executor).front()
+
+        results = designs.analyze(['Ls_eff', 'Q_eff'])
+        rows = front['design']
+        assert np.array_equal(front['Q_eff'], results['Q_eff'][rows])
+        assert np.array_equal(front['N'], designs.column('N')[rows])
+        assert ((front['Ls_eff'] >= 100e-9) & (front['Ls_eff'] <= 300e-9)).all()
+
+        len_wire = Analysis(*effective_inputs(designs.column)).len_wire_eff
+        assert np.array_equal(front['len_wire'], len_wire[rows])
+
+        mask = (results['Ls_eff'] >= 100e-9) & (results['Ls_eff'] <= 300e-9)
+        expected = np.flatnonzero(mask)[_brute_force(np.column_stack([
+            designs.column('diam_former')[mask], designs.column('len_coil')[mask],
+            -results['Q_eff'][mask]]))]
+        assert len(rows) > 10 and sorted(rows) == sorted(expected)
+
+        with pytest.raises(ValueError):
+            pareto_sweep(designs, dict(volume='min'))
+
+    def test_sink(self, solver_params):
+        solutions = list(PhasingCoilSolver(**solver_params).iter_solutions())
+        sink = ParetoSink(dict(length_mm='min', phi='max'), buffer_size=7)
+        PhasingCoilSolver(**solver_params).run([sink])
+        front = sink.results()
+
+        assert front and len(front) <= len(solutions)
+        assert [s.length_mm for s in front] == sorted(s.length_mm for s in front)
+        for s in front:
+            assert not any(o.length_mm <= s.length_mm and o.phi >= s.phi and
+                           (o.length_mm < s.length_mm or o.phi > s.phi) for o in solutions)
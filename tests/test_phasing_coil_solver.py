@@ -1,24 +1,32 @@
 import sys
 import pytest
 
+import csv
+import json
+import numpy as np
+
 from math import pi
+from PyInductor.batch import RESULT_NAMES
+from PyInductor import phasing_coil_solver
 from PyInductor.phasing_coil_solver import PhasingCoilSolver
+from PyInductor.sinks import CSVSink, JSONLinesSink, NumpySink, TopKSink
+from PyInductor.store import ResultStore
+
 
-test_solver1 = dict(phase_shift_rad=pi,
-                    phase_shift_tolerance_pct=0.5,
-                    frequency=27e6,
-                    diam_wire_core_mm=0.4,
-                    diam_wire_with_isol_mm=2.7,
-                    N_range=(95, 99),
-                    diams_mm=[32],
-                    len_range_mm=(260, 310, 1),
-                    material='Cu, annealed')
+def _parse(out):
+    """Map (N, diameter_mm, length_mm) to (phi, turn_spacing_mm) for the printed solutions."""
+    solutions = {}
+    for line in out.splitlines():
+        if line.startswith('N='):
+            values = [float(item.split('=')[1]) for item in line.split(', ')]
+            solutions[tuple(values[:3])] = tuple(values[3:])
+    return solutions
 
 
 @pytest.mark.skipif(sys.version_info >= (3, 0), reason="requires python2.7")
 class TestPy2:
-    def test_phasing_coil_solver(self, capsys):
-        s = PhasingCoilSolver(**test_solver1)
+    def test_phasing_coil_solver(self, capsys, solver_params):
+        s = PhasingCoilSolver(**solver_params)
         s.solve()
 
         captured = capsys.readouterr()
@@ -34,25 +42,113 @@ class TestPy2:
 
 @pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
 class TestPy3:
-    def test_phasing_coil_solver(self, capsys):
-        s = PhasingCoilSolver(**test_solver1)
+    def test_phasing_coil_solver(self, capsys, solver_params):
+        s = PhasingCoilSolver(**solver_params)
         s.solve()
 
-        captured = capsys.readouterr()
-        assert ("N=95, diameter_mm=32, length_mm=260.0, phi=3.1261051348185567, "
-                "turn_spacing_mm=0.03684210526315789") in captured.out
-        assert ("N=99, diameter_mm=32, length_mm=310.0, phi=3.1322663901436427, "
-                "turn_spacing_mm=0.4313131313131312") in captured.out
+        solutions = _parse(capsys.readouterr().out)
+        assert solutions[95, 32, 260.0] == pytest.approx(
+            (3.1261051348185567, 0.03684210526315789), rel=1e-12)
+        assert solutions[99, 32, 310.0] == pytest.approx(
+            (3.1322663901436427, 0.4313131313131312), rel=1e-12)
 
-    def test_phasing_coil_solver_with_max_turn_spacing_limit(self, capsys):
-        test_solver2 = test_solver1.copy()
-        test_solver2['max_turn_spacing_mm'] = 0.2
+    def test_phasing_coil_solver_with_max_turn_spacing_limit(self, capsys, solver_params):
+        solver_params['max_turn_spacing_mm'] = 0.2
 
-        s = PhasingCoilSolver(**test_solver2)
+        s = PhasingCoilSolver(**solver_params)
         s.solve()
 
-        captured = capsys.readouterr()
-        assert ("N=95, diameter_mm=32, length_mm=260.0, phi=3.1261051348185567, "
-                "turn_spacing_mm=0.03684210526315789") in captured.out
-        assert ("N=99, diameter_mm=32, length_mm=310.0, phi=3.1322663901436427, "
-                "turn_spacing_mm=0.4313131313131312") not in captured.out
+        solutions = _parse(capsys.readouterr().out)
+        assert solutions[95, 32, 260.0] == pytest.approx(
+            (3.1261051348185567, 0.03684210526315789), rel=1e-12)
+        assert (99, 32, 310.0) not in solutions
+
+    def test_chunks_cover_grid(self, solver_params):
+        solver_params.update(N_range=(10, 99), diams_mm=[16, 32], ncpus=3)
+
+        s = PhasingCoilSolver(**solver_params)
+        covered = [(n, diam_mm) for n_start, n_stop, diam_mm in s.chunks()
+                   for n in range(n_start, n_stop)]
+
+        assert sorted(covered) == sorted((n, d) for n in range(10, 100) for d in [16, 32])
+
+    def test_bracket_search_matches_scan(self, solver_params):
+        solver_params.update(N_range=(60, 110), diams_mm=[25, 32],
+                             len_range_mm=(150, 350, 0.1), ncpus=1)
+
+        scan = set(PhasingCoilSolver(**solver_params).iter_solutions())
+        bracket = set(PhasingCoilSolver(search='bracket', **solver_params).iter_solutions())
+
+        assert len(scan) > 100
+        assert bracket == scan
+
+    def test_solution_records(self, solver_params):
+        s = PhasingCoilSolver(ncpus=1, **solver_params)
+        solutions = sorted(s.iter_solutions(full_results=True))
+
+        first = solutions[0]
+        assert (first.N, first.diameter_mm, first.length_mm) == (95, 32, 260.0)
+        assert first.phi == pytest.approx(3.1261051348185567, rel=1e-12)
+        assert first.turn_spacing_mm == pytest.approx(0.03684210526315789, rel=1e-12)
+        assert first.analysis['prop_factor'] * 260e-3 == pytest.approx(first.phi, rel=1e-12)
+        assert set(first.analysis) == set(RESULT_NAMES)
+
+        assert all(solution.analysis is None for solution in s.iter_solutions())
+
+    def test_sinks(self, tmp_path, solver_params):
+        top = TopKSink(3)
+        s = PhasingCoilSolver(ncpus=1, **solver_params)
+        count = s.run([CSVSink(str(tmp_path / 'out.csv')),
+                       JSONLinesSink(str(tmp_path / 'out.jsonl')),
+                       NumpySink(str(tmp_path / 'out.npy'), buffer_size=4), top],
+                      full_results=True)
+        solutions = sorted(s.iter_solutions())
+
+        with open(str(tmp_path / 'out.csv')) as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == count == len(solutions)
+        assert 'Q_eff' in rows[0]
+
+        with open(str(tmp_path / 'out.jsonl')) as f:
+            records = [json.loads(line) for line in f]
+        assert sorted((r['N'], r['length_mm'], r['phi']) for r in records) == [
+            (x.N, x.length_mm, x.phi) for x in solutions]
+
+        array = np.load(str(tmp_path / 'out.npy'))
+        assert len(array) == count
+        assert sorted(array['phi']) == sorted(x.phi for x in solutions)
+
+        errors = sorted(abs(x.phi - pi) for x in solutions)
+        assert [abs(x.phi - pi) for x in top.results()] == errors[:3]
+
+    def test_result_store(self, tmp_path, monkeypatch, solver_params):
+        solver_params.update(N_range=(60, 110), diams_mm=[25, 32],
+                             len_range_mm=(150, 350, 0.1), ncpus=1)
+        expected = set(PhasingCoilSolver(**solver_params).iter_solutions())
+
+        for search in ('scan', 'bracket'):
+            s = PhasingCoilSolver(search=search, **solver_params)
+            with ResultStore(str(tmp_path / (search + '.db'))) as store:
+                # interrupt the run after the first chunk, then resume it
+                solutions = s.iter_solutions(store=store)
+                next(solutions)
+                solutions.close()
+                key = store.run_key(s)
+                assert store.covers(key, s.chunks()[0], *s.phase_window())
+                assert not store.covers(key, s.chunks()[-1], *s.phase_window())
+
+                assert set(s.iter_solutions(store=store)) == expected
+
+                # everything is stored now, one row per coil
+                assert store.connection.execute(
+                    'SELECT COUNT(*) FROM coils').fetchone() == (2 * 51,)
+                monkeypatch.setattr(phasing_coil_solver, '_solve_chunk', None)
+                assert set(s.iter_solutions(store=store)) == expected
+                monkeypatch.undo()
+
+        # a scan run answers any other window from the store
+        solver_params.update(phase_shift_rad=3.0, phase_shift_tolerance_pct=1)
+        expected = set(PhasingCoilSolver(**solver_params).iter_solutions())
+        monkeypatch.setattr(phasing_coil_solver, '_solve_chunk', None)
+        with ResultStore(str(tmp_path / 'scan.db')) as store:
+            assert set(PhasingCoilSolver(**solver_params).iter_solutions(store=store)) == expected
@@ -0,0 +1,67 @@
+import sys
+import pickle
+import pytest
+import numpy as np
+
+from PyInductor.executor import Executor
+from PyInductor.phasing_coil_solver import PhasingCoilSolver
+from PyInductor.profiling import Profile, active
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_inductor_profile(self, make_inductor):
+        ind = make_inductor(profile=Profile())
+        expected = make_inductor().analyze()
+        assert ind.analyze() == expected
+        ind.analyze('Ls_equiv')
+        assert active() is None
+
+        stages = ind.profile.stages
+        assert stages['analyze'][0] == 2
+        assert stages['dispersion'][0] == stages['res_freq'][0] == 1
+        assert stages['phi'][0] == 2
+        # exclusive times add up to the time of the analyses
+        assert ind.profile.total_time == pytest.approx(stages['analyze'][2], rel=1e-6)
+        assert ind.profile.dispersion_solves == 1
+        assert 'dispersion' in ind.profile.report()
+
+    def test_failures_and_merge(self, make_inductor):
+        profile = Profile()
+        with profile:
+            results = make_inductor().analyze_batch(f=np.array([10e6, 0, -1]))
+        assert active() is None
+        assert list(results['ok']) == [True, False, False]
+        assert profile.failures == {'dispersion': 2}
+        assert profile.stages['dispersion'][3] == 3
+
+        with profile:
+            with pytest.raises(RuntimeError):
+                make_inductor(f=-1).analyze()
+        assert profile.failures == {'dispersion': 3}
+
+        copy = pickle.loads(pickle.dumps(profile))
+        merged = Profile().merge(profile).merge(copy)
+        assert merged.stages['analyze_batch'][0] == 2
+        assert merged.failures == {'dispersion': 6}
+        assert merged.dispersion_solves == 2 * profile.dispersion_solves
+        assert merged.as_dict()['stages']['analyze']['calls'] == 2
+
+    def test_solver_profile(self, solver_params):
+        solver_params.update(N_range=(60, 110), diams_mm=[25, 32], len_range_mm=(150, 350, 0.1))
+        s = PhasingCoilSolver(search='bracket', **solver_params)
+
+        serial, parallel, threads = Profile(), Profile(), Profile()
+        expected = set(s.iter_solutions(executor=Executor('serial'), profile=serial))
+        with Executor('process', workers=2) as executor:
+            assert set(s.iter_solutions(executor=executor, profile=parallel)) == expected
+        with Executor('thread', workers=4) as executor:
+            assert set(s.iter_solutions(executor=executor, profile=threads)) == expected
+        assert active() is None
+
+        for profile in (serial, parallel, threads):
+            assert profile.stages['chunk'][3] == 2 * 51 * 2001
+            assert not profile.failures
+        for profile in (parallel, threads):
+            assert profile.dispersion_solves == serial.dispersion_solves > 0
+            assert profile.dispersion_iterations == serial.dispersion_iterations
@@ -0,0 +1,57 @@
+import sys
+import pickle
+import pytest
+import numpy as np
+
+from PyInductor import data
+from PyInductor.data import MEDHURST_L_D, MEDHURST_D_S, MEDHURST_MATRIX
+from PyInductor.proximity import MedhurstProximity, proximity_factor
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    @pytest.mark.parametrize('kind', ['linear', 'cubic'])
+    def test_grid_values(self, kind):
+        lookup = MedhurstProximity(kind)
+        x, y = np.meshgrid(MEDHURST_L_D, MEDHURST_D_S)
+
+        assert np.allclose(lookup(x, y), MEDHURST_MATRIX, rtol=0, atol=1e-14)
+        assert lookup(MEDHURST_L_D[3], MEDHURST_D_S[5]) == pytest.approx(
+            MEDHURST_MATRIX[5, 3], abs=1e-14)
+
+    def test_bilinear_between_grid_points(self):
+        x = (MEDHURST_L_D[:-1] + MEDHURST_L_D[1:]) / 2
+        y = (MEDHURST_D_S[:-1] + MEDHURST_D_S[1:]) / 2
+        corners_mean = (MEDHURST_MATRIX[:-1, :-1] + MEDHURST_MATRIX[1:, :-1] +
+                        MEDHURST_MATRIX[:-1, 1:] + MEDHURST_MATRIX[1:, 1:]) / 4
+
+        assert np.allclose(proximity_factor(x[None, :], y[:, None]), corners_mean)
+        assert proximity_factor(0.3, 0.05) == pytest.approx((1.00 + 1.02 + 1.00 + 1.03) / 4)
+
+    def test_scalar_and_array_paths_agree(self):
+        rs = np.random.RandomState(0)
+        x, y = rs.uniform(-2, 25, 200), rs.uniform(-0.1, 1.2, 200)
+
+        for lookup in (proximity_factor, MedhurstProximity('cubic', 'extend')):
+            values = lookup(x, y)
+            assert values.shape == (200,)
+            assert np.allclose(values, [lookup(a, b) for a, b in zip(x, y)], rtol=1e-15)
+
+    def test_extrapolation(self):
+        assert proximity_factor(100, 2) == MEDHURST_MATRIX[-1, -1]
+        assert proximity_factor(-1, 0.05) == pytest.approx((1.00 + 1.02) / 2)
+
+        assert np.isnan(MedhurstProximity(extrapolation='nan')(25, 0.5))
+        assert MedhurstProximity(extrapolation='extend')(0.5, 1.1) > MEDHURST_MATRIX[-1, 2]
+        with pytest.raises(ValueError):
+            MedhurstProximity(extrapolation='raise')(np.array([1, 25]), 0.5)
+
+    def test_compatibility(self):
+        # the former location of the lookup still works
+        assert data.proximity_factor(2.5, 0.7) == proximity_factor(2.5, 0.7)
+        assert np.array_equal(data.proximity_factor(MEDHURST_L_D, 0.5),
+                              proximity_factor(MEDHURST_L_D, 0.5))
+
+        copy = pickle.loads(pickle.dumps(MedhurstProximity('cubic', 'nan')))
+        assert copy(2.5, 0.7) == MedhurstProximity('cubic')(2.5, 0.7)
+        assert np.isnan(copy(25., 0.5))
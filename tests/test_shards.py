@@ -0,0 +1,148 @@
+import os
+import sys
+import threading
+import time
+import pytest
+
+from PyInductor import shards as shards_module
+from PyInductor.phasing_coil_solver import PhasingCoilSolver
+from PyInductor.shards import (FileQueue, MemoryQueue, QueueServer, TCPQueue, main, make_shards,
+                               merge, solve_shard, submit, work)
+
+
+@pytest.fixture
+def make_solver(solver_params):
+    # the reference run on a larger grid, with any parameter overridden
+    solver_params.update(N_range=(60, 110), diams_mm=[25, 32], len_range_mm=(150, 350, 0.5))
+
+    def make(**params):
+        return PhasingCoilSolver(**dict(solver_params, **params))
+    return make
+
+
+def _run_workers(queue, count=3):
+    threads = [threading.Thread(target=work, args=(queue, 'worker%d' % i)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_make_shards(self, make_solver):
+        shards = make_shards(make_solver(ncpus=1), points=5000)
+        again = make_shards(make_solver(ncpus=7, backend='serial'), points=5000)
+
+        assert [shard['id'] for shard in shards] == [shard['id'] for shard in again]
+        assert len(set(shard['id'] for shard in shards)) == len(shards) > 2
+        covered = [(n, chunk[2]) for chunk in (shard['chunk'] for shard in shards)
+                   for n in range(chunk[0], chunk[1])]
+        assert sorted(covered) == sorted((n, d) for n in range(60, 111) for d in (25, 32))
+        assert make_shards(make_solver(phase_shift_rad=3.0))[0]['id'] != shards[0]['id']
+
+    def test_file_queue(self, make_solver, tmp_path):
+        solver = make_solver(search='bracket')
+        expected = list(solver.iter_solutions())
+        queue = FileQueue(str(tmp_path))
+
+        shards = submit(solver, queue, points=5000)
+        submit(solver, queue, points=5000)
+        assert queue.status() == dict(shards=len(shards), done=0, claimed=0)
+        with pytest.raises(RuntimeError):
+            list(merge(solver, queue, points=5000))
+
+        _run_workers(queue)
+        assert queue.status() == dict(shards=len(shards), done=len(shards), claimed=0)
+        merged = list(merge(solver, queue, points=5000))
+        assert set(merged) == set(expected) and len(merged) == len(expected)
+        assert not [name for kind in ('shards', 'claims', 'results')
+                    for name in os.listdir(str(tmp_path / kind)) if not name.endswith('.json')]
+
+        # solving a shard again changes nothing
+        queue.complete(shards[0]['id'], queue.result(shards[0]['id']))
+        assert list(merge(solver, queue, points=5000)) == merged
+
+    def test_lease(self, make_solver, tmp_path):
+        solver = make_solver()
+        for queue in (FileQueue(str(tmp_path)), MemoryQueue()):
+            submit(solver, queue)
+            first = queue.claim('a')
+            assert queue.claim('b')['id'] != first['id']
+            assert queue.status()['claimed'] == 2
+
+            # worker 'a' died: its lease runs out and another worker takes the shard over
+            queue.lease_time = -1
+            assert queue.claim('c')['id'] == first['id']
+            queue.lease_time = 600
+            assert work(queue) == len(make_shards(solver)) - 2
+            assert queue.status()['done'] == len(make_shards(solver)) - 2
+
+    def test_lease_renewal(self, make_solver, tmp_path, monkeypatch):
+        shard = make_shards(make_solver())[0]
+        for queue in (FileQueue(str(tmp_path), lease_time=0.3), MemoryQueue(lease_time=0.3)):
+            queue.submit([shard])
+            others = []
+
+            def slow_solve(shard):
+                # outlives several leases while another worker keeps trying to claim it
+                for _ in range(5):
+                    time.sleep(0.2)
+                    others.append(queue.claim('other'))
+                return solve_shard(shard)
+
+            monkeypatch.setattr(shards_module, 'solve_shard', slow_solve)
+            assert work(queue, 'slow', heartbeat=0.05) == 1
+            assert others == [None] * 5
+            assert queue.status() == dict(shards=1, done=1, claimed=0)
+
+            # only the worker holding a shard renews it
+            queue.submit([dict(shard, id='other')])
+            queue.claim('a')
+            time.sleep(0.4)
+            queue.renew('other', 'b')
+            assert queue.claim('b')['id'] == 'other'
+
+    def test_file_queue_takeover(self, make_solver, tmp_path):
+        queue = FileQueue(str(tmp_path), lease_time=0.1)
+        shard = make_shards(make_solver())[0]
+        queue.submit([shard])
+        assert queue.claim('a')['id'] == shard['id']
+        time.sleep(0.2)
+
+        # two workers found the claim of 'a' expired; the first to take it over wins
+        latest = queue._claims()[shard['id']]
+        assert queue._claim(shard['id'], latest, 'b')
+        assert not queue._claim(shard['id'], latest, 'c')
+        assert os.listdir(str(tmp_path / 'claims')) == [shard['id'] + '.1.json']
+        with open(str(tmp_path / 'claims' / (shard['id'] + '.1.json'))) as f:
+            assert f.read() == 'b'
+
+    def test_tcp_queue(self, make_solver, tmp_path):
+        solver = make_solver()
+        expected = list(solver.iter_solutions(full_results=True))
+        server = QueueServer(MemoryQueue())
+        server.start()
+        try:
+            queue = TCPQueue(server.address)
+            submit(solver, queue, full_results=True)
+            _run_workers(queue)
+            merged = list(merge(solver, queue, full_results=True))
+
+            with pytest.raises(RuntimeError):
+                queue._call('shutdown')
+        finally:
+            server.close()
+
+        # the analyses hold NaNs, which only compare equal as text
+        assert len(merged) == len(expected)
+        assert sorted(map(repr, merged)) == sorted(map(repr, expected))
+
+    def test_main(self, make_solver, tmp_path, capsys):
+        solver = make_solver()
+        queue = FileQueue(str(tmp_path))
+        submit(solver, queue)
+
+        assert main(['work', str(tmp_path)]) == 0
+        assert capsys.readouterr().out == '%d shard(s) solved\n' % len(make_shards(solver))
+        assert set(merge(solver, queue)) == set(solver.iter_solutions())
@@ -0,0 +1,50 @@
+import sys
+import pytest
+import numpy as np
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="requires python3.8 or higher")
+class TestPy3:
+    def test_temperature_sweep(self, make_inductor):
+        ind = make_inductor()
+        sweep = ind.temperature_sweep([-40, 25, 85])
+
+        assert sweep.ok.all()
+        assert sorted(sweep.values) == ['Ls_eff', 'Q_eff', 'res_freq']
+        for i, temperature in enumerate(sweep.temperatures):
+            ind.temperature = temperature
+            expected = ind.analyze(['Ls_eff', 'Q_eff'])
+            assert sweep.values['Ls_eff'][i] == pytest.approx(expected['Ls_eff'], rel=1e-12)
+            assert sweep.values['Q_eff'][i] == pytest.approx(expected['Q_eff'], rel=1e-12)
+            assert sweep.temp_coeff['Q_eff'][i] == pytest.approx(
+                ind.sensitivity('temperature', 'Q_eff', normalize=False) * 1e6, rel=1e-4)
+
+        # copper expands by about 17 ppm/degree
+        assert 10 < sweep.temp_coeff['Ls_eff'][1] < 25
+        assert ind.temperature_sweep(np.zeros((2, 3)), outputs='Ls_eff').values[
+            'Ls_eff'].shape == (2, 3)
+
+    def test_frequency_sweep(self, tmp_path, make_inductor):
+        ind = make_inductor()
+        frequencies = np.logspace(6, 9, 200)
+        sweep = ind.frequency_sweep(frequencies, outputs=['Q_eff'])
+        cold = ind.frequency_sweep(frequencies, outputs=['Q_eff'], warm_start=False)
+
+        assert sweep.ok.all()
+        assert sorted(sweep.values) == ['Q_eff']
+        assert sweep.values['Q_eff'] == pytest.approx(cold.values['Q_eff'], rel=1e-12)
+        for i in (0, 77, 199):
+            expected = ind.analyze(['Ls_eff', 'Rs_eff', 'Q_eff'], f=frequencies[i])
+            assert sweep.values['Q_eff'][i] == pytest.approx(expected['Q_eff'], rel=1e-12)
+            assert sweep.impedance[i] == pytest.approx(
+                expected['Rs_eff'] + 2j * np.pi * frequencies[i] * expected['Ls_eff'], rel=1e-12)
+
+        path = tmp_path / 'coil.s1p'
+        sweep.write_touchstone(str(path))
+        lines = path.read_text().splitlines()
+        assert lines[1] == '# HZ S RI R 50.0'
+        data = np.loadtxt(str(path), comments=('!', '#'))
+        assert data.shape == (200, 3)
+        assert data[:, 1] + 1j * data[:, 2] == pytest.approx(sweep.s11())
+        # a lossy inductor reflects less than all of the incident power
+        assert (abs(sweep.s11()) < 1).all()